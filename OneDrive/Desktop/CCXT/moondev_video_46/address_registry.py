@@ -0,0 +1,151 @@
+# address_registry.py - Persistent per-address polling state (SQLite) so sweeps skip dormant wallets
+
+import re
+import sqlite3
+import time
+
+from poll_scheduler import ERROR_RETRY_INTERVAL, compute_poll_interval, summarize_account
+
+REGISTRY_FILE = "address_registry.sqlite"  # Created next to whale_addresses.txt
+DORMANT_MAX_INTERVAL = 6 * 3600  # A wallet with nothing qualifying is still re-checked at least this often
+ERROR_MAX_INTERVAL = 3600        # Failing addresses back off from ERROR_RETRY_INTERVAL up to this
+
+ADDRESS_PATTERN = re.compile(r'^0x[0-9a-f]{40}$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS addresses (
+    address       TEXT PRIMARY KEY,
+    added_at      REAL NOT NULL,
+    last_polled   REAL,
+    last_active   REAL,           -- last poll that found a position >= the minimum value
+    largest_value REAL,
+    last_error    TEXT,
+    error_count   INTEGER NOT NULL DEFAULT 0,
+    latency_ms    REAL,           -- smoothed response time
+    poll_interval REAL,
+    next_poll     REAL NOT NULL DEFAULT 0
+)
+"""
+
+def normalize_address(address):
+    """Lowercased 0x-prefixed 40-hex-digit address, or None if it is not a valid address"""
+    address = address.strip().lower()
+    return address if ADDRESS_PATTERN.match(address) else None
+
+class AddressRegistry:
+    """
+    One row per tracked wallet with when it last held qualifying positions, its last error,
+    its response latency and when it is next due. Intervals follow poll_scheduler's tiers,
+    except that dormant wallets keep backing off up to DORMANT_MAX_INTERVAL across runs.
+    Results are buffered by observe() and written in one transaction by flush().
+    """
+
+    def __init__(self, path, min_position_value, clock=time.time):
+        self.path = path
+        self.min_position_value = min_position_value
+        self.clock = clock
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM addresses").fetchone()[0]
+
+    def sync(self, addresses):
+        """
+        Register new addresses (due immediately) and return the cleaned list: lowercased,
+        de-duplicated and with invalid entries dropped, in file order
+        """
+        cleaned = {}
+        invalid = []
+        for address in addresses:
+            normalized = normalize_address(address)
+            if normalized is None:
+                invalid.append(address)
+            else:
+                cleaned.setdefault(normalized, None)
+        now = self.clock()
+        self.conn.executemany("INSERT OR IGNORE INTO addresses (address, added_at) VALUES (?, ?)",
+                              [(address, now) for address in cleaned])
+        self.conn.commit()
+        self.invalid = invalid
+        self.duplicates = len(addresses) - len(invalid) - len(cleaned)
+        return list(cleaned)
+
+    def due(self, addresses, now=None):
+        """
+        The subset of addresses a sweep should fetch: those whose next poll time has passed,
+        plus every address that held qualifying positions last time (skipping those would
+        drop real positions from the snapshot)
+        """
+        now = self.clock() if now is None else now
+        rows = self.conn.execute("""
+            SELECT address, next_poll, last_active IS NOT NULL AND last_active >= last_polled
+            FROM addresses""")
+        state = {address: (next_poll, active) for address, next_poll, active in rows}
+        return [address for address in addresses
+                if address not in state or state[address][0] <= now or state[address][1]]
+
+    def observe(self, address, data, latency, error=None):
+        """Buffer one poll result; data is the clearinghouseState payload (None if the request failed)"""
+        self._pending.append((address, data, latency, error, self.clock()))
+
+    def flush(self):
+        """Write every buffered result and its next poll time"""
+        if not self._pending:
+            return 0
+        addresses = [item[0] for item in self._pending]
+        previous = {}
+        for i in range(0, len(addresses), 500):
+            chunk = addresses[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT address, poll_interval, error_count, latency_ms FROM addresses "
+                f"WHERE address IN ({','.join('?' * len(chunk))})", chunk)
+            previous.update((row[0], row[1:]) for row in rows)
+
+        updates = []
+        for address, data, latency, error, polled_at in self._pending:
+            prev_interval, error_count, prev_latency = previous.get(address, (None, 0, None))
+            latency_ms = latency * 1000
+            if prev_latency is not None:
+                latency_ms = 0.8 * prev_latency + 0.2 * latency_ms  # Smooth out one-off slow responses
+            if data is None:
+                error_count = (error_count or 0) + 1
+                interval = min(ERROR_MAX_INTERVAL, ERROR_RETRY_INTERVAL * 2 ** (error_count - 1))
+                updates.append((polled_at, None, None, error or "no response", error_count,
+                                latency_ms, interval, polled_at + interval, address))
+            else:
+                largest_value, _ = summarize_account(data)
+                interval = compute_poll_interval(data, self.min_position_value, prev_interval,
+                                                 max_interval=DORMANT_MAX_INTERVAL)
+                active = polled_at if largest_value >= self.min_position_value else None
+                updates.append((polled_at, active, largest_value, None, 0,
+                                latency_ms, interval, polled_at + interval, address))
+            previous[address] = (interval, updates[-1][4], latency_ms)
+
+        self.conn.executemany("""
+            UPDATE addresses SET last_polled = ?, last_active = COALESCE(?, last_active),
+                   largest_value = COALESCE(?, largest_value), last_error = ?, error_count = ?,
+                   latency_ms = ?, poll_interval = ?, next_poll = ?
+            WHERE address = ?""", updates)
+        self.conn.commit()
+        written = len(self._pending)
+        self._pending = []
+        return written
+
+    def summary(self, now=None):
+        """Counts for status output: tracked, due now, dormant (backed off), erroring"""
+        now = self.clock() if now is None else now
+        tracked, due, dormant, erroring = self.conn.execute("""
+            SELECT COUNT(*),
+                   SUM(next_poll <= ?),
+                   SUM(last_polled IS NOT NULL AND (last_active IS NULL OR last_active < last_polled)
+                       AND error_count = 0),
+                   SUM(error_count > 0)
+            FROM addresses""", (now,)).fetchone()
+        return {'tracked': tracked, 'due': due or 0, 'dormant': dormant or 0, 'erroring': erroring or 0}
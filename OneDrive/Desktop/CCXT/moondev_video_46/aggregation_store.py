@@ -0,0 +1,139 @@
+# aggregation_store.py - Incremental coin/side rollups maintained from per-address deltas
+
+import math
+
+import numpy as np
+import pandas as pd
+
+# Running fields kept per (coin, is_long) key and per address contribution
+COUNT, VALUE, PNL, LEVERAGE, LIQ_SUM, LIQ_COUNT, LIQ_WEIGHTED, LIQ_WEIGHT = range(8)
+N_FIELDS = 8
+REBUILD_EVERY = 50000  # Delta applications between exact rebuilds, so float drift never accumulates
+
+AGGREGATE_COLUMNS = ['coin', 'is_long', 'total_value', 'total_pnl', 'num_traders',
+                     'avg_leverage', 'liquidation_price', 'direction']
+
+def contributions_from_rows(rows):
+    """
+    (coin, is_long) -> running fields for one address's position rows, in the
+    position_columns row layout (coin, entry_price, leverage, position_value,
+    unrealized_pnl, liquidation_price, is_long)
+    """
+    contributions = {}
+    for coin, _, leverage, value, pnl, liq, is_long in rows:
+        fields = contributions.get((coin, is_long))
+        if fields is None:
+            fields = contributions[(coin, is_long)] = [0.0] * N_FIELDS
+        fields[COUNT] += 1
+        fields[VALUE] += value
+        fields[PNL] += pnl
+        fields[LEVERAGE] += leverage
+        if not math.isnan(liq):
+            fields[LIQ_SUM] += liq
+            fields[LIQ_COUNT] += 1
+        if liq > 0:
+            fields[LIQ_WEIGHTED] += liq * value
+            fields[LIQ_WEIGHT] += value
+    return contributions
+
+class AggregationStore:
+    """
+    Coin/side rollups (total value and PnL, trader count, mean leverage, mean and
+    value-weighted liquidation price) kept as running sums. Refreshing an address
+    subtracts its previous contribution and adds the new one, so a rollup after N
+    refreshed addresses costs O(N) instead of a groupby over every position.
+    """
+
+    def __init__(self):
+        self.totals = {}         # (coin, is_long) -> running fields
+        self.contributions = {}  # address -> {(coin, is_long): fields}
+        self._updates = 0
+
+    def __len__(self):
+        return len(self.contributions)
+
+    def _apply(self, contribution, sign):
+        for key, fields in contribution.items():
+            totals = self.totals.get(key)
+            if totals is None:
+                totals = self.totals[key] = [0.0] * N_FIELDS
+            for i in range(N_FIELDS):
+                totals[i] += sign * fields[i]
+            if totals[COUNT] <= 0:
+                # Last position for this coin/side is gone; dropping the key also drops its float residue
+                del self.totals[key]
+
+    def update_address(self, address, rows):
+        """Replace one address's positions (row tuples, see contributions_from_rows)"""
+        new = contributions_from_rows(rows)
+        old = self.contributions.pop(address, None)
+        if old:
+            self._apply(old, -1)
+        if new:
+            self._apply(new, 1)
+            self.contributions[address] = new
+
+        self._updates += 1
+        if self._updates >= REBUILD_EVERY:
+            self.rebuild()
+
+    def remove_address(self, address):
+        self.update_address(address, [])
+
+    def rebuild(self):
+        """Recompute every total exactly from the stored per-address contributions"""
+        grouped = {}
+        for contribution in self.contributions.values():
+            for key, fields in contribution.items():
+                grouped.setdefault(key, []).append(fields)
+        self.totals = {key: [math.fsum(column) for column in zip(*fields)] for key, fields in grouped.items()}
+        self._updates = 0
+
+    @classmethod
+    def from_positions(cls, df):
+        """Bootstrap from a full positions DataFrame with one vectorized groupby"""
+        store = cls()
+        if df is None or df.empty:
+            return store
+        liq = df['liquidation_price'].astype(float)
+        has_liq = liq > 0
+        parts = pd.DataFrame({
+            'address': df['address'], 'coin': df['coin'], 'is_long': df['is_long'].astype(bool),
+            COUNT: 1.0,
+            VALUE: df['position_value'].astype(float),
+            PNL: df['unrealized_pnl'].astype(float),
+            LEVERAGE: df['leverage'].astype(float),
+            LIQ_SUM: liq.fillna(0.0),
+            LIQ_COUNT: liq.notna().astype(float),
+            LIQ_WEIGHTED: np.where(has_liq, liq * df['position_value'], 0.0),
+            LIQ_WEIGHT: np.where(has_liq, df['position_value'], 0.0),
+        })
+        # Sorted grouping is the fast path on categorical keys; the fold below does not depend on order
+        sums = parts.groupby(['address', 'coin', 'is_long'], observed=True).sum()
+        for (address, coin, is_long), fields in zip(sums.index, sums.to_numpy().tolist()):
+            store.contributions.setdefault(address, {})[(coin, bool(is_long))] = fields
+        store.rebuild()
+        return store
+
+    def to_dataframe(self, weighted=False):
+        """
+        Rollup in the same shape as ppls_pos_server's groupby aggregate (sorted by total value).
+        With weighted=True a value-weighted liquidation price column is added.
+        """
+        keys = sorted(self.totals)
+        fields = np.array([self.totals[key] for key in keys], dtype=float).reshape(-1, N_FIELDS)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            agg_df = pd.DataFrame({
+                'coin': [coin for coin, _ in keys],
+                'is_long': np.array([is_long for _, is_long in keys], dtype=bool),
+                'total_value': fields[:, VALUE],
+                'total_pnl': fields[:, PNL],
+                'num_traders': np.rint(fields[:, COUNT]).astype(np.int64),
+                'avg_leverage': fields[:, LEVERAGE] / fields[:, COUNT],
+                'liquidation_price': np.where(fields[:, LIQ_COUNT] > 0, fields[:, LIQ_SUM] / fields[:, LIQ_COUNT], np.nan),
+                'direction': np.where([is_long for _, is_long in keys], 'LONG', 'SHORT') if keys else [],
+            }, columns=AGGREGATE_COLUMNS)
+            if weighted:
+                agg_df['weighted_liquidation_price'] = np.where(
+                    fields[:, LIQ_WEIGHT] > 0, fields[:, LIQ_WEIGHTED] / fields[:, LIQ_WEIGHT], np.nan)
+        return agg_df.sort_values('total_value', ascending=False)
@@ -0,0 +1,263 @@
+# benchmark.py - Time every server and dashboard stage on synthetic whale universes
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import colorama
+from colorama import Fore
+
+import nice_funcs as n
+import ppls_pos_server as server
+import synthetic_whales as synth
+from liquidation_heatmap import LiquidationHeatmap
+from liquidation_book import LiquidationBook
+from cascade_sim import CascadeSimulator
+from liquidation_ladder import LiquidationLadder
+from position_columns import PositionColumnBuilder
+
+colorama.init(autoreset=True)
+
+RESULTS_DIR = "bots/hyperliquid/data/ppls_positions/benchmarks"
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_REPEAT = 3
+
+def load_dashboard():
+    """Import dashboard_3per (needs the project-root api module); returns None if unavailable"""
+    try:
+        import dashboard_3per
+        return dashboard_3per
+    except Exception as e:
+        print(f"{Fore.YELLOW}⚠ Skipping dashboard stages, could not import dashboard_3per: {str(e)}")
+        return None
+
+def time_stage(func, repeat, track_memory=False):
+    """Run func repeat times with stdout captured; return timings and peak traced memory"""
+    timings = []
+    peak_bytes = None
+    for i in range(repeat):
+        sink = io.StringIO()
+        if track_memory and i == 0:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(sink):
+            func()
+        timings.append(time.perf_counter() - start)
+        if track_memory and i == 0:
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return timings, peak_bytes
+
+def reference_process_positions(data, address):
+    """
+    The per-position dict parser the server used before PositionColumnBuilder, kept only as
+    the baseline for the server.process_positions stage
+    """
+    if not data or "assetPositions" not in data:
+        return []
+
+    positions = []
+    for pos in data["assetPositions"]:
+        if "position" in pos:
+            p = pos["position"]
+
+            try:
+                size = float(p.get("szi", "0"))
+                position_value = float(p.get("positionValue", "0"))
+
+                if position_value < server.MIN_POSITION_VALUE:
+                    continue
+
+                position_info = {
+                    "address": address,
+                    "coin": p.get("coin", ""),
+                    "entry_price": float(p.get("entryPx", "0")),
+                    "leverage": p.get("leverage", {}).get("value", 0),
+                    "position_value": position_value,
+                    "unrealized_pnl": float(p.get("unrealizedPnl", "0")),
+                    "liquidation_price": float(p.get("liquidationPx", "0") or 0),
+                    "is_long": size > 0,
+                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                }
+                positions.append(position_info)
+
+            except Exception as e:
+                continue
+
+    return positions
+
+def build_columns(payloads):
+    """Parse every payload into one columnar snapshot, as the fetch loops do"""
+    builder = PositionColumnBuilder(server.MIN_POSITION_VALUE)
+    for data, address in payloads:
+        builder.add_payload(data, address)
+    return builder.to_dataframe()
+
+def build_stages(df, prices, payloads, dashboard):
+    """Stage name -> zero-argument callable, all working on the same synthetic snapshot"""
+    server_positions = df.to_dict('records')
+    book = LiquidationBook.from_positions(df)
+    ladder = LiquidationLadder.from_positions(df, prices)
+    stages = {
+        'server.process_positions': lambda: [reference_process_positions(data, address) for data, address in payloads],
+        'server.column_builder': lambda: build_columns(payloads),
+        'server.save_positions_to_csv': lambda: server.save_positions_to_csv(server_positions),
+        'ladder.build': lambda: LiquidationLadder.from_positions(df, prices),
+        'ladder.curve_1000': lambda: LiquidationLadder.from_positions(df, prices).curve(
+            [i / 100 for i in range(1, 1001)]),
+        'heatmap.all_coins': lambda: LiquidationHeatmap.from_positions(df, prices),
+        'book.build': lambda: LiquidationBook.from_positions(df),
+        'book.closest_to_liquidation_30': lambda: book.closest_to_liquidation(prices, True, 30),
+        'cascade.sweep_200_shocks': lambda: CascadeSimulator(ladder).run(),
+    }
+
+    if dashboard is not None:
+        processed = dashboard.enrich_positions(dashboard.process_positions(df), prices)
+        stages.update({
+            'dashboard.process_positions': lambda: dashboard.process_positions(df),
+            'dashboard.enrich_positions': lambda: dashboard.enrich_positions(processed, prices),
+            'dashboard.display_top_individual_positions': lambda: dashboard.display_top_individual_positions(processed),
+            'dashboard.display_risk_metrics': lambda: dashboard.display_risk_metrics(processed),
+            'dashboard.create_liquidation_thresholds_table': lambda: dashboard.create_liquidation_thresholds_table(
+                processed, prices, quiet=True),
+            'dashboard.save_positions_to_csv': lambda: dashboard.save_positions_to_csv(processed, prices, quiet=True),
+        })
+    return stages
+
+@contextlib.contextmanager
+def offline_environment(df, prices, dashboard, out_dir):
+    """
+    Point every data directory at a temp dir and serve prices / spot balances from memory,
+    so stages measure computation rather than the network
+    """
+    saved = {
+        'server_dir': server.DATA_DIR,
+        'snapshot_ttl': n.MARKET_SNAPSHOT.ttl,
+    }
+    server.DATA_DIR = out_dir
+    n.MARKET_SNAPSHOT.load(*synth.universe_payload(prices))
+    n.MARKET_SNAPSHOT.ttl = float('inf')
+
+    if dashboard is not None:
+        saved['dashboard_dir'] = dashboard.DATA_DIR
+        saved['market_metrics'] = dashboard.display_market_metrics
+        dashboard.DATA_DIR = out_dir
+        # Binance funding lookups are pure network latency, not dashboard work
+        dashboard.display_market_metrics = lambda: None
+        now = time.monotonic()
+        dashboard.SPOT_BALANCE_CACHE.update({address: (now, 0.0) for address in df['address'].unique()})
+    try:
+        yield
+    finally:
+        if dashboard is not None:
+            dashboard.OUTPUT_SINK.flush()  # Queued writes must land before the temp dir is removed
+        server.DATA_DIR = saved['server_dir']
+        n.MARKET_SNAPSHOT.ttl = saved['snapshot_ttl']
+        if dashboard is not None:
+            dashboard.DATA_DIR = saved['dashboard_dir']
+            dashboard.display_market_metrics = saved['market_metrics']
+            dashboard.SPOT_BALANCE_CACHE.clear()
+
+def run_benchmarks(sizes, n_coins, repeat, stage_filter=None, track_memory=False, all_coins=False, seed=0):
+    """Run every stage for every size and return a list of result dicts"""
+    dashboard = load_dashboard()
+    prices = synth.generate_universe(n_coins, seed)
+    if dashboard is not None and all_coins:
+        dashboard.TOKENS_TO_ANALYZE = list(prices)
+
+    results = []
+    for size in sizes:
+        print(f"{Fore.CYAN}🔧 Generating {size:,} positions across {n_coins} coins...")
+        df = synth.generate_positions(size, n_coins=n_coins, seed=seed, prices=prices)
+        payloads = synth.positions_to_payloads(df)
+
+        with tempfile.TemporaryDirectory() as out_dir, offline_environment(df, prices, dashboard, out_dir):
+            stages = build_stages(df, prices, payloads, dashboard)
+            for name, func in stages.items():
+                if stage_filter and not any(f in name for f in stage_filter):
+                    continue
+                timings, peak_bytes = time_stage(func, repeat, track_memory)
+                result = {
+                    'stage': name,
+                    'rows': size,
+                    'coins': n_coins,
+                    'repeat': repeat,
+                    'seconds_min': min(timings),
+                    'seconds_median': statistics.median(timings),
+                    'peak_mem_mb': round(peak_bytes / 1e6, 2) if peak_bytes is not None else None,
+                }
+                results.append(result)
+                print(f"{Fore.GREEN}  {name:<48} {size:>9,} rows  min {result['seconds_min']*1000:>10.1f} ms  "
+                      f"median {result['seconds_median']*1000:>10.1f} ms")
+    return results
+
+def write_results(results, output_file=None):
+    """Write results as JSON lines, one object per stage/size, tagged with run metadata"""
+    if output_file is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_file = os.path.join(RESULTS_DIR, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+    meta = {
+        'run_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+    }
+    with open(output_file, 'w') as f:
+        for result in results:
+            f.write(json.dumps({**meta, **result}) + "\n")
+    print(f"{Fore.GREEN}🟢 Saved {len(results)} benchmark results to {output_file}")
+    return output_file
+
+def compare_to_baseline(results, baseline_file, max_regression):
+    """Return the (stage, rows, baseline, current) entries slower than baseline by more than max_regression"""
+    baseline = {}
+    with open(baseline_file) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                baseline[(row['stage'], row['rows'])] = row['seconds_min']
+
+    regressions = []
+    for result in results:
+        key = (result['stage'], result['rows'])
+        if key in baseline and result['seconds_min'] > baseline[key] * (1 + max_regression):
+            regressions.append((result['stage'], result['rows'], baseline[key], result['seconds_min']))
+    return regressions
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the whale tracker stages on synthetic data")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help=f'Position counts to benchmark (default: {DEFAULT_SIZES})')
+    parser.add_argument('--coins', type=int, default=150, help='Number of coins in the synthetic universe (default: 150)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help=f'Runs per stage (default: {DEFAULT_REPEAT})')
+    parser.add_argument('--stages', nargs='+', default=None, help='Only run stages whose name contains one of these strings')
+    parser.add_argument('--all-coins', action='store_true', help='Analyze every coin in the dashboard stages, not just TOKENS_TO_ANALYZE')
+    parser.add_argument('--memory', action='store_true', help='Record peak traced memory for the first run of each stage')
+    parser.add_argument('--output', type=str, default=None, help='JSON lines output file (default: timestamped file in RESULTS_DIR)')
+    parser.add_argument('--baseline', type=str, default=None, help='Previous results file to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Allowed slowdown vs baseline before failing, as a fraction (default: 0.2)')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.coins, args.repeat, args.stages, args.memory, args.all_coins)
+    write_results(results, args.output)
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.max_regression)
+        for stage, rows, before, after in regressions:
+            print(f"{Fore.RED}✗ Regression: {stage} @ {rows:,} rows {before*1000:.1f} ms -> {after*1000:.1f} ms")
+        if regressions:
+            sys.exit(1)
+        print(f"{Fore.GREEN}✓ No regressions beyond {args.max_regression:.0%} against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
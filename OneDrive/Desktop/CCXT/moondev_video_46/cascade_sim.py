@@ -0,0 +1,109 @@
+# cascade_sim.py - Liquidation cascades: forced flow from each band moves price into the next, iterated to a fixed point
+
+import numpy as np
+import pandas as pd
+
+SHOCKS = np.round(np.arange(0.05, 10.001, 0.05), 2)  # 200 starting moves per coin and direction
+MAX_ROUNDS = 500
+MAX_MOVE_PCT = 99.0  # Moves are capped here (a long cascade cannot take price to zero)
+DEFAULT_IMPACT_USD_PER_PCT = 1_000_000  # For coins without a 24h volume figure
+IMPACT_DAY_VOLUME_SHARE = 0.01  # Force-closing 1% of a coin's 24h notional volume moves it 1%
+DOWN, UP = 0, 1
+
+def impact_from_volume(day_volumes, share=IMPACT_DAY_VOLUME_SHARE, default=DEFAULT_IMPACT_USD_PER_PCT):
+    """coin -> USD liquidated per 1% of price, scaled from each coin's 24h notional volume"""
+    return {coin: volume * share if volume and volume > 0 else default for coin, volume in day_volumes.items()}
+
+class CascadeSimulator:
+    """
+    A shock of s% liquidates every position within s% of the mark (longs on the way down,
+    shorts on the way up). That forced flow moves price a further (usd / usd_per_pct) ** exponent
+    percent, which reaches the next positions, and so on until a round liquidates nothing new.
+
+    Each coin and direction is a "lane" of liquidation distances sorted once with their cumulative
+    value. All lanes are packed into one sorted key array (lane * span + distance), so every
+    (coin, direction, shock) cascade advances with a single searchsorted per round.
+    """
+
+    def __init__(self, ladder, usd_per_pct=None, exponent=1.0, max_move_pct=MAX_MOVE_PCT):
+        self.coins = ladder.coins()
+        self.prices = np.array([ladder.current_prices[coin] for coin in self.coins], dtype=float)
+        self.exponent = exponent
+        self.max_move_pct = max_move_pct
+        self._span = max_move_pct + 1.0  # Lanes never overlap in key space
+
+        usd_per_pct = usd_per_pct if usd_per_pct is not None else DEFAULT_IMPACT_USD_PER_PCT
+        if isinstance(usd_per_pct, dict):
+            impact = [usd_per_pct.get(coin, DEFAULT_IMPACT_USD_PER_PCT) for coin in self.coins]
+        else:
+            impact = [usd_per_pct] * len(self.coins)
+        self.usd_per_pct = np.repeat(np.asarray(impact, dtype=float), 2)  # One per lane
+
+        keys, values, starts = [], [], [0]
+        for i, coin in enumerate(self.coins):
+            price = self.prices[i]
+            for direction, is_long in ((DOWN, True), (UP, False)):
+                sorted_liq, cum_value = ladder.sides.get((coin, is_long), (np.empty(0), np.zeros(1)))
+                value = np.diff(cum_value)
+                if is_long:
+                    # Ascending distance means descending liquidation price
+                    at_risk = sorted_liq <= price
+                    distance = ((price - sorted_liq[at_risk]) / price * 100)[::-1]
+                    value = value[at_risk][::-1]
+                else:
+                    at_risk = sorted_liq >= price
+                    distance = (sorted_liq[at_risk] - price) / price * 100
+                    value = value[at_risk]
+                reachable = distance <= max_move_pct
+                keys.append((i * 2 + direction) * self._span + distance[reachable])
+                values.append(value[reachable])
+                starts.append(starts[-1] + int(reachable.sum()))
+        self._keys = np.concatenate(keys) if keys else np.empty(0)
+        self._cum = np.concatenate(([0.0], np.cumsum(np.concatenate(values)))) if values else np.zeros(1)
+        self._starts = np.asarray(starts[:-1], dtype=np.int64)
+
+    def impact_move(self, usd):
+        """% move caused by force-closing usd (lanes x shocks) in each lane"""
+        return (usd / self.usd_per_pct[:, None]) ** self.exponent
+
+    def run(self, shocks=SHOCKS, max_rounds=MAX_ROUNDS):
+        """
+        One row per coin, direction and shock: the final move and price, the USD liquidated,
+        the rounds that liquidated something new (0 if the shock reached nobody) and whether
+        the cascade settled within max_rounds
+        """
+        shocks = np.minimum(np.asarray(shocks, dtype=float), self.max_move_pct)
+        n_lanes = len(self.coins) * 2
+        base = (np.arange(n_lanes) * self._span)[:, None]
+        start = self._starts[:, None]
+
+        move = np.broadcast_to(shocks, (n_lanes, len(shocks))).copy()
+        reached = np.broadcast_to(start, move.shape).copy()
+        rounds = np.zeros(move.shape, dtype=np.int32)
+        for _ in range(max_rounds):
+            idx = np.searchsorted(self._keys, base + move, side='right')
+            grew = idx > reached
+            if not grew.any():
+                break
+            rounds += grew
+            reached = idx
+            liquidated = self._cum[reached] - self._cum[start]
+            move = np.minimum(shocks + self.impact_move(liquidated), self.max_move_pct)
+        liquidated = self._cum[reached] - self._cum[start]
+        settled = np.searchsorted(self._keys, base + move, side='right') <= reached
+
+        lanes = np.repeat(np.arange(n_lanes), len(shocks))
+        direction = lanes % 2
+        price = self.prices[lanes // 2]
+        final_move = move.ravel()
+        return pd.DataFrame({
+            'coin': np.array(self.coins, dtype=object)[lanes // 2],
+            'direction': np.where(direction == DOWN, 'DOWN', 'UP'),
+            'shock_pct': np.tile(shocks, n_lanes),
+            'final_move_pct': final_move,
+            'final_price': np.where(direction == DOWN, price * (1 - final_move / 100), price * (1 + final_move / 100)),
+            'liquidated_usd': liquidated.ravel(),
+            'rounds': rounds.ravel(),
+            'amplification': final_move / np.maximum(np.tile(shocks, n_lanes), 1e-12),
+            'settled': settled.ravel(),
+        })
@@ -2,7 +2,7 @@ import os
 import time
 import pandas as pd
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timezone
 import colorama
 from colorama import Fore, Back, Style
 import nice_funcs as n  # Import directly from the same directory
@@ -13,6 +13,23 @@ import random
 from termcolor import colored
 import schedule  # Add import for scheduler
 import requests
+import threading
+import hashlib
+import asyncio
+import concurrent.futures
+from snapshot_store import SnapshotStore, new_snapshot_id
+from output_sink import OutputSink
+from metrics import METRICS
+from liquidation_ladder import LiquidationLadder
+from liquidation_heatmap import LiquidationHeatmap
+from liquidation_book import LiquidationBook
+from cascade_sim import CascadeSimulator, impact_from_volume
+from position_columns import apply_position_schema
+from signal_replay import (SignalHistory, imbalance_pct, threshold_direction, market_direction,
+                           coin_direction, DIRECTION_LABELS, GO_SHORT, NEUTRAL)
+from tick_reactor import TickReactor, DEFAULT_THRESHOLDS
+from ws_ingest import WsIngestor, PositionTable, WS_URL
+from terminal_render import RenderBuffer, format_column, concat, style_rows, interleave, optional_lines
 
 # Add the project root to the path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
@@ -75,9 +92,39 @@ TOP_N_POSITIONS = 30  # Number of top positions to display
 TOKENS_TO_ANALYZE = ['BTC', 'ETH', 'XRP', 'SOL']
 TOKENS_TO_ANALYZE = ['BTC']  # Currently only analyzing BTC
 
+# Output format for all positions / aggregates: csv, parquet (append-only snapshot store) or both
+OUTPUT_FORMAT = "both"
+
+# Coins shown in the all-coins liquidation heatmap (every coin is exported to CSV)
+HEATMAP_TOP_COINS = 20
+
+# Cascade simulation (cascade_sim.py) - every coin is swept, TOKENS_TO_ANALYZE are shown
+CASCADE_DISPLAY_SHOCK = 3.0  # Starting move shown in the terminal table
+
+# --metrics writes dashboard.prom / dashboard.jsonl here after every refresh
+METRICS_DIR = os.path.join(DATA_DIR, "metrics")
+
+# Seconds between dashboard refreshes when run as a script
+REFRESH_INTERVAL = 60
+
+# Reactive mode (--reactive): live view redrawn on price ticks, at most once per render interval
+REACTIVE_RENDER_INTERVAL = 1.0
+REACTIVE_TOP_N = 10
+
 # Highlight threshold for positions
 HIGHLIGHT_THRESHOLD = 2000000  # $2 million
 
+# USDC spot balance cache (address -> (fetched_at, balance)), filled concurrently before rendering
+SPOT_BALANCE_TTL = 30  # Seconds a fetched balance is reused
+SPOT_PREFETCH_WORKERS = 8  # Parallel spotClearinghouseState requests
+SPOT_BALANCE_CACHE = {}
+SPOT_BALANCE_LOCK = threading.Lock()
+SPOT_SESSION = requests.Session()
+SPOT_SESSION.headers.update({"Content-Type": "application/json"})
+
+# Every CSV / snapshot store write goes through one background writer (atomic, skipped when unchanged)
+OUTPUT_SINK = OutputSink()
+
 def get_random_quote():
     """Return a random Nomad DevOPS quote"""
     return random.choice(NOMAD_QUOTES)
@@ -92,25 +139,70 @@ def ensure_data_dir():
         print(f"{Fore.RED}✗ Error creating directory: {str(e)}")
         return False
 
-def get_spot_position_usd(address):
-    """Get USDC spot position for a given address"""
+def fetch_spot_usdc_balance(address):
+    """Fetch the USDC spot balance for one address (raises on failure)"""
+    # Get token balances from Hyperliquid API
+    url = "https://api.hyperliquid.xyz/info"
+    sent = time.perf_counter()
     try:
-        # Get token balances from Hyperliquid API
-        url = "https://api.hyperliquid.xyz/info"
-        headers = {"Content-Type": "application/json"}
-        balance_response = requests.post(url, headers=headers, json={
+        balance_response = SPOT_SESSION.post(url, json={
             "type": "spotClearinghouseState",
             "user": address
-        })
-        balance_data = balance_response.json()
-        
-        # Find USDC balance
-        usdc_balance = 0
-        for balance in balance_data['balances']:
-            if balance['coin'] == 'USDC':
-                usdc_balance = float(balance['total'])
-                break
-                
+        }, timeout=10)
+    except Exception:
+        METRICS.observe_request("spotClearinghouseState", "error", time.perf_counter() - sent)
+        raise
+    METRICS.observe_request("spotClearinghouseState", balance_response.status_code, time.perf_counter() - sent)
+    balance_data = balance_response.json()
+    
+    # Find USDC balance
+    usdc_balance = 0
+    for balance in balance_data['balances']:
+        if balance['coin'] == 'USDC':
+            usdc_balance = float(balance['total'])
+            break
+            
+    return usdc_balance
+
+def prefetch_spot_balances(addresses):
+    """
+    Fetch USDC spot balances for every address a view is about to render, concurrently,
+    and store them in the short-TTL cache so rendering never waits on the network per row
+    """
+    now = time.monotonic()
+    with SPOT_BALANCE_LOCK:
+        missing = [a for a in dict.fromkeys(addresses)
+                   if a not in SPOT_BALANCE_CACHE or now - SPOT_BALANCE_CACHE[a][0] >= SPOT_BALANCE_TTL]
+    if not missing:
+        return
+    
+    def fetch(address):
+        try:
+            return address, fetch_spot_usdc_balance(address)
+        except Exception as e:
+            print(f"{Fore.RED}✗ Error fetching USDC spot balance for {address}: {str(e)}")
+            return address, None
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(SPOT_PREFETCH_WORKERS, len(missing))) as executor:
+        results = list(executor.map(fetch, missing))
+    
+    fetched_at = time.monotonic()
+    with SPOT_BALANCE_LOCK:
+        for address, balance in results:
+            if balance is not None:
+                SPOT_BALANCE_CACHE[address] = (fetched_at, balance)
+
+def get_spot_position_usd(address):
+    """Get USDC spot position for a given address (served from the prefetch cache when fresh)"""
+    with SPOT_BALANCE_LOCK:
+        cached = SPOT_BALANCE_CACHE.get(address)
+    if cached and time.monotonic() - cached[0] < SPOT_BALANCE_TTL:
+        return cached[1]
+    
+    try:
+        usdc_balance = fetch_spot_usdc_balance(address)
+        with SPOT_BALANCE_LOCK:
+            SPOT_BALANCE_CACHE[address] = (time.monotonic(), usdc_balance)
         return usdc_balance
         
     except Exception as e:
@@ -167,6 +259,96 @@ def spot_price_and_hoe_ass_spot_symbol(symbol):
         print(f"{Fore.RED}■ Stack trace:\n{traceback.format_exc()}")
         return None
 
+def format_individual_position_lines(top_df, side_color):
+    """
+    Format the top individual positions table column by column (one position line plus one address line per row)
+    """
+    row_numbers = format_column(range(1, len(top_df) + 1), 'd')
+    liq = top_df['liquidation_price'].to_numpy(dtype=float)
+    liq_display = np.where(liq > 0, concat("$", format_column(liq, '.2f')), "N/A")
+    
+    position_lines = concat(
+        side_color, "#", row_numbers, " ", Fore.YELLOW, top_df['coin'].to_numpy(dtype=str), " ",
+        side_color, "$", format_column(top_df['position_value'], '.2f'), " ",
+        Fore.BLUE, "| Entry: $", format_column(top_df['entry_price'], '.2f'), " ",
+        Fore.MAGENTA, "| PnL: $", format_column(top_df['unrealized_pnl'], '.2f'), " ",
+        Fore.CYAN, "| Leverage: ", top_df['leverage'].astype(str).to_numpy(dtype=str), "x ",
+        Fore.RED, "| Liq: ", liq_display
+    )
+    address_lines = concat(Fore.CYAN, "    Address: ", top_df['address'].to_numpy(dtype=str))
+    return interleave(position_lines, address_lines)
+
+def format_risk_position_lines(risky_df, side_color, side_label):
+    """
+    Format a "closest to liquidation" table column by column, including the highlighted rows,
+    the aggregate line every 10 rows and the 2%-band liquidation threshold lines
+    """
+    count = len(risky_df)
+    row_index = np.arange(1, count + 1)
+    row_numbers = format_column(row_index, 'd')
+    values = risky_df['position_value'].to_numpy(dtype=float)
+    distances = risky_df['distance_to_liq_pct'].to_numpy(dtype=float)
+    
+    # Get USDC balance for top 2 positions (already prefetched)
+    usdc = np.zeros(count)
+    for i, address in enumerate(risky_df['address'].head(2)):
+        usdc[i] = get_spot_position_usd(address)
+    show_usdc = row_index <= 2
+    usdc_text = format_column(usdc, '.2f')
+    
+    coin = risky_df['coin'].to_numpy(dtype=str)
+    value_text = format_column(values, '.2f')
+    entry_text = format_column(risky_df['entry_price'], '.2f')
+    liq_text = format_column(risky_df['liquidation_price'], '.2f')
+    current_text = format_column(risky_df['current_price'], '.2f')
+    distance_text = format_column(distances, '.2f')
+    leverage_text = risky_df['leverage'].astype(str).to_numpy(dtype=str)
+    
+    position_lines = concat(
+        side_color, "#", row_numbers, " ", Fore.YELLOW, coin, " ", side_color, "$", value_text, " ",
+        Fore.BLUE, "| Entry: $", entry_text, " ",
+        Fore.RED, "| Liq: $", liq_text, " ",
+        Fore.MAGENTA, "| Current: $", current_text, " ",
+        Fore.MAGENTA, "| Distance: ", distance_text, "% ",
+        Fore.CYAN, "| Leverage: ", leverage_text, "x",
+        np.where(show_usdc, concat(" ", Fore.MAGENTA, "| 💰 USDC: $", usdc_text), "")
+    )
+    
+    # Highlighted rows are re-rendered as plain text on a yellow background
+    plain_lines = concat(
+        "#", row_numbers, " ", coin, " $", value_text, " ",
+        "| Entry: $", entry_text, " ",
+        "| Liq: $", liq_text, " ",
+        "| Current: $", current_text, " ",
+        "| Distance: ", distance_text, "% ",
+        "| Leverage: ", leverage_text, "x",
+        np.where(show_usdc, concat(" | 💰 USDC: $", usdc_text), "")
+    )
+    position_lines = style_rows(position_lines, values > HIGHLIGHT_THRESHOLD, plain_lines, 'black', 'on_yellow')
+    address_lines = concat(Fore.CYAN, "    Address: ", risky_df['address'].to_numpy(dtype=str))
+    
+    # Running aggregates every 10 rows
+    running_total = np.cumsum(values)
+    running_total_text = format_column(running_total, '.2f')
+    every_ten = row_index % 10 == 0
+    aggregate_lines = optional_lines(every_ten, [
+        colored(f"📊 AGGREGATE (1-{i}): Total {side_label} Positions: ${total} | All Liquidated Within: {within:.2f}%", 'black', 'on_cyan')
+        for i, total, within in zip(row_index[every_ten], running_total_text[every_ten], np.maximum.accumulate(distances)[every_ten])
+    ])
+    separator_lines = optional_lines(every_ten, f"{Fore.CYAN}{'-'*80}")
+    
+    # A threshold line whenever the 2% band of the distance climbs past the previous maximum
+    pct_thresholds = risky_df['distance_band_pct'].to_numpy().astype(int)
+    previous_max = np.maximum.accumulate(np.concatenate(([0], pct_thresholds[:-1])))
+    new_band = pct_thresholds > previous_max
+    band_lines = optional_lines(new_band, [
+        colored(f"📊 LIQUIDATION THRESHOLD 0-{threshold}%: Total {side_label} Value: ${total}", 'white', 'on_blue')
+        for threshold, total in zip(pct_thresholds[new_band], running_total_text[new_band])
+    ])
+    
+    return interleave(position_lines, address_lines, aggregate_lines, separator_lines, band_lines)
+
+@METRICS.timed('render')
 def display_top_individual_positions(df, n=TOP_N_POSITIONS):
     """
     Display top individual long and short positions
@@ -175,76 +357,39 @@ def display_top_individual_positions(df, n=TOP_N_POSITIONS):
         print(f"{Fore.RED}No positions to display!")
         return None, None
     
-    # Create a copy to avoid modifying the original
-    display_df = df.copy()
-    
-    # Validate position types for positions with valid liquidation prices
-    valid_liq_df = display_df[display_df['liquidation_price'] > 0].copy()
-    if not valid_liq_df.empty:
-        # Verify if the position type matches the relationship between entry and liquidation price
-        valid_liq_df['position_type_verified'] = np.where(
-            valid_liq_df['is_long'],
-            valid_liq_df['liquidation_price'] < valid_liq_df['entry_price'],  # Long should have liq price < entry
-            valid_liq_df['liquidation_price'] > valid_liq_df['entry_price']   # Short should have liq price > entry
-        )
-        
-        # Count inconsistencies
-        inconsistent_positions = valid_liq_df[~valid_liq_df['position_type_verified']]
-        
-        if len(inconsistent_positions) > 0:
-            print(f"{Fore.YELLOW}⚠ Note: Some positions have been reclassified based on their liquidation prices.")
-            
-        # Update the is_long column with corrected values
-        # Note: The 'is_long_corrected' column is missing in the code - I'm inferring it should be:
-        valid_liq_df['is_long_corrected'] = ~valid_liq_df['is_long'] if not valid_liq_df['position_type_verified'].all() else valid_liq_df['is_long']
-        
-        valid_liq_df['is_long'] = valid_liq_df['is_long_corrected']
-        
-        # Update the display dataframe with corrected position types
-        display_df.loc[valid_liq_df.index, 'is_long'] = valid_liq_df['is_long']
+    # Sides were corrected once in process_positions, so this agrees with every other view
+    df = ensure_enriched(df)
     
     # Sort by position value
-    longs = display_df[display_df['is_long']].sort_values('position_value', ascending=False)
-    shorts = display_df[~display_df['is_long']].sort_values('position_value', ascending=False)
+    longs = df[df['is_long']].sort_values('position_value', ascending=False)
+    shorts = df[~df['is_long']].sort_values('position_value', ascending=False)
+    
+    # Render both tables into one buffer and write it in a single call
+    buffer = RenderBuffer()
     
     # Display top long positions
-    print(f"\n{Fore.GREEN}{Style.BRIGHT}🔹 TOP {n} INDIVIDUAL LONG POSITIONS 📈")
-    print(f"{Fore.GREEN}{'-'*80}")
+    buffer.line(f"\n{Fore.GREEN}{Style.BRIGHT}🔹 TOP {n} INDIVIDUAL LONG POSITIONS 📈")
+    buffer.line(f"{Fore.GREEN}{'-'*80}")
     
     if len(longs) > 0:
-        for i, (_, row) in enumerate(longs.head(n).iterrows(), 1):
-            liq_price = row['liquidation_price'] if row['liquidation_price'] > 0 else "N/A"
-            liq_display = f"${liq_price:.2f}" if liq_price != "N/A" else "N/A"
-            
-            print(f"{Fore.GREEN}#{i} {Fore.YELLOW}{row['coin']} {Fore.GREEN}${row['position_value']:.2f} " +
-                  f"{Fore.BLUE}| Entry: ${row['entry_price']:.2f} " +
-                  f"{Fore.MAGENTA}| PnL: ${row['unrealized_pnl']:.2f} " +
-                  f"{Fore.CYAN}| Leverage: {row['leverage']}x " +
-                  f"{Fore.RED}| Liq: {liq_display}")
-            print(f"{Fore.CYAN}    Address: {row['address']}")
+        buffer.lines(format_individual_position_lines(longs.head(n), Fore.GREEN))
     else:
-        print(f"{Fore.YELLOW}No long positions found!")
+        buffer.line(f"{Fore.YELLOW}No long positions found!")
         
      # Display top short positions
-    print(f"\n{Fore.RED}{Style.BRIGHT}🔹 TOP {n} INDIVIDUAL SHORT POSITIONS 📉")
-    print(f"{Fore.RED}{'-'*80}")
+    buffer.line(f"\n{Fore.RED}{Style.BRIGHT}🔹 TOP {n} INDIVIDUAL SHORT POSITIONS 📉")
+    buffer.line(f"{Fore.RED}{'-'*80}")
     
     if len(shorts) > 0:
-        for i, (_, row) in enumerate(shorts.head(n).iterrows(), 1):
-            liq_price = row['liquidation_price'] if row['liquidation_price'] > 0 else "N/A"
-            liq_display = f"${liq_price:.2f}" if liq_price != "N/A" else "N/A"
-            
-            print(f"{Fore.RED}#{i} {Fore.YELLOW}{row['coin']} {Fore.RED}${row['position_value']:.2f} " +
-                  f"{Fore.BLUE}| Entry: ${row['entry_price']:.2f} " +
-                  f"{Fore.MAGENTA}| PnL: ${row['unrealized_pnl']:.2f} " +
-                  f"{Fore.CYAN}| Leverage: {row['leverage']}x " +
-                  f"{Fore.RED}| Liq: {liq_display}")
-            print(f"{Fore.CYAN}    Address: {row['address']}")
+        buffer.lines(format_individual_position_lines(shorts.head(n), Fore.RED))
     else:
-        print(f"{Fore.YELLOW}No short positions found!")
+        buffer.line(f"{Fore.YELLOW}No short positions found!")
+    
+    buffer.flush()
     
     return longs.head(n), shorts.head(n)
 
+@METRICS.timed('render')
 def display_risk_metrics(df):
     """
     Display metrics for positions closest to liquidation
@@ -252,11 +397,11 @@ def display_risk_metrics(df):
     if df is None or df.empty:
         return None, None, None
     
-    # Create a copy to avoid modifying the original
-    risk_df = df.copy()
+    # Current prices and distances come from the shared enrichment pass
+    df = ensure_enriched(df)
     
     # Filter out positions with invalid liquidation prices
-    risk_df = risk_df[risk_df['liquidation_price'] > 0]
+    risk_df = df[df['liquidation_price'] > 0]
     
     if risk_df.empty:
         print(f"{Fore.YELLOW}No positions with valid liquidation prices found!")
@@ -265,23 +410,9 @@ def display_risk_metrics(df):
     # Filter risk_df to only include tokens in TOKENS_TO_ANALYZE
     risk_df = risk_df[risk_df['coin'].isin(TOKENS_TO_ANALYZE)]
     
-    # Fetch current prices for tokens in TOKENS_TO_ANALYZE once
-    unique_coins = risk_df['coin'].unique()
-    current_prices = {coin: n.get_current_price(coin) for coin in unique_coins}
-    
-    # Add current price to the DataFrame
-    risk_df['current_price'] = risk_df['coin'].map(current_prices)
-    
-    # Calculate standardized distance to liquidation using current price
-    risk_df['distance_to_liq_pct'] = np.where(
-        risk_df['is_long'],
-        abs(risk_df['current_price'] - risk_df['liquidation_price']) / risk_df['current_price'] * 100,
-        abs(risk_df['liquidation_price'] - risk_df['current_price']) / risk_df['current_price'] * 100
-    )
-    
-    # Correct position type based on liquidation price
-    risk_df['is_long_corrected'] = risk_df['liquidation_price'] < risk_df['entry_price']
-    risk_df['is_long'] = risk_df['is_long_corrected']
+    # Current prices of the analyzed tokens, passed on to the liquidation analysis
+    priced = risk_df.drop_duplicates('coin')
+    current_prices = dict(zip(priced['coin'], priced['current_price']))
     
     # Sort by distance to liquidation (ascending)
     risk_df = risk_df.sort_values('distance_to_liq_pct')
@@ -290,109 +421,30 @@ def display_risk_metrics(df):
     risky_longs = risk_df[risk_df['is_long']].sort_values('distance_to_liq_pct')
     risky_shorts = risk_df[~risk_df['is_long']].sort_values('distance_to_liq_pct')
     
+    # Fetch USDC balances for the top 2 longs and shorts concurrently before rendering
+    prefetch_spot_balances(list(risky_longs['address'].head(2)) + list(risky_shorts['address'].head(2)))
+    
+    buffer = RenderBuffer()
+    
     # Display positions closest to liquidation — LONGS
-    print(f"\n{Fore.GREEN}{Style.BRIGHT}⚠ TOP {TOP_N_POSITIONS} LONG POSITIONS CLOSEST TO LIQUIDATION 🧨")
-    print(f"{Fore.GREEN}{'-'*80}")
+    buffer.line(f"\n{Fore.GREEN}{Style.BRIGHT}⚠ TOP {TOP_N_POSITIONS} LONG POSITIONS CLOSEST TO LIQUIDATION 🧨")
+    buffer.line(f"{Fore.GREEN}{'-'*80}")
     
     if len(risky_longs) > 0:
-        running_total_value = 0
-        highest_distance = 0
-        last_pct_threshold = 0
-        
-        for i, (_, row) in enumerate(risky_longs.head(TOP_N_POSITIONS).iterrows(), 1):
-            highlight = row['position_value'] > HIGHLIGHT_THRESHOLD
-            running_total_value += row['position_value']
-            highest_distance = max(highest_distance, row['distance_to_liq_pct'])
-            
-            # Get USDC balance for top 2 positions
-            usdc_balance = get_spot_position_usd(row['address']) if i <= 2 else 0
-            
-            display_text = f"{Fore.GREEN}#{i} {Fore.YELLOW}{row['coin']} {Fore.GREEN}${row['position_value']:.2f} " + \
-                f"{Fore.BLUE}| Entry: ${row['entry_price']:.2f} " + \
-                f"{Fore.RED}| Liq: ${row['liquidation_price']:.2f} " + \
-                f"{Fore.MAGENTA}| Current: ${row['current_price']:.2f} " + \
-                f"{Fore.MAGENTA}| Distance: {row['distance_to_liq_pct']:.2f}% " + \
-                f"{Fore.CYAN}| Leverage: {row['leverage']}x"
-                
-            if i <= 2:
-                display_text += f" {Fore.MAGENTA}| 💰 USDC: ${usdc_balance:.2f}"
-                
-            if highlight:
-                display_text = colored(f"#{i} {row['coin']} ${row['position_value']:.2f} " + \
-                    f"| Entry: ${row['entry_price']:.2f} " + \
-                    f"| Liq: ${row['liquidation_price']:.2f} " + \
-                    f"| Current: ${row['current_price']:.2f} " + \
-                    f"| Distance: {row['distance_to_liq_pct']:.2f}% " + \
-                    f"| Leverage: {row['leverage']}x" + \
-                    (f" | 💰 USDC: ${usdc_balance:.2f}" if i <= 2 else ""), 'black', 'on_yellow')
-                
-            print(display_text)
-            print(f"{Fore.CYAN}    Address: {row['address']}")
-            
-            if i % 10 == 0:
-                agg_display = f"📊 AGGREGATE (1-{i}): Total Long Positions: ${running_total_value:.2f} | All Liquidated Within: {highest_distance:.2f}%"
-                print(colored(agg_display, 'black', 'on_cyan'))
-                print(f"{Fore.CYAN}{'-'*80}")
-                
-            current_pct_threshold = int(row['distance_to_liq_pct'] / 2) * 2
-            if current_pct_threshold > last_pct_threshold:
-                pct_agg_display = f"📊 LIQUIDATION THRESHOLD 0-{current_pct_threshold}%: Total Long Value: ${running_total_value:.2f}"
-                print(colored(pct_agg_display, 'white', 'on_blue'))
-                last_pct_threshold = current_pct_threshold
+        buffer.lines(format_risk_position_lines(risky_longs.head(TOP_N_POSITIONS), Fore.GREEN, "Long"))
     else:
-        print(f"{Fore.YELLOW}No long positions with liquidation prices found!")
+        buffer.line(f"{Fore.YELLOW}No long positions with liquidation prices found!")
     
     # Display positions closest to liquidation — SHORTS
-    print(f"\n{Fore.RED}{Style.BRIGHT}★ TOP {TOP_N_POSITIONS} SHORT POSITIONS CLOSEST TO LIQUIDATION 🧨")
-    print(f"{Fore.RED}{'-'*80}")
+    buffer.line(f"\n{Fore.RED}{Style.BRIGHT}★ TOP {TOP_N_POSITIONS} SHORT POSITIONS CLOSEST TO LIQUIDATION 🧨")
+    buffer.line(f"{Fore.RED}{'-'*80}")
     
     if len(risky_shorts) > 0:
-        running_total_value = 0
-        highest_distance = 0
-        last_pct_threshold = 0
-        
-        for i, (_, row) in enumerate(risky_shorts.head(TOP_N_POSITIONS).iterrows(), 1):
-            highlight = row['position_value'] > HIGHLIGHT_THRESHOLD
-            running_total_value += row['position_value']
-            highest_distance = max(highest_distance, row['distance_to_liq_pct'])
-            
-            # Get USDC balance for top 2 positions
-            usdc_balance = get_spot_position_usd(row['address']) if i <= 2 else 0
-            
-            display_text = f"{Fore.RED}#{i} {Fore.YELLOW}{row['coin']} {Fore.RED}${row['position_value']:.2f} " + \
-                f"{Fore.BLUE}| Entry: ${row['entry_price']:.2f} " + \
-                f"{Fore.RED}| Liq: ${row['liquidation_price']:.2f} " + \
-                f"{Fore.MAGENTA}| Current: ${row['current_price']:.2f} " + \
-                f"{Fore.MAGENTA}| Distance: {row['distance_to_liq_pct']:.2f}% " + \
-                f"{Fore.CYAN}| Leverage: {row['leverage']}x"
-                
-            if i <= 2:
-                display_text += f" {Fore.MAGENTA}| 💰 USDC: ${usdc_balance:.2f}"
-                
-            if highlight:
-                display_text = colored(f"#{i} {row['coin']} ${row['position_value']:.2f} " + \
-                    f"| Entry: ${row['entry_price']:.2f} " + \
-                    f"| Liq: ${row['liquidation_price']:.2f} " + \
-                    f"| Current: ${row['current_price']:.2f} " + \
-                    f"| Distance: {row['distance_to_liq_pct']:.2f}% " + \
-                    f"| Leverage: {row['leverage']}x" + \
-                    (f" | 💰 USDC: ${usdc_balance:.2f}" if i <= 2 else ""), 'black', 'on_yellow')
-                
-            print(display_text)
-            print(f"{Fore.CYAN}    Address: {row['address']}")
-            
-            if i % 10 == 0:
-                agg_display = f"📊 AGGREGATE (1-{i}): Total Short Positions: ${running_total_value:.2f} | All Liquidated Within: {highest_distance:.2f}%"
-                print(colored(agg_display, 'black', 'on_cyan'))
-                print(f"{Fore.CYAN}{'-'*80}")
-                
-            current_pct_threshold = int(row['distance_to_liq_pct'] / 2) * 2
-            if current_pct_threshold > last_pct_threshold:
-                pct_agg_display = f"📊 LIQUIDATION THRESHOLD 0-{current_pct_threshold}%: Total Short Value: ${running_total_value:.2f}"
-                print(colored(pct_agg_display, 'white', 'on_blue'))
-                last_pct_threshold = current_pct_threshold
+        buffer.lines(format_risk_position_lines(risky_shorts.head(TOP_N_POSITIONS), Fore.RED, "Short"))
     else:
-        print(f"{Fore.YELLOW}No short positions with liquidation prices found!")
+        buffer.line(f"{Fore.YELLOW}No short positions with liquidation prices found!")
+    
+    buffer.flush()
         
     return risky_longs.head(TOP_N_POSITIONS), risky_shorts.head(TOP_N_POSITIONS), current_prices
 
@@ -404,25 +456,27 @@ def save_liquidation_risk_to_csv(risky_longs_df, risky_shorts_df):
         print(f"{Fore.RED}🔴 Nomad DevOPS says: No positions with liquidation data to save! 😢")
         return
     
+    # Same columns as before the shared enrichment (is_long_corrected is kept for readers of these files)
+    def risk_csv_frame(frame, direction):
+        return frame.drop(columns=['side', 'distance_band_pct']).assign(is_long_corrected=frame['is_long'], direction=direction)
+    
     # Save risky long positions
     if risky_longs_df is not None and not risky_longs_df.empty:
         # Add a direction column
-        risky_longs_df = risky_longs_df.copy()
-        risky_longs_df['direction'] = 'LONG'
+        risky_longs_df = risk_csv_frame(risky_longs_df, 'LONG')
         
         # Save to CSV
         longs_file = os.path.join(DATA_DIR, "liquidation_closest_long_positions.csv")
-        risky_longs_df.to_csv(longs_file, index=False, float_format='%.2f')
+        OUTPUT_SINK.write_csv(longs_file, risky_longs_df, float_format='%.2f')
     
     # Save risky short positions
     if risky_shorts_df is not None and not risky_shorts_df.empty:
         # Add a direction column
-        risky_shorts_df = risky_shorts_df.copy()
-        risky_shorts_df['direction'] = 'SHORT'
+        risky_shorts_df = risk_csv_frame(risky_shorts_df, 'SHORT')
         
         # Save to CSV
         shorts_file = os.path.join(DATA_DIR, "liquidation_closest_short_positions.csv")
-        risky_shorts_df.to_csv(shorts_file, index=False, float_format='%.2f')
+        OUTPUT_SINK.write_csv(shorts_file, risky_shorts_df, float_format='%.2f')
     
     # Combine risky long and short positions into a single file
     if (risky_longs_df is not None and not risky_longs_df.empty) or (risky_shorts_df is not None and not risky_shorts_df.empty):
@@ -434,7 +488,7 @@ def save_liquidation_risk_to_csv(risky_longs_df, risky_shorts_df):
         
         # Save to CSV
         combined_file = os.path.join(DATA_DIR, "liquidation_closest_positions.csv")
-        combined_df.to_csv(combined_file, index=False, float_format='%.2f')
+        OUTPUT_SINK.write_csv(combined_file, combined_df, float_format='%.2f')
         
         # Create a combined message about all files saved
         long_count = 0 if risky_longs_df is None else len(risky_longs_df)
@@ -455,22 +509,20 @@ def save_top_whale_positions_to_csv(longs_df, shorts_df):
     # Save top long positions
     if longs_df is not None and not longs_df.empty:
         # Add a direction column
-        longs_df = longs_df.copy()
-        longs_df['direction'] = 'LONG'
+        longs_df = longs_df.drop(columns=ENRICHED_COLUMNS, errors='ignore').assign(direction='LONG')
         
         # Save to CSV
         longs_file = os.path.join(DATA_DIR, "top_whale_long_positions.csv")
-        longs_df.to_csv(longs_file, index=False, float_format='%.2f')
+        OUTPUT_SINK.write_csv(longs_file, longs_df, float_format='%.2f')
         
     # Save top short positions
     if shorts_df is not None and not shorts_df.empty:
         # Add a direction column
-        shorts_df = shorts_df.copy()
-        shorts_df['direction'] = 'SHORT'
+        shorts_df = shorts_df.drop(columns=ENRICHED_COLUMNS, errors='ignore').assign(direction='SHORT')
         
         # Save to CSV
         shorts_file = os.path.join(DATA_DIR, "top_whale_short_positions.csv")
-        shorts_df.to_csv(shorts_file, index=False, float_format='%.2f')
+        OUTPUT_SINK.write_csv(shorts_file, shorts_df, float_format='%.2f')
 
     # Combine long and short positions into a single file
     if (longs_df is not None and not longs_df.empty) or (shorts_df is not None and not shorts_df.empty):
@@ -482,9 +534,15 @@ def save_top_whale_positions_to_csv(longs_df, shorts_df):
         
         # Save to CSV
         combined_file = os.path.join(DATA_DIR, "top_whale_positions.csv")
-        combined_df.to_csv(combined_file, index=False, float_format='%.2f')
+        OUTPUT_SINK.write_csv(combined_file, combined_df, float_format='%.2f')
         print(f"{Fore.GREEN}🟢 Nomad DevOPS says: Saved {len(combined_df)} combined top whale positions to {combined_file} ✨")
 
+def coin_mask(coins, coin):
+    """Rows of coins equal to coin ignoring case, so kpepe and KPEPE both select kPEPE"""
+    wanted = str(coin).upper()
+    return coins.isin([c for c in pd.unique(coins) if str(c).upper() == wanted])
+
+@METRICS.timed('process')
 def process_positions(df, coin_filter=None):
     """
     Process the position data into a more usable format, filtering positions below min value
@@ -496,85 +554,89 @@ def process_positions(df, coin_filter=None):
     
     print(f"{Fore.CYAN}🔍 Processing {len(df)} positions...")
     
-    # Filter positions below minimum value threshold
-    filtered_df = df[df['position_value'] >= MIN_POSITION_VALUE].copy()
+    # Filter positions below minimum value threshold (a new frame under copy-on-write, no copy needed)
+    filtered_df = df[df['position_value'] >= MIN_POSITION_VALUE]
     
-    # Make sure numeric columns are the right type
-    numeric_cols = ['entry_price', 'position_value', 'unrealized_pnl', 'liquidation_price', 'leverage']
-    for col in numeric_cols:
-        if col in filtered_df.columns:
-            filtered_df[col] = pd.to_numeric(filtered_df[col], errors='coerce')
-    
-    # Convert boolean columns if needed
-    if 'is_long' in filtered_df.columns and filtered_df['is_long'].dtype != bool:
-        filtered_df['is_long'] = filtered_df['is_long'].map({'True': True, 'False': False})
-    
-    # Validate position types for positions with valid liquidation prices
-    valid_liq_df = filtered_df[filtered_df['liquidation_price'] > 0].copy()
-    if not valid_liq_df.empty:
-        # Verify if the position type matches the relationship between entry and liquidation price
-        valid_liq_df['position_type_verified'] = np.where(
-            valid_liq_df['is_long'],
-            valid_liq_df['liquidation_price'] < valid_liq_df['entry_price'],  # Long should have liq price < entry
-            valid_liq_df['liquidation_price'] > valid_liq_df['entry_price']   # Short should have liq price > entry
-        )
-        
-        # Count inconsistencies
-        inconsistent_positions = valid_liq_df[~valid_liq_df['position_type_verified']]
-        
-        if len(inconsistent_positions) > 0:
-            print(f"{Fore.RED}⚠ WARNING: Found {len(inconsistent_positions)} positions with inconsistent position types!")
-            print(f"{Fore.YELLOW}↺ Correcting position types based on liquidation vs. entry price relationships...")
-            
-            # Create a corrected position type column based on liquidation vs entry price
-            valid_liq_df['is_long_corrected'] = valid_liq_df['liquidation_price'] < valid_liq_df['entry_price']
-            
-            # Update the is_long column with corrected values
-            valid_liq_df['is_long'] = valid_liq_df['is_long_corrected']
-            
-            # Update the filtered dataframe with corrected position types
-            filtered_df.loc[valid_liq_df.index, 'is_long'] = valid_liq_df['is_long']
-            
-            print(f"{Fore.GREEN}✓ Position types corrected!")
+    # Compact column types (categorical address/coin, bool is_long, ...) for every view downstream
+    filtered_df = apply_position_schema(filtered_df)
+    
+    # Validate position types for positions with valid liquidation prices. This is the only place
+    # sides are corrected; every view reads the corrected is_long.
+    liq = filtered_df['liquidation_price'].to_numpy(dtype=float)
+    entry = filtered_df['entry_price'].to_numpy(dtype=float)
+    is_long = filtered_df['is_long'].to_numpy(dtype=bool)
+    has_liq = liq > 0
+    long_by_prices = liq < entry  # Long should have liq price < entry, short liq price > entry
+    inconsistent = has_liq & ~np.where(is_long, long_by_prices, liq > entry)
+    
+    if inconsistent.any():
+        print(f"{Fore.RED}⚠ WARNING: Found {int(inconsistent.sum())} positions with inconsistent position types!")
+        print(f"{Fore.YELLOW}↺ Correcting position types based on liquidation vs. entry price relationships...")
+        filtered_df = filtered_df.assign(is_long=np.where(has_liq, long_by_prices, is_long))
+        print(f"{Fore.GREEN}✓ Position types corrected!")
     
     # Filter by coin if specified
     if coin_filter:
-        coin_filter = coin_filter.upper()  # Convert to uppercase for case-insensitive matching
-        filtered_df = filtered_df[filtered_df['coin'] == coin_filter]
+        filtered_df = filtered_df[coin_mask(filtered_df['coin'], coin_filter)]
+        if not filtered_df.empty:
+            coin_filter = str(filtered_df['coin'].iloc[0])  # As listed, e.g. kPEPE
         print(f"{Fore.MAGENTA}🪙 Filtering for {coin_filter} positions only")
     
     print(f"{Fore.GREEN}✓ Processed {len(filtered_df)} positions after filtering (min value: ${MIN_POSITION_VALUE})")
     return filtered_df
 
-def save_positions_to_csv(df, current_prices=None, quiet=False):
+# Columns added by enrich_positions; left out wherever the positions themselves are saved
+ENRICHED_COLUMNS = ['side', 'current_price', 'distance_to_liq_pct', 'distance_band_pct']
+
+@METRICS.timed('process')
+def enrich_positions(df, current_prices=None):
     """
-    Save all positions to a CSV file and create aggregated views
+    Add the price-dependent columns every view shares, in one vectorized pass per snapshot:
+    side label, current price, % distance to liquidation (NaN without a liquidation price)
+    and its 2% band. position_value is already the notional at the mark, so it is used as is.
+    Prices default to the cached mark of every coin held; coins without one fall back to
+    n.get_current_price (spot, then simulated).
     """
     if df is None or df.empty:
-        print(f"{Fore.RED}🔴 Nomad DevOPS says: No positions found to save! 😢")
-        return None, None
-    
-    # Format numeric columns
-    numeric_cols = ['entry_price', 'position_value', 'unrealized_pnl', 'liquidation_price', 'leverage']
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    # Save all positions
-    positions_file = os.path.join(DATA_DIR, "all_positions.csv")
-    df.to_csv(positions_file, index=False, float_format='%.2f')
-    
-    # Create and save aggregated view
-    agg_df = df.groupby(['coin', 'is_long']).agg({
+        return df
+    if current_prices is None:
+        current_prices = held_mark_prices(df, None, "the positions")
+    unpriced = [coin for coin in df['coin'].unique() if coin not in current_prices]
+    if unpriced:
+        print(f"{Fore.YELLOW}⚠ No mark price for {', '.join(map(str, unpriced))}; falling back to spot/simulated prices")
+        current_prices = {**current_prices, **{coin: n.get_current_price(coin) for coin in unpriced}}
+    price = df['coin'].map(current_prices).to_numpy(dtype=float)
+    liq = df['liquidation_price'].to_numpy(dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        distance = np.where(liq > 0, np.abs(price - liq) / price * 100, np.nan)
+    return df.assign(
+        side=np.where(df['is_long'].to_numpy(dtype=bool), 'LONG', 'SHORT'),
+        current_price=price,
+        distance_to_liq_pct=distance,
+        distance_band_pct=np.floor(distance / 2) * 2,
+    )
+
+def ensure_enriched(df):
+    """df itself if enrich_positions already ran on it, otherwise an enriched copy"""
+    if df is None or df.empty or 'distance_to_liq_pct' in df.columns:
+        return df
+    return enrich_positions(df)
+
+@METRICS.timed('aggregate')
+def aggregate_positions(df):
+    """
+    Aggregate positions by coin and side
+    """
+    agg_df = df.groupby(['coin', 'is_long'], observed=True).agg({
         'position_value': 'sum',
         'unrealized_pnl': 'sum',
         'address': 'count',
         'leverage': 'mean',  # Average leverage
-        'liquidation_price': lambda x: np.nan if all(pd.isna(x)) else np.nanmean(x)  # Average liquidation price, ignoring NaN values
+        'liquidation_price': 'mean'  # Average liquidation price; mean skips NaN values and stays vectorized
     }).reset_index()
     
     # Add direction and rename columns
-    agg_df['direction'] = agg_df['is_long'].apply(lambda x: 'LONG' if x else 'SHORT')
+    agg_df['direction'] = np.where(agg_df['is_long'], 'LONG', 'SHORT')
     agg_df = agg_df.rename(columns={
         'address': 'num_traders',
         'position_value': 'total_value',
@@ -589,9 +651,47 @@ def save_positions_to_csv(df, current_prices=None, quiet=False):
     # Sort by total value
     agg_df = agg_df.sort_values('total_value', ascending=False)
     
+    return agg_df
+
+def save_positions_to_csv(df, current_prices=None, quiet=False, agg_df=None, persist=True):
+    """
+    Save all positions to a CSV file and create aggregated views.
+    With persist=False the files and snapshot store are left alone (positions unchanged since the last save).
+    """
+    if df is None or df.empty:
+        print(f"{Fore.RED}🔴 Nomad DevOPS says: No positions found to save! 😢")
+        return None, None
+    
+    # Format numeric columns
+    numeric_cols = ['entry_price', 'position_value', 'unrealized_pnl', 'liquidation_price', 'leverage']
+    for col in numeric_cols:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    
+    # Views share the enriched frame; the saved positions keep their own columns
+    df = ensure_enriched(df)
+    positions_df = df.drop(columns=ENRICHED_COLUMNS)
+    
+    # Save all positions
+    if persist and OUTPUT_FORMAT in ("csv", "both"):
+        positions_file = os.path.join(DATA_DIR, "all_positions.csv")
+        OUTPUT_SINK.write_csv(positions_file, positions_df, float_format='%.2f')
+    
+    # Create and save aggregated view (reuse the caller's copy if the positions have not changed)
+    if agg_df is None:
+        agg_df = aggregate_positions(df)
+    
     # Save aggregated view
-    agg_file = os.path.join(DATA_DIR, "aggregated_positions.csv")
-    agg_df.to_csv(agg_file, index=False, float_format='%.2f')
+    if persist and OUTPUT_FORMAT in ("csv", "both"):
+        agg_file = os.path.join(DATA_DIR, "aggregated_positions.csv")
+        OUTPUT_SINK.write_csv(agg_file, agg_df, float_format='%.2f')
+    
+    # Append full-precision history to the snapshot store
+    if persist and OUTPUT_FORMAT in ("parquet", "both"):
+        store_dir = os.path.join(DATA_DIR, "store")
+        snapshot_id = new_snapshot_id()
+        OUTPUT_SINK.submit(SnapshotStore("dashboard_positions", store_dir).append, positions_df, snapshot_id)
+        OUTPUT_SINK.submit(SnapshotStore("dashboard_aggregates", store_dir).append, agg_df.copy(deep=False), snapshot_id)
     
     # Display summaries (for terminal display only, not affecting CSV output)
     print(f"\n{Fore.CYAN}{'-'*30} POSITION SUMMARY {'-'*30}")
@@ -640,36 +740,19 @@ def save_positions_to_csv(df, current_prices=None, quiet=False):
     all_long_liquidations = 0
     all_short_liquidations = 0
     
-    for coin in TOKENS_TO_ANALYZE:
-        if coin not in current_prices:
-            continue
-            
-        # Filter positions for the current coin
-        coin_positions = df[df['coin'] == coin].copy()
-        if coin_positions.empty:
-            continue
-            
-        # Add current price to the coin positions DataFrame
+    # Sort each coin/side by liquidation price once and query the 3% band
+    ladder = LiquidationLadder.from_positions(df, current_prices, coins=TOKENS_TO_ANALYZE)
+    
+    for _, coin_row in ladder.by_coin(3.0).iterrows():
+        coin = coin_row['coin']
         current_price = current_prices[coin]
-        coin_positions['current_price'] = current_price
         
         # Calculate price levels for 3% moves
         price_3pct_down = current_price * 0.97
         price_3pct_up = current_price * 1.03
         
-        # Calculate potential liquidations for long positions
-        long_liquidations = coin_positions[(coin_positions['is_long']) & 
-                                        (coin_positions['liquidation_price'] >= price_3pct_down) & 
-                                        (coin_positions['liquidation_price'] <= current_price)]
-        
-        total_long_liquidation_value = long_liquidations['position_value'].sum()
-        
-        # Calculate potential liquidations for short positions
-        short_liquidations = coin_positions[(~coin_positions['is_long']) & 
-                                         (coin_positions['liquidation_price'] <= price_3pct_up) & 
-                                         (coin_positions['liquidation_price'] >= current_price)]
-        
-        total_short_liquidation_value = short_liquidations['position_value'].sum()
+        total_long_liquidation_value = coin_row['long_value']
+        total_short_liquidation_value = coin_row['short_value']
         
         # Store liquidation values in dictionary
         total_long_liquidations[coin] = total_long_liquidation_value
@@ -697,7 +780,7 @@ def save_positions_to_csv(df, current_prices=None, quiet=False):
     print(f"{Fore.CYAN}{'-'*80}")
     
     # Overall market direction
-    if all_long_liquidations > all_short_liquidations:
+    if market_direction(all_long_liquidations, all_short_liquidations) == GO_SHORT:
         direction = f"MARKET DIRECTION (NFA): SHORT THE MARKET (${all_long_liquidations:.2f} long liquidations at risk within a 3% move of current price)"
         print(f"{Back.GREEN}{Fore.BLACK}{Style.BRIGHT}{direction}{Style.RESET_ALL}")
     else:
@@ -720,10 +803,11 @@ def save_positions_to_csv(df, current_prices=None, quiet=False):
         short_liq = total_short_liquidations[coin]
         
         # Only show directions for coins with significant liquidation risk
-        if long_liq < 10000 and short_liq < 10000:
+        call = coin_direction(long_liq, short_liq)
+        if call == NEUTRAL:
             continue
             
-        if long_liq > short_liq:
+        if call == GO_SHORT:
             rec = f"{coin}: SHORT (${long_liq:.2f} long liquidations vs ${short_liq:.2f} short within a 3% move)"
             print(f"{Back.GREEN}{Fore.BLACK}{Style.BRIGHT}{rec}{Style.RESET_ALL}")
         else:
@@ -736,6 +820,12 @@ def save_positions_to_csv(df, current_prices=None, quiet=False):
     # Create liquidation thresholds table
     create_liquidation_thresholds_table(df, current_prices, quiet)
     
+    # Liquidation density for every coin, not just TOKENS_TO_ANALYZE
+    display_liquidation_heatmap(df, current_prices)
+    
+    # The 3% view above treats liquidations as independent; this lets each band push price into the next
+    display_liquidation_cascades(df, current_prices)
+    
     # Combine the save notifications and execution time in one summary line
     long_count = len(longs_df) if longs_df is not None else 0
     short_count = len(shorts_df) if shorts_df is not None else 0
@@ -743,6 +833,32 @@ def save_positions_to_csv(df, current_prices=None, quiet=False):
     
     return df, agg_df
 
+def format_highlighted_position_lines(top_df, side_label, side_color):
+    """
+    Format rows of the highlighted (>$2M) positions table column by column
+    """
+    if top_df.empty:
+        return []
+    labels = concat(f"{side_label} #", format_column(range(1, len(top_df) + 1), 'd'))
+    usdc = [get_spot_position_usd(address) for address in top_df['address']]
+    leverage = np.char.ljust(concat(Fore.CYAN, format_column(top_df['leverage'], '>3'), "x"), 8)
+    # Positions without a liquidation price have no distance (NaN); show N/A rather than nan
+    distance = top_df['distance_to_liq_pct'].to_numpy(dtype=float)
+    missing = np.isnan(distance)
+    distance_text = np.where(missing, f"{'N/A':>8}", concat(format_column(np.where(missing, 0.0, distance), '>7.2f'), "%"))
+    return list(concat(
+        side_color, format_column(labels, '<10'), " | ",
+        Fore.YELLOW, format_column(top_df['coin'], '<4'), " | ",
+        side_color, "$", format_column(top_df['position_value'], '>15,.2f'), " | ",
+        Fore.BLUE, "$", format_column(top_df['entry_price'], '>10,.2f'), " | ",
+        Fore.RED, "$", format_column(top_df['liquidation_price'], '>10,.2f'), " | ",
+        Fore.MAGENTA, distance_text, " | ",
+        leverage, " | ",
+        Fore.BLUE, top_df['address'].to_numpy(dtype=str), " | ",
+        Fore.MAGENTA, "$", format_column(usdc, '>10,.2f')
+    ))
+
+@METRICS.timed('render')
 def display_highlighted_positions(df):
     """
     Display a table of highlighted positions (value > $2M) from the top 30 positions closest to liquidation
@@ -751,28 +867,15 @@ def display_highlighted_positions(df):
         return
     
     # Filter for positions with value > $2M and only for tokens we analyze
+    df = ensure_enriched(df)
     highlighted_df = df[
         (df['position_value'] > HIGHLIGHT_THRESHOLD) &
         (df['coin'].isin(TOKENS_TO_ANALYZE))
-    ].copy()
+    ]
     
     if highlighted_df.empty:
         return
     
-    # Get current prices only for tokens we have highlighted positions for
-    unique_coins = highlighted_df['coin'].unique()
-    current_prices = {coin: n.get_current_price(coin) for coin in unique_coins}
-    
-    # Add current price to the DataFrame
-    highlighted_df['current_price'] = highlighted_df['coin'].map(current_prices)
-    
-    # Calculate distance to liquidation percentage
-    highlighted_df['distance_to_liq_pct'] = np.where(
-        highlighted_df['is_long'],
-        abs((highlighted_df['current_price'] - highlighted_df['liquidation_price']) / highlighted_df['current_price'] * 100),
-        abs((highlighted_df['liquidation_price'] - highlighted_df['current_price']) / highlighted_df['current_price'] * 100)
-    )
-    
     # Split into longs and shorts
     highlighted_longs = highlighted_df[highlighted_df['is_long']].sort_values('distance_to_liq_pct')
     highlighted_shorts = highlighted_df[~highlighted_df['is_long']].sort_values('distance_to_liq_pct')
@@ -785,46 +888,30 @@ def display_highlighted_positions(df):
     if top_longs.empty and top_shorts.empty:
         return
     
-    print(f"\n{Fore.CYAN}{'-'*140}")
-    print(f"{Fore.CYAN}{'-'*15} 💰 POSITIONS CLOSEST TO LIQUIDATION (>${HIGHLIGHT_THRESHOLD:,}) 💰 {'-'*15}")
-    print(f"{Fore.CYAN}{'-'*140}")
+    # Fetch USDC balances for every displayed row concurrently before rendering
+    prefetch_spot_balances(list(top_longs['address']) + list(top_shorts['address']))
+    
+    buffer = RenderBuffer()
+    buffer.line(f"\n{Fore.CYAN}{'-'*140}")
+    buffer.line(f"{Fore.CYAN}{'-'*15} 💰 POSITIONS CLOSEST TO LIQUIDATION (>${HIGHLIGHT_THRESHOLD:,}) 💰 {'-'*15}")
+    buffer.line(f"{Fore.CYAN}{'-'*140}")
     
     # Create header with fixed widths
     header = f"{Fore.YELLOW}{'Position':<10} | {'Coin':<4} | {'Value':>17} | " + \
              f"{'Entry':>12} | {'Liq':>12} | {'Distance':>9} | {'Leverage':>8} | {'Address':>42} | {'USDC':>12}"
     separator = f"{Fore.CYAN}{'-'*10}--{'-'*4}--{'-'*17}--{'-'*12}--{'-'*12}--{'-'*9}--{'-'*8}--{'-'*42}--{'-'*12}"
     
-    print(header)
-    print(separator)
-    
-    # Display long positions
-    for i, (_, row) in enumerate(top_longs.iterrows(), 1):
-        usdc_balance = get_spot_position_usd(row['address'])
-        print(f"{Fore.GREEN}{'LONG #' + str(i):<10} | " +
-              f"{Fore.YELLOW}{row['coin']:<4} | " +
-              f"{Fore.GREEN}${row['position_value']:>15,.2f} | " +
-              f"{Fore.BLUE}${row['entry_price']:>10,.2f} | " +
-              f"{Fore.RED}${row['liquidation_price']:>10,.2f} | " +
-              f"{Fore.MAGENTA}{row['distance_to_liq_pct']:>7.2f}% | " +
-              f"{Fore.CYAN}{row['leverage']:>3}x".ljust(8) + " | " +
-              f"{Fore.BLUE}{row['address']} | " +
-              f"{Fore.MAGENTA}${usdc_balance:>10,.2f}")
-    
-    # Display short positions
-    for i, (_, row) in enumerate(top_shorts.iterrows(), 1):
-        usdc_balance = get_spot_position_usd(row['address'])
-        print(f"{Fore.RED}{'SHORT #' + str(i):<10} | " +
-              f"{Fore.YELLOW}{row['coin']:<4} | " +
-              f"{Fore.RED}${row['position_value']:>15,.2f} | " +
-              f"{Fore.BLUE}${row['entry_price']:>10,.2f} | " +
-              f"{Fore.RED}${row['liquidation_price']:>10,.2f} | " +
-              f"{Fore.MAGENTA}{row['distance_to_liq_pct']:>7.2f}% | " +
-              f"{Fore.CYAN}{row['leverage']:>3}x".ljust(8) + " | " +
-              f"{Fore.BLUE}{row['address']} | " +
-              f"{Fore.MAGENTA}${usdc_balance:>10,.2f}")
+    buffer.line(header)
+    buffer.line(separator)
+    
+    # Display long positions, then short positions
+    buffer.lines(format_highlighted_position_lines(top_longs, "LONG", Fore.GREEN))
+    buffer.lines(format_highlighted_position_lines(top_shorts, "SHORT", Fore.RED))
               
-    print(f"{Fore.CYAN}{'-'*140}")
+    buffer.line(f"{Fore.CYAN}{'-'*140}")
+    buffer.flush()
 
+@METRICS.timed('render')
 def display_market_metrics():
     """
     Display market metrics (funding rates) in a compact format
@@ -855,23 +942,14 @@ def display_market_metrics():
         
         # Get Hyperliquid funding data
         try:
-            url = "https://api.hyperliquid.xyz/info"
-            headers = {"Content-Type": "application/json"}
-            body = {"type": "metaAndAssetCtxs"}
-            
-            # Make the request to the API
-            response = requests.post(url, headers=headers, json=body)
-            response.raise_for_status()
-            hl_data = response.json()
-            
-            # Create a mapping of coins to their funding rates
+            # Create a mapping of coins to their funding rates from the shared market snapshot
             hl_funding_rates = {}
-            for i, asset in enumerate(hl_data[0]['universe']):
-                if asset['name'] in TOKENS_TO_ANALYZE:
-                    funding_rate = float(hl_data[1][i]['funding'])
+            for token in TOKENS_TO_ANALYZE:
+                funding_rate = n.MARKET_SNAPSHOT.funding_rate(token)
+                if funding_rate is not None:
                     # Convert hourly rate to yearly (24 hours * 365 days)
                     yearly_rate = funding_rate * 24 * 365 * 100  # Convert to percentage
-                    hl_funding_rates[asset['name']] = yearly_rate
+                    hl_funding_rates[token] = yearly_rate
                     
         except Exception as e:
             print(f"{Fore.RED}✗ Error fetching Hyperliquid funding rates: {str(e)}")
@@ -919,6 +997,7 @@ def display_market_metrics():
         print(f"{Fore.RED}✗ Error displaying market metrics: {str(e)}")
         print(f"{Fore.RED}■ Stack trace:\n{traceback.format_exc()}")
 
+@METRICS.timed('render')
 def create_liquidation_thresholds_table(df, current_prices, quiet=False):
     """
     Create and display a table of liquidation thresholds at different price move percentages
@@ -949,67 +1028,23 @@ def create_liquidation_thresholds_table(df, current_prices, quiet=False):
         'Direction': []
     }
     
-    # Calculate liquidations for each threshold
-    for threshold in all_thresholds:
-        total_long_liquidations = 0
-        total_short_liquidations = 0
-        
-        for coin in TOKENS_TO_ANALYZE:
-            if coin not in current_prices:
-                continue
-                
-            # Filter positions for the current coin
-            coin_positions = df[df['coin'] == coin].copy()
-            if coin_positions.empty:
-                continue
-                
-            # Get current price and calculate threshold prices
-            current_price = current_prices[coin]
-            price_down = current_price * (1 - threshold/100)
-            price_up = current_price * (1 + threshold/100)
-            
-            # Calculate liquidations for long positions
-            long_liquidations = coin_positions[(coin_positions['is_long']) & 
-                                            (coin_positions['liquidation_price'] >= price_down) & 
-                                            (coin_positions['liquidation_price'] <= current_price)]
-            
-            long_value = long_liquidations['position_value'].sum()
-            
-            # Calculate liquidations for short positions
-            short_liquidations = coin_positions[(~coin_positions['is_long']) & 
-                                             (coin_positions['liquidation_price'] <= price_up) & 
-                                             (coin_positions['liquidation_price'] >= current_price)]
-            
-            short_value = short_liquidations['position_value'].sum()
-            
-            # Add to totals
-            total_long_liquidations += long_value
-            total_short_liquidations += short_value
-        
-        # Add data to table
-        total_liquidations = total_long_liquidations + total_short_liquidations
-        
-        # Calculate imbalance as percentage
-        if total_liquidations > 0:
-            imbalance_pct = ((total_long_liquidations - total_short_liquidations) / total_liquidations) * 100
-        else:
-            imbalance_pct = 0
-            
-        # Determine direction based on imbalance percentage
-        if total_liquidations == 0:
-            direction = ""  # Empty string for no liquidations
-        elif abs(imbalance_pct) < 5:  # Less than 5% imbalance
-            direction = "NEUTRAL"
-        elif imbalance_pct > 0:
-            direction = "SHORT"
-        else:
-            direction = "LONG"
-            
-        table_data['Long Liquidations ($)'].append(total_long_liquidations)
-        table_data['Short Liquidations ($)'].append(total_short_liquidations)
-        table_data['Total Liquidations ($)'].append(total_liquidations)
-        table_data['Imbalance (%)'].append(imbalance_pct)
-        table_data['Direction'].append(direction)
+    # Calculate liquidations for every threshold with one ladder query
+    ladder = LiquidationLadder.from_positions(df, current_prices, coins=TOKENS_TO_ANALYZE)
+    curve = ladder.curve(all_thresholds)
+    
+    # Imbalance and direction use the same rules signal_replay scores over history
+    long_values = curve['long_value'].to_numpy(dtype=float)
+    short_values = curve['short_value'].to_numpy(dtype=float)
+    totals = long_values + short_values
+    imbalances = imbalance_pct(long_values, short_values)
+    directions = threshold_direction(long_values, short_values)
+    
+    for long_value, short_value, total, imbalance, call in zip(long_values, short_values, totals, imbalances, directions):
+        table_data['Long Liquidations ($)'].append(long_value)
+        table_data['Short Liquidations ($)'].append(short_value)
+        table_data['Total Liquidations ($)'].append(total)
+        table_data['Imbalance (%)'].append(imbalance)
+        table_data['Direction'].append(DIRECTION_LABELS[call] if total != 0 else "")  # Empty when nothing is at risk
     
     # Create and display the overall table
     table_df = pd.DataFrame(table_data)
@@ -1050,20 +1085,105 @@ def create_liquidation_thresholds_table(df, current_prices, quiet=False):
     
     # Save the table to CSV
     table_file = os.path.join(DATA_DIR, "liquidation_thresholds_table.csv")
-    table_df.to_csv(table_file, index=False)
+    OUTPUT_SINK.write_csv(table_file, table_df)
+
+def held_mark_prices(df, fallback_prices, purpose):
+    """Mark price of every coin held in df, from the cached market snapshot"""
+    try:
+        mark_prices = n.MARKET_SNAPSHOT.mark_prices()
+    except Exception as e:
+        print(f"{Fore.RED}✗ Error fetching mark prices for {purpose}: {str(e)}")
+        mark_prices = fallback_prices or {}
+    
+    held_coins = set(df['coin'].unique())
+    return {coin: price for coin, price in mark_prices.items() if coin in held_coins and price and price > 0}
+
+@METRICS.timed('render')
+def display_liquidation_heatmap(df, fallback_prices=None):
+    """
+    Display and save liquidation value by % distance from mark for every coin with positions,
+    computed in one vectorized pass over the whole frame
+    """
+    current_prices = held_mark_prices(df, fallback_prices, "the heatmap")
+    if not current_prices:
+        print(f"{Fore.YELLOW}⚠ No prices available for the liquidation heatmap!")
+        return None
+    
+    heatmap = LiquidationHeatmap.from_positions(df, current_prices)
+    
+    # Save the full coins x buckets matrix, one row per coin and side
+    heatmap_df = pd.concat([
+        heatmap.to_frame('long').assign(side='LONG'),
+        heatmap.to_frame('short').assign(side='SHORT'),
+    ]).reset_index()
+    heatmap_df = heatmap_df[['coin', 'side'] + heatmap.labels()]
+    heatmap_file = os.path.join(DATA_DIR, "liquidation_heatmap.csv")
+    OUTPUT_SINK.write_csv(heatmap_file, heatmap_df, float_format='%.2f')
+    
+    buffer = RenderBuffer()
+    buffer.line(f"\n{Fore.CYAN}{'-'*80}")
+    shown = min(HEATMAP_TOP_COINS, len(current_prices))
+    buffer.line(f"{Fore.CYAN}{'-'*12} 🔥 LIQUIDATION HEATMAP: TOP {shown} OF {len(current_prices)} COINS BY % FROM MARK 🔥 {'-'*12}")
+    buffer.line(f"{Fore.CYAN}{'-'*80}")
+    buffer.lines(heatmap.render(HEATMAP_TOP_COINS))
+    buffer.flush()
+    return heatmap
+
+@METRICS.timed('render')
+def display_liquidation_cascades(df, fallback_prices=None):
+    """
+    Sweep cascade_sim's starting shocks over every coin held (price impact scaled from each
+    coin's 24h volume), save the full sweep and display the CASCADE_DISPLAY_SHOCK outcome
+    for TOKENS_TO_ANALYZE
+    """
+    current_prices = held_mark_prices(df, fallback_prices, "the cascade simulation")
+    if not current_prices:
+        print(f"{Fore.YELLOW}⚠ No prices available for the cascade simulation!")
+        return None
+    
+    ladder = LiquidationLadder.from_positions(df, current_prices)
+    try:
+        impact = impact_from_volume({coin: n.MARKET_SNAPSHOT.day_volume(coin) for coin in current_prices})
+    except Exception as e:
+        print(f"{Fore.RED}✗ Error fetching 24h volumes, using the default price impact: {str(e)}")
+        impact = None
+    cascades = CascadeSimulator(ladder, usd_per_pct=impact).run()
+    
+    cascade_file = os.path.join(DATA_DIR, "liquidation_cascades.csv")
+    OUTPUT_SINK.write_csv(cascade_file, cascades, float_format='%.4f')
+    
+    shown = cascades[np.isclose(cascades['shock_pct'], CASCADE_DISPLAY_SHOCK) & cascades['coin'].isin(TOKENS_TO_ANALYZE)]
+    buffer = RenderBuffer()
+    buffer.line(f"\n{Fore.CYAN}{'-'*80}")
+    buffer.line(f"{Fore.CYAN}{'-'*15} 🌊 LIQUIDATION CASCADES FROM A {CASCADE_DISPLAY_SHOCK:g}% SHOCK (WITH PRICE IMPACT) 🌊 {'-'*15}")
+    buffer.line(f"{Fore.CYAN}{'-'*80}")
+    buffer.line(f"{Fore.YELLOW}{'Coin':<8} {'Move':<6} {'Final Move':>11} {'Final Price':>14} {'Liquidated ($)':>18} {'Rounds':>7}")
+    for _, row in shown.iterrows():
+        color = Fore.GREEN if row['direction'] == 'DOWN' else Fore.RED
+        final_price = f"${row['final_price']:,.2f}"
+        liquidated = f"${row['liquidated_usd']:,.2f}"
+        buffer.line(f"{color}{row['coin']:<8} {row['direction']:<6} {row['final_move_pct']:>10.2f}% "
+                    f"{final_price:>14} {liquidated:>18} {row['rounds']:>7}")
+    if shown.empty:
+        buffer.line(f"{Fore.YELLOW}No positions in {', '.join(TOKENS_TO_ANALYZE)} to cascade")
+    buffer.line(f"{Fore.MAGENTA}↓ Longs cascade on a move DOWN, shorts on a move UP. Full sweep of "
+                f"{cascades['shock_pct'].nunique()} shocks x {len(current_prices)} coins saved to liquidation_cascades.csv")
+    buffer.flush()
+    return cascades
 
 '''This section uses MoonDevs proprietary API to fetch positions data
 If you dont have the key simply use:
 pd.read_csv to load your own data
 Im going to comment out this section and keep it just for posterity
 '''
-def fetch_positions_from_api():
+@METRICS.timed('fetch')
+def fetch_positions_from_api(api=None):
     """
-    Fetch positions from Nomad DevOPS API
+    Fetch positions from Nomad DevOPS API (reusing api if a client is passed in)
     """
     try:
         # Initialize the API silently
-        api = MoonDevAPI()  # Changed from NomadDevAPI to MoonDevAPI to match the import
+        api = api or MoonDevAPI()  # Changed from NomadDevAPI to MoonDevAPI to match the import
         
         # Get positions data from the API
         positions_df = api.get_positions_hlp()
@@ -1101,13 +1221,14 @@ def fetch_positions_from_api():
         print(f"{Fore.RED}■ Stack trace:\n{traceback.format_exc()}")
         return None
 
-def fetch_aggregated_positions_from_api():
+@METRICS.timed('fetch')
+def fetch_aggregated_positions_from_api(api=None):
     """
-    Fetch aggregated positions from Nomad DevOPS API
+    Fetch aggregated positions from Nomad DevOPS API (reusing api if a client is passed in)
     """
     try:
         # Initialize the API silently
-        api = MoonDevAPI()
+        api = api or MoonDevAPI()
         
         # Get aggregated positions data from the API
         agg_positions_df = api.get_agg_positions_hlp()
@@ -1149,15 +1270,11 @@ def fetch_aggregated_positions_from_api():
         print(f"{Fore.GREEN}🟢 Nomad DevOPS says: Created mock aggregated data with {len(agg_positions_df)} rows for testing! ✨")
         return agg_positions_df
 
-def bot():
-    """Main function to run the position tracker (renamed from main to bot)"""
+def parse_args(argv=None):
+    """Parse command line arguments and apply them to the module configuration"""
     # Use global configuration variables
-    global MIN_POSITION_VALUE, TOP_N_POSITIONS
-    
-    # Display Nomad DevOPS banner
-    print(NOMAD_BANNER_ALT)
+    global MIN_POSITION_VALUE, TOP_N_POSITIONS, OUTPUT_FORMAT
     
-    # Parse command line arguments
     parser = argparse.ArgumentParser(description="🔍 Nomad DevOPS's Hyperliquid Whale Position Tracker (API Version)")
     parser.add_argument('--min-value', type=int, default=MIN_POSITION_VALUE,
                       help=f'Minimum position value to consider (default: {MIN_POSITION_VALUE})')
@@ -1173,85 +1290,290 @@ def bot():
                       help='Reduce verbosity of output')
     parser.add_argument('--no-symbol-debug', action='store_true', default=True,
                       help='Disable printing of individual symbols during analysis')
-    args = parser.parse_args()
+    parser.add_argument('--store', choices=['csv', 'parquet', 'both'], default=OUTPUT_FORMAT,
+                      help=f'Output format for all/aggregated positions (default: {OUTPUT_FORMAT})')
+    parser.add_argument('--price-ttl', type=float, default=n.MARKET_SNAPSHOT_TTL,
+                      help=f'Seconds to reuse downloaded market data for price/funding lookups (default: {n.MARKET_SNAPSHOT_TTL})')
+    parser.add_argument('--all-coins', action='store_true',
+                      help='Analyze every coin with positions instead of only TOKENS_TO_ANALYZE')
+    parser.add_argument('--reactive', action='store_true',
+                      help='Stream mark prices over WebSocket and recompute the ticked coin on every move')
+    parser.add_argument('--ws-url', type=str, default=WS_URL,
+                      help=f'WebSocket endpoint for --reactive, e.g. a local ws_standin.py (default: {WS_URL})')
+    parser.add_argument('--interval', type=float, default=REFRESH_INTERVAL,
+                      help=f'Seconds between dashboard refreshes (default: {REFRESH_INTERVAL})')
+    parser.add_argument('--metrics', action='store_true',
+                      help=f'Write per-stage timings, request stats and peak memory to {METRICS_DIR} after every refresh')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                      help='Also serve the Prometheus metrics at http://127.0.0.1:PORT/metrics')
+    args = parser.parse_args(argv)
     
     # Update configuration based on arguments
     MIN_POSITION_VALUE = args.min_value
     TOP_N_POSITIONS = args.top_n
+    n.MARKET_SNAPSHOT.ttl = args.price_ttl
+    OUTPUT_FORMAT = args.store
+    return args
+
+def frame_fingerprint(df):
+    """Order-sensitive content hash of a DataFrame, used to tell whether a download changed"""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.blake2b(row_hashes.tobytes() + ','.join(map(str, df.columns)).encode(), digest_size=16).hexdigest()
+
+class DashboardEngine:
+    """
+    Dashboard state that lives between refreshes: one API client, the processed positions,
+    their aggregates and a fingerprint of each downloaded dataset. A tick still downloads
+    both datasets, but positions are only reprocessed, re-aggregated and re-saved when the
+    download actually changed. Prices, funding and spot balances come from the module-level
+    TTL caches, so they are only refetched once they expire.
+    """
     
-    start_time = time.time()
-    
-    # Ensure data directory exists
-    ensure_data_dir()
-    
-    # Fetch aggregated positions data first (this is faster)
-    agg_df = fetch_aggregated_positions_from_api()
-    
-    if agg_df is not None:
+    def __init__(self, args):
+        self.args = args
+        self.api = None
+        self.agg_df = None
+        self.processed_df = None
+        self.position_agg_df = None
+        self.ticks = 0
+        self._fingerprints = {}
+        ensure_data_dir()
+        self.history = SignalHistory(os.path.join(DATA_DIR, "history"))
+        if args.metrics_port:
+            METRICS.serve(args.metrics_port)
+    
+    def client(self):
+        """The API client, created once and reused by every tick"""
+        if self.api is None:
+            self.api = MoonDevAPI()
+        return self.api
+    
+    def _changed(self, name, df):
+        fingerprint = frame_fingerprint(df)
+        changed = self._fingerprints.get(name) != fingerprint
+        self._fingerprints[name] = fingerprint
+        return changed
+    
+    def refresh_aggregates(self):
+        """Download the aggregated positions; re-save and re-filter them only if they changed"""
+        agg_df = fetch_aggregated_positions_from_api(self.client())
+        if agg_df is None or not self._changed('aggregates', agg_df):
+            return self.agg_df
+        
         # Save aggregated positions
         agg_file = os.path.join(DATA_DIR, "aggregated_positions_from_api.csv")
-        agg_df.to_csv(agg_file, index=False, float_format='%.2f')
+        OUTPUT_SINK.write_csv(agg_file, agg_df, float_format='%.2f')
         
         # Add direction column
-        agg_df['direction'] = agg_df['is_long'].apply(lambda x: 'LONG' if x else 'SHORT')
+        agg_df['direction'] = np.where(agg_df['is_long'], 'LONG', 'SHORT')
         
         # Filter by coin if specified
-        if args.coin:
-            coin = args.coin.upper()
-            agg_df = agg_df[agg_df['coin'] == coin]
+        if self.args.coin:
+            agg_df = agg_df[coin_mask(agg_df['coin'], self.args.coin)]
         
-        if not args.quiet:
-            # Display aggregated summaries
-            print(f"\n{Fore.CYAN}{'-'*30} AGGREGATED POSITION SUMMARY {'-'*30}")
-            display_cols = ['coin', 'direction', 'total_value', 'num_traders', 'liquidation_price']
-            
-            # Temporarily format numbers with commas for display only
-            with pd.option_context('display.float_format', '{:,.2f}'.format):
-                print(f"{Fore.WHITE}{agg_df[display_cols]}")
-            
-            print(f"\n{Fore.GREEN}★ TOP LONG POSITIONS (AGGREGATED):")
-            print(f"{Fore.GREEN}{agg_df[agg_df['is_long']][display_cols].head()}")
-            
-            print(f"\n{Fore.RED}★ TOP SHORT POSITIONS (AGGREGATED):")
-            print(f"{Fore.RED}{agg_df[~agg_df['is_long']][display_cols].head()}")
-    
-    # If not only showing aggregated data, fetch and process detailed positions
-    if not args.agg_only:
-        # Fetch detailed positions data
-        positions_df = fetch_positions_from_api()
+        self.agg_df = agg_df
+        return self.agg_df
+    
+    def refresh_positions(self):
+        """Download the detailed positions; returns (processed positions, changed since last tick)"""
+        positions_df = fetch_positions_from_api(self.client())
+        if positions_df is None:
+            return self.processed_df, False
+        if not self._changed('positions', positions_df):
+            return self.processed_df, False
+        METRICS.add_rows('process', len(positions_df))
+        
+        # Process positions (filter by min value, etc.)
+        self.processed_df = process_positions(positions_df, self.args.coin)
+        
+        # Follow whichever coins are actually held when watching every coin
+        if self.args.all_coins and not self.processed_df.empty:
+            global TOKENS_TO_ANALYZE
+            TOKENS_TO_ANALYZE = sorted(self.processed_df['coin'].unique())
+        self.position_agg_df = aggregate_positions(self.processed_df) if not self.processed_df.empty else None
+        return self.processed_df, True
+    
+    def record_history(self, df, fallback_prices):
+        """Queue this tick's marks and liquidation bands for the signal_replay history"""
+        if OUTPUT_FORMAT not in ("parquet", "both"):
+            return
+        marks = held_mark_prices(df, fallback_prices, "the history")
+        OUTPUT_SINK.submit(self.history.record, df.copy(deep=False), marks, datetime.now(timezone.utc))
+    
+    def display_aggregates(self, agg_df):
+        # Display aggregated summaries
+        print(f"\n{Fore.CYAN}{'-'*30} AGGREGATED POSITION SUMMARY {'-'*30}")
+        display_cols = ['coin', 'direction', 'total_value', 'num_traders', 'liquidation_price']
+        
+        # Temporarily format numbers with commas for display only
+        with pd.option_context('display.float_format', '{:,.2f}'.format):
+            print(f"{Fore.WHITE}{agg_df[display_cols]}")
+        
+        print(f"\n{Fore.GREEN}★ TOP LONG POSITIONS (AGGREGATED):")
+        print(f"{Fore.GREEN}{agg_df[agg_df['is_long']][display_cols].head()}")
         
-        if positions_df is not None:
-            # Process positions (filter by min value, etc.)
-            processed_df = process_positions(positions_df, args.coin)
+        print(f"\n{Fore.RED}★ TOP SHORT POSITIONS (AGGREGATED):")
+        print(f"{Fore.RED}{agg_df[~agg_df['is_long']][display_cols].head()}")
+    
+    def tick(self):
+        """One dashboard refresh"""
+        start_time = time.time()
+        self.ticks += 1
+        METRICS.start_run()
+        
+        # Fetch aggregated positions data first (this is faster)
+        agg_df = self.refresh_aggregates()
+        if agg_df is not None and not self.args.quiet:
+            self.display_aggregates(agg_df)
+        
+        # If not only showing aggregated data, fetch and process detailed positions
+        changed = False
+        if not self.args.agg_only:
+            processed_df, changed = self.refresh_positions()
             
-            if not processed_df.empty:
+            if processed_df is not None and not processed_df.empty:
+                # Prices move every tick, so the shared derived columns are recomputed once here
+                enriched_df = enrich_positions(processed_df)
+                
                 # Display top individual positions and get the dataframes
-                longs_df, shorts_df = display_top_individual_positions(processed_df)
+                longs_df, shorts_df = display_top_individual_positions(enriched_df)
                 
-                # Save top whale positions to CSV
-                save_top_whale_positions_to_csv(longs_df, shorts_df)
+                # Top whales only depend on the positions, so only re-save them when those changed
+                if changed:
+                    save_top_whale_positions_to_csv(longs_df, shorts_df)
                 
                 # Get risk metrics and current prices in one step
-                risky_longs_df, risky_shorts_df, current_prices = display_risk_metrics(processed_df)
+                risky_longs_df, risky_shorts_df, current_prices = display_risk_metrics(enriched_df)
                 
                 # Save liquidation risk positions to CSV
                 save_liquidation_risk_to_csv(risky_longs_df, risky_shorts_df)
                 
-                # Pass the already fetched current prices to save_positions_to_csv
-                positions_df, _ = save_positions_to_csv(processed_df, current_prices, quiet=args.quiet)
-            else:
+                # Pass the already fetched current prices and cached aggregates to save_positions_to_csv
+                save_positions_to_csv(enriched_df, current_prices, quiet=self.args.quiet,
+                                      agg_df=self.position_agg_df, persist=changed)
+                
+                # Every tick goes into the band history, since marks move even when positions don't
+                self.record_history(processed_df, current_prices)
+            elif processed_df is not None:
                 print(f"{Fore.RED}⚠ No positions found after filtering! Try adjusting your filters.")
-    
-    # Calculate and display execution time
-    execution_time = time.time() - start_time
-    print(f"\n{Fore.CYAN}⏱ Analysis completed in {execution_time:.2f} seconds")
+        
+        # Calculate and display execution time
+        execution_time = time.time() - start_time
+        reused = "" if changed or self.ticks == 1 or self.args.agg_only else " (positions unchanged, reused cached analysis)"
+        print(f"\n{Fore.CYAN}⏱ Analysis completed in {execution_time:.2f} seconds{reused}")
+        if self.args.metrics:
+            try:
+                METRICS.export(METRICS_DIR, "dashboard")
+            except Exception as e:
+                print(f"{Fore.RED}✗ Error writing metrics: {str(e)}")
+
+    def build_book(self):
+        """Liquidation book over the analyzed coins of the current processed positions"""
+        df = self.processed_df
+        if df is None or df.empty:
+            return LiquidationBook()
+        return LiquidationBook.from_positions(df[df['coin'].isin(TOKENS_TO_ANALYZE)])
+    
+    def render_live(self, reactor, coin=None):
+        """Compact live view straight from the reactor's cached per-coin views"""
+        buffer = RenderBuffer()
+        view = reactor.views.get(coin) if coin else None
+        tick_note = f" | {coin} ${view.price:,.6g} recomputed in {view.compute_ms:.2f} ms" if view else ""
+        buffer.line(f"\n{Fore.CYAN}{Style.BRIGHT}⚡ LIVE LIQUIDATION WATCH {datetime.now().strftime('%H:%M:%S')}{tick_note}")
+        buffer.line(f"{Fore.CYAN}{'-'*80}")
+        
+        for is_long, label, color in ((True, "LONGS", Fore.GREEN), (False, "SHORTS", Fore.RED)):
+            buffer.line(f"{color}{Style.BRIGHT}{label} CLOSEST TO LIQUIDATION")
+            for distance, held_coin, liq, value, address in reactor.closest(is_long, REACTIVE_TOP_N):
+                buffer.line(f"{color}{held_coin:<8} ${value:>15,.2f}  liq ${liq:>14,.6g}  {distance:>6.2f}% away  "
+                            f"{address[:6]}...{address[-4:]}")
+        
+        thresholds, long_totals, short_totals = reactor.threshold_totals()
+        buffer.line(f"{Fore.YELLOW}{'Threshold':<12} | {'Long Liquidations':<20} | {'Short Liquidations':<20} | {'Imbalance':<10}")
+        for pct, long_value, short_value in zip(thresholds, long_totals, short_totals):
+            total = long_value + short_value
+            imbalance = (long_value - short_value) / total * 100 if total > 0 else 0
+            imbalance_color = Fore.GREEN if imbalance < 0 else (Fore.RED if imbalance > 0 else Fore.YELLOW)
+            buffer.line(f"{Fore.WHITE}{f'0-{pct:g}%':<12} | {Fore.GREEN}{f'${long_value:,.2f}':<20} | "
+                        f"{Fore.RED}{f'${short_value:,.2f}':<20} | {imbalance_color}{imbalance:+.2f}%")
+        buffer.flush()
+    
+    async def run_reactive(self, ws_url=WS_URL):
+        """
+        Full dashboard once, then a live view driven by streamed mark prices: each tick
+        recomputes only the moved coin (see tick_reactor). Positions are re-downloaded
+        every --interval seconds and the liquidation book is rebuilt only if they changed.
+        """
+        self.tick()
+        reactor = TickReactor(self.build_book(), DEFAULT_THRESHOLDS, REACTIVE_TOP_N, coins=TOKENS_TO_ANALYZE)
+        try:
+            reactor.on_mids({coin: str(price) for coin, price in n.MARKET_SNAPSHOT.mark_prices().items()})
+        except Exception as e:
+            print(f"{Fore.YELLOW}⚠ Could not seed prices, waiting for the first tick: {str(e)}")
+        
+        state = {'last_render': 0.0, 'pending': None}
+        
+        def on_mids(mids):
+            n.MARKET_SNAPSHOT.apply_mids(mids)
+            changed = reactor.on_mids(mids)
+            if not changed:
+                return
+            if time.monotonic() - state['last_render'] >= REACTIVE_RENDER_INTERVAL:
+                self.render_live(reactor, changed[0])
+                state['last_render'] = time.monotonic()
+                state['pending'] = None
+            else:
+                state['pending'] = changed[0]
+        
+        ingestor = WsIngestor([], PositionTable(MIN_POSITION_VALUE), ws_url, on_mids=on_mids)
+        ingest_task = asyncio.create_task(ingestor.run())
+        next_refresh = time.monotonic() + self.args.interval
+        try:
+            while True:
+                await asyncio.sleep(0.1)
+                if ingest_task.done():
+                    ingest_task.result()
+                    return
+                if time.monotonic() >= next_refresh:
+                    _, changed = await asyncio.to_thread(self.refresh_positions)
+                    if changed:
+                        reactor.coins = set(TOKENS_TO_ANALYZE)
+                        reactor.reset(self.build_book())
+                        state['pending'] = state['pending'] or next(iter(reactor.views), None)
+                    next_refresh = time.monotonic() + self.args.interval
+                if state['pending'] and time.monotonic() - state['last_render'] >= REACTIVE_RENDER_INTERVAL:
+                    self.render_live(reactor, state['pending'])
+                    state['last_render'] = time.monotonic()
+                    state['pending'] = None
+        finally:
+            ingestor.stop()
+            ingest_task.cancel()
+
+def bot():
+    """Run the position tracker once from a cold start (renamed from main to bot)"""
+    # Display Nomad DevOPS banner
+    print(NOMAD_BANNER_ALT)
+    args = parse_args()
+    DashboardEngine(args).tick()
 
 if __name__ == "__main__":
+    # Banner, arguments and the engine are set up once; every refresh reuses them
+    print(NOMAD_BANNER_ALT)
+    args = parse_args()
+    engine = DashboardEngine(args)
+    
+    if args.reactive:
+        try:
+            asyncio.run(engine.run_reactive(args.ws_url))
+        except KeyboardInterrupt:
+            print(f"{Fore.YELLOW}Reactive dashboard stopped")
+        sys.exit(0)
+    
     # Initial run
-    bot()
+    engine.tick()
     
-    # Schedule the main function to run every minute
-    schedule.every(1).minutes.do(bot)
+    # Schedule the engine to refresh every interval
+    schedule.every(args.interval).seconds.do(engine.tick)
     
     while True:
         try:
@@ -1262,4 +1584,4 @@ if __name__ == "__main__":
             print(f"{Fore.RED}Encountered an error: {e}")
             print(f"{Fore.RED}■ Stack trace:\n{traceback.format_exc()}")
             # Wait before retrying to avoid rapid error logging
-            time.sleep(10)
\ No newline at end of file
+            time.sleep(10)
@@ -0,0 +1,303 @@
+# liquidation_book.py - Incrementally updated per-coin/side liquidation index with range-sum and nearest queries
+
+import heapq
+import math
+from bisect import bisect_left, bisect_right, insort
+from itertools import repeat
+from operator import itemgetter
+
+import numpy as np
+
+BUCKET_SIZE = 512  # Target entries per bucket; a bucket splits at twice this
+_LIQ = itemgetter(0)
+
+class _Fenwick:
+    """Binary indexed tree over bucket sums: point update and prefix sum in O(log buckets)"""
+
+    def __init__(self, values):
+        self.tree = [0.0] + list(values)
+        size = len(self.tree)
+        for i in range(1, size):
+            parent = i + (i & -i)
+            if parent < size:
+                self.tree[parent] += self.tree[i]
+
+    def add(self, i, delta):
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        """Sum of the first i buckets"""
+        total = 0.0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+class LiquidationLevels:
+    """
+    One coin/side: (liquidation price, address, value) entries kept sorted in buckets of
+    about BUCKET_SIZE, with each bucket's value sum in a Fenwick tree. Insert and remove
+    cost O(log n + BUCKET_SIZE); value with liquidation price in a range costs
+    O(log n + BUCKET_SIZE) whatever the size of the range.
+    """
+
+    def __init__(self):
+        self._buckets = []   # sorted lists of (liq, address, value)
+        self._max_liq = []   # last liquidation price of each bucket, for bisecting to a bucket
+        self._sums = []      # value sum of each bucket
+        self._tree = _Fenwick([])
+        self._len = 0
+
+    @classmethod
+    def from_sorted(cls, entries):
+        """Build from entries already sorted by (liq, address)"""
+        levels = cls()
+        levels._buckets = [entries[i:i + BUCKET_SIZE] for i in range(0, len(entries), BUCKET_SIZE)]
+        levels._len = len(entries)
+        levels._reindex()
+        return levels
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for bucket in self._buckets:
+            yield from bucket
+
+    def _reindex(self):
+        self._max_liq = [bucket[-1][0] for bucket in self._buckets]
+        self._sums = [math.fsum(entry[2] for entry in bucket) for bucket in self._buckets]
+        self._tree = _Fenwick(self._sums)
+
+    def total(self):
+        return self._tree.prefix(len(self._buckets))
+
+    def insert(self, liq, address, value):
+        entry = (liq, address, value)
+        if not self._buckets:
+            self._buckets.append([entry])
+            self._len = 1
+            self._reindex()
+            return
+
+        i = min(bisect_left(self._max_liq, liq), len(self._buckets) - 1)
+        bucket = self._buckets[i]
+        insort(bucket, entry)
+        self._len += 1
+        if len(bucket) > 2 * BUCKET_SIZE:
+            # Split the overfull bucket; bucket boundaries moved, so rebuild the bucket index
+            self._buckets[i:i + 1] = [bucket[:BUCKET_SIZE], bucket[BUCKET_SIZE:]]
+            self._reindex()
+            return
+        self._max_liq[i] = bucket[-1][0]
+        self._sums[i] += value
+        self._tree.add(i, value)
+
+    def remove(self, liq, address):
+        """Remove one entry; returns its value, or None if it was not present"""
+        i = bisect_left(self._max_liq, liq)
+        while i < len(self._buckets):
+            bucket = self._buckets[i]
+            j = bisect_left(bucket, (liq, address))
+            if j < len(bucket) and bucket[j][0] == liq and bucket[j][1] == address:
+                value = bucket.pop(j)[2]
+                self._len -= 1
+                if not bucket:
+                    del self._buckets[i]
+                    self._reindex()
+                else:
+                    self._max_liq[i] = bucket[-1][0]
+                    self._sums[i] -= value
+                    self._tree.add(i, -value)
+                return value
+            if bucket[0][0] > liq:
+                return None
+            i += 1  # Equal prices may straddle a bucket boundary
+        return None
+
+    def value_at_or_below(self, price):
+        """Total value with liquidation price <= price"""
+        i = bisect_right(self._max_liq, price)
+        total = self._tree.prefix(i)
+        if i < len(self._buckets):
+            bucket = self._buckets[i]
+            total += sum(entry[2] for entry in bucket[:bisect_right(bucket, price, key=_LIQ)])
+        return total
+
+    def value_below(self, price):
+        """Total value with liquidation price < price"""
+        i = bisect_left(self._max_liq, price)
+        total = self._tree.prefix(i)
+        if i < len(self._buckets):
+            bucket = self._buckets[i]
+            total += sum(entry[2] for entry in bucket[:bisect_left(bucket, price, key=_LIQ)])
+        return total
+
+    def range_sum(self, low, high):
+        """Total value with liquidation price in [low, high]"""
+        if high < low:
+            return 0.0
+        return max(self.value_at_or_below(high) - self.value_below(low), 0.0)
+
+    def _position(self, price):
+        """(bucket, offset) of the first entry with liquidation price >= price"""
+        i = bisect_left(self._max_liq, price)
+        if i == len(self._buckets):
+            return i, 0
+        return i, bisect_left(self._buckets[i], price, key=_LIQ)
+
+    def ascending_from(self, price):
+        """Entries with liquidation price >= price, nearest first"""
+        i, j = self._position(price)
+        while i < len(self._buckets):
+            yield from self._buckets[i][j:]
+            i, j = i + 1, 0
+
+    def descending_from(self, price):
+        """Entries with liquidation price < price, nearest first"""
+        i, j = self._position(price)
+        if i < len(self._buckets):
+            yield from reversed(self._buckets[i][:j])
+        for i in range(i - 1, -1, -1):
+            yield from reversed(self._buckets[i])
+
+    def nearest(self, price, k):
+        """Up to k entries closest to price on either side, nearest first"""
+        below = self.descending_from(price)
+        above = self.ascending_from(price)
+        lo, hi = next(below, None), next(above, None)
+        result = []
+        while len(result) < k and (lo is not None or hi is not None):
+            if hi is None or (lo is not None and price - lo[0] < hi[0] - price):
+                result.append(lo)
+                lo = next(below, None)
+            else:
+                result.append(hi)
+                hi = next(above, None)
+        return result
+
+class LiquidationBook:
+    """
+    Liquidation index for every coin and side, updated one position at a time.
+    Positions are keyed by (address, coin); ones without a liquidation price are not indexed.
+    Longs are liquidated by a move DOWN, shorts by a move UP, as in LiquidationLadder.
+    """
+
+    def __init__(self):
+        self.levels = {}      # (coin, is_long) -> LiquidationLevels
+        self.positions = {}   # (address, coin) -> (is_long, liq, value)
+        self._coins_by_address = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def coins(self):
+        return sorted({coin for coin, _ in self.levels})
+
+    def coins_for(self, address):
+        """Coins in which an address has an indexed position"""
+        return set(self._coins_by_address.get(address, ()))
+
+    def side(self, coin, is_long):
+        return self.levels.get((coin, bool(is_long)))
+
+    def upsert(self, address, coin, is_long, liquidation_price, position_value):
+        """Insert or replace one position"""
+        self.remove(address, coin)
+        if not (liquidation_price > 0 and math.isfinite(liquidation_price)):
+            return
+        is_long = bool(is_long)
+        levels = self.levels.get((coin, is_long))
+        if levels is None:
+            levels = self.levels[(coin, is_long)] = LiquidationLevels()
+        levels.insert(liquidation_price, address, position_value)
+        self.positions[(address, coin)] = (is_long, liquidation_price, position_value)
+        self._coins_by_address.setdefault(address, set()).add(coin)
+
+    def remove(self, address, coin):
+        """Remove one position if it is indexed"""
+        held = self.positions.pop((address, coin), None)
+        if held is None:
+            return
+        is_long, liq, _ = held
+        levels = self.levels[(coin, is_long)]
+        levels.remove(liq, address)
+        if not levels:
+            del self.levels[(coin, is_long)]
+        coins = self._coins_by_address.get(address)
+        if coins is not None:
+            coins.discard(coin)
+            if not coins:
+                del self._coins_by_address[address]
+
+    def update_address(self, address, rows):
+        """
+        Replace every position of one address with rows in the position_columns layout
+        (coin, entry_price, leverage, position_value, unrealized_pnl, liquidation_price, is_long)
+        """
+        current = {row[0] for row in rows}
+        for coin in list(self._coins_by_address.get(address, ())):
+            if coin not in current:
+                self.remove(address, coin)
+        for coin, _, _, value, _, liq, is_long in rows:
+            held = self.positions.get((address, coin))
+            if held != (bool(is_long), liq, value):
+                self.upsert(address, coin, is_long, liq, value)
+
+    @classmethod
+    def from_positions(cls, df):
+        """Bulk build from a positions frame (address, coin, is_long, liquidation_price, position_value)"""
+        book = cls()
+        if df is None or df.empty:
+            return book
+        liq = df['liquidation_price'].to_numpy(dtype=float)
+        valid = np.isfinite(liq) & (liq > 0)
+        frame = df.loc[valid, ['address', 'coin', 'is_long', 'liquidation_price', 'position_value']]
+        frame = frame.drop_duplicates(['address', 'coin'], keep='last')
+        frame = frame.sort_values(['coin', 'is_long', 'liquidation_price', 'address'], kind='stable')
+        for (coin, is_long), group in frame.groupby(['coin', 'is_long'], sort=False, observed=True):
+            is_long = bool(is_long)
+            addresses = group['address'].tolist()
+            liqs = group['liquidation_price'].tolist()
+            values = group['position_value'].astype(float).tolist()
+            book.levels[(coin, is_long)] = LiquidationLevels.from_sorted(list(zip(liqs, addresses, values)))
+            book.positions.update(zip(zip(addresses, repeat(coin)), zip(repeat(is_long), liqs, values)))
+        coins_by_address = book._coins_by_address
+        for address, coin in zip(frame['address'].tolist(), frame['coin'].tolist()):
+            coins_by_address.setdefault(address, set()).add(coin)
+        return book
+
+    def range_sum(self, coin, is_long, low, high):
+        levels = self.side(coin, is_long)
+        return levels.range_sum(low, high) if levels else 0.0
+
+    def value_within(self, coin, price, pct):
+        """(long value, short value) liquidated by a pct move from price"""
+        long_value = self.range_sum(coin, True, price * (1 - pct / 100), price)
+        short_value = self.range_sum(coin, False, price, price * (1 + pct / 100))
+        return long_value, short_value
+
+    def nearest(self, coin, is_long, price, k):
+        """
+        Up to k positions of one coin/side whose liquidation price is closest to price,
+        as (distance_pct, liquidation_price, position_value, address), nearest first
+        """
+        levels = self.side(coin, is_long)
+        if not levels or not price:
+            return []
+        return [(abs(price - liq) / price * 100, liq, value, address)
+                for liq, address, value in levels.nearest(price, k)]
+
+    def closest_to_liquidation(self, current_prices, is_long, k):
+        """
+        The k positions on one side closest to liquidation across every priced coin,
+        as (distance_pct, coin, liquidation_price, position_value, address)
+        """
+        candidates = []
+        for coin, price in current_prices.items():
+            for distance, liq, value, address in self.nearest(coin, is_long, price, k):
+                candidates.append((distance, coin, liq, value, address))
+        return heapq.nsmallest(k, candidates)
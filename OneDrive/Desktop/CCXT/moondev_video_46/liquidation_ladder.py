@@ -0,0 +1,89 @@
+# liquidation_ladder.py - Sorted-array liquidation ladder for "USD liquidated within x%" queries
+
+import numpy as np
+import pandas as pd
+
+class LiquidationLadder:
+    """
+    For every coin and side, liquidation prices sorted once plus the cumulative position value.
+
+    Longs are liquidated by a move DOWN (liquidation price in [price * (1 - x%), price]),
+    shorts by a move UP (liquidation price in [price, price * (1 + x%)]). Each range is
+    answered with two binary searches into the cumulative sums, so building costs
+    O(n log n) and any grid of k thresholds costs O(k log n) per coin.
+    """
+
+    def __init__(self, current_prices):
+        self.current_prices = dict(current_prices)
+        self.sides = {}  # (coin, is_long) -> (sorted liquidation prices, cumulative value with leading 0)
+
+    @classmethod
+    def from_positions(cls, df, current_prices, coins=None):
+        """
+        Build the ladder from a positions frame (coin, is_long, liquidation_price, position_value).
+        Only coins with a current price are included; coins default to every coin in current_prices.
+        """
+        coins = [c for c in (coins if coins is not None else current_prices) if c in current_prices]
+        ladder = cls({coin: current_prices[coin] for coin in coins})
+        if df is None or df.empty or not coins:
+            return ladder
+
+        frame = df[df['coin'].isin(coins)]
+        liq = frame['liquidation_price'].to_numpy(dtype=float)
+        value = frame['position_value'].to_numpy(dtype=float)
+        valid = np.isfinite(liq) & (liq > 0)
+
+        # One grouping pass over (coin, side); every side seen gets a book, even if empty
+        for (coin, is_long), idx in frame.groupby(['coin', 'is_long'], sort=False, observed=True).indices.items():
+            idx = idx[valid[idx]]
+            order = np.argsort(liq[idx], kind='stable')
+            sorted_liq = liq[idx][order]
+            cum_value = np.concatenate(([0.0], np.cumsum(value[idx][order])))
+            ladder.sides[(coin, bool(is_long))] = (sorted_liq, cum_value)
+        return ladder
+
+    def coins(self):
+        """Coins that have at least one position in the ladder"""
+        return [coin for coin in self.current_prices if (coin, True) in self.sides or (coin, False) in self.sides]
+
+    def _range_sum(self, coin, is_long, low, high):
+        """Total value with liquidation price in [low, high] (low/high may be arrays)"""
+        side = self.sides.get((coin, is_long))
+        if side is None:
+            return np.zeros(np.shape(low), dtype=float)
+        sorted_liq, cum_value = side
+        lo = np.searchsorted(sorted_liq, low, side='left')
+        hi = np.searchsorted(sorted_liq, high, side='right')
+        return np.maximum(cum_value[hi] - cum_value[lo], 0.0)
+
+    def liquidations_within(self, coin, pcts):
+        """(long value, short value) arrays liquidated by a move of each pct in pcts for one coin"""
+        pcts = np.asarray(pcts, dtype=float)
+        price = self.current_prices[coin]
+        long_value = self._range_sum(coin, True, price * (1 - pcts / 100), np.full(pcts.shape, price))
+        short_value = self._range_sum(coin, False, np.full(pcts.shape, price), price * (1 + pcts / 100))
+        return long_value, short_value
+
+    def by_coin(self, pct):
+        """DataFrame of long/short value liquidated by a pct move, one row per coin"""
+        rows = []
+        for coin in self.coins():
+            long_value, short_value = self.liquidations_within(coin, [pct])
+            rows.append({'coin': coin, 'long_value': long_value[0], 'short_value': short_value[0]})
+        return pd.DataFrame(rows, columns=['coin', 'long_value', 'short_value'])
+
+    def curve(self, pcts, coins=None):
+        """
+        Long/short value liquidated at every threshold in pcts, summed over coins.
+        Works for any grid size, e.g. np.linspace(0.01, 10, 1000).
+        """
+        pcts = np.asarray(pcts, dtype=float)
+        long_total = np.zeros(pcts.shape)
+        short_total = np.zeros(pcts.shape)
+        for coin in (coins if coins is not None else self.coins()):
+            if coin not in self.current_prices:
+                continue
+            long_value, short_value = self.liquidations_within(coin, pcts)
+            long_total += long_value
+            short_total += short_value
+        return pd.DataFrame({'threshold_pct': pcts, 'long_value': long_total, 'short_value': short_total})
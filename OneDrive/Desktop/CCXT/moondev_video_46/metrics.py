@@ -0,0 +1,229 @@
+# metrics.py - Per-stage timings, per-endpoint request stats and peak memory as Prometheus text and JSON lines
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource  # Unix only; peak memory is left out elsewhere
+except ImportError:
+    resource = None
+
+METRIC_PREFIX = "whale"
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # Seconds
+
+def peak_memory_bytes():
+    """Peak resident set size of this process, or None where the platform does not report it"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports kilobytes
+
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus style: each bucket counts values <= its bound)"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (None if empty)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return float('inf')
+
+class Metrics:
+    """
+    Process-wide counters, thread-safe. Stages are timed with stage() / timed() and may nest
+    (e.g. price_lookup inside render); re-entering a stage that is already being timed on the
+    same thread is not counted twice. A "run" is one sweep, snapshot or dashboard refresh:
+    start_run() resets the per-run stage times that snapshot() and the JSON lines report.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.stage_seconds = {}  # stage -> seconds since start
+        self.stage_calls = {}
+        self.run_seconds = {}    # stage -> seconds in the current run
+        self.rows = {}           # stage -> rows processed since start
+        self.requests = {}       # (endpoint, status) -> count
+        self.latency = {}        # endpoint -> Histogram
+        self._run_started = time.perf_counter()
+        self._active = threading.local()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        active = self._active.__dict__.setdefault('stages', set())
+        if name in active:
+            yield  # Already timed by an enclosing call
+            return
+        active.add(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            active.discard(name)
+            self.add_stage_time(name, time.perf_counter() - start, rows)
+
+    def timed(self, name):
+        """Decorator form of stage()"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def add_stage_time(self, name, seconds, rows=None):
+        with self._lock:
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+            self.stage_calls[name] = self.stage_calls.get(name, 0) + 1
+            self.run_seconds[name] = self.run_seconds.get(name, 0.0) + seconds
+            if rows:
+                self.rows[name] = self.rows.get(name, 0) + rows
+
+    def add_rows(self, name, rows):
+        with self._lock:
+            self.rows[name] = self.rows.get(name, 0) + rows
+
+    def observe_request(self, endpoint, status, seconds):
+        """Record one HTTP attempt; status is the HTTP status code or 'error' if no response arrived"""
+        with self._lock:
+            key = (endpoint, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.latency.get(endpoint)
+            if histogram is None:
+                histogram = self.latency[endpoint] = Histogram()
+            histogram.observe(seconds)
+
+    def start_run(self):
+        with self._lock:
+            self.runs += 1
+            self.run_seconds = {}
+            self._run_started = time.perf_counter()
+
+    def snapshot(self):
+        """One JSON-ready record: this run's stage times plus cumulative request and row counts"""
+        with self._lock:
+            endpoints = {}
+            for (endpoint, status), count in self.requests.items():
+                stats = endpoints.setdefault(endpoint, {'requests': 0, 'throttled': 0, 'errors': 0})
+                stats['requests'] += count
+                if status == '429':
+                    stats['throttled'] += count
+                elif status == 'error' or status.startswith('5'):
+                    stats['errors'] += count
+            for endpoint, stats in endpoints.items():
+                histogram = self.latency[endpoint]
+                stats['throttle_rate'] = round(stats['throttled'] / stats['requests'], 4)
+                stats['latency_p50'] = histogram.quantile(0.5)
+                stats['latency_p95'] = histogram.quantile(0.95)
+                stats['latency_mean'] = round(histogram.sum / histogram.count, 4)
+            return {
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'run': self.runs,
+                'run_seconds': round(time.perf_counter() - self._run_started, 4),
+                'stages': {name: round(seconds, 4) for name, seconds in self.run_seconds.items()},
+                'rows': dict(self.rows),
+                'endpoints': endpoints,
+                'peak_memory_bytes': peak_memory_bytes(),
+            }
+
+    def to_prometheus(self):
+        """Everything in the Prometheus text exposition format"""
+        p = METRIC_PREFIX
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+
+        with self._lock:
+            family('stage_seconds_total', 'counter', 'Time spent in each stage')
+            lines += [f'{p}_stage_seconds_total{{stage="{s}"}} {v:.6f}' for s, v in sorted(self.stage_seconds.items())]
+            family('stage_calls_total', 'counter', 'Times each stage ran')
+            lines += [f'{p}_stage_calls_total{{stage="{s}"}} {v}' for s, v in sorted(self.stage_calls.items())]
+            family('stage_run_seconds', 'gauge', 'Time spent in each stage so far in the current run')
+            lines += [f'{p}_stage_run_seconds{{stage="{s}"}} {v:.6f}' for s, v in sorted(self.run_seconds.items())]
+            family('rows_total', 'counter', 'Rows processed by each stage')
+            lines += [f'{p}_rows_total{{stage="{s}"}} {v}' for s, v in sorted(self.rows.items())]
+            family('requests_total', 'counter', 'HTTP attempts by endpoint and status (429 = throttled)')
+            lines += [f'{p}_requests_total{{endpoint="{e}",status="{s}"}} {v}'
+                      for (e, s), v in sorted(self.requests.items())]
+            family('request_seconds', 'histogram', 'HTTP response time by endpoint')
+            for endpoint, histogram in sorted(self.latency.items()):
+                running = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    running += count
+                    lines.append(f'{p}_request_seconds_bucket{{endpoint="{endpoint}",le="{bound:g}"}} {running}')
+                lines.append(f'{p}_request_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{p}_request_seconds_sum{{endpoint="{endpoint}"}} {histogram.sum:.6f}')
+                lines.append(f'{p}_request_seconds_count{{endpoint="{endpoint}"}} {histogram.count}')
+            family('runs_total', 'counter', 'Sweeps, snapshots or refreshes completed')
+            lines.append(f'{p}_runs_total {self.runs}')
+
+        peak = peak_memory_bytes()
+        if peak is not None:
+            family('peak_memory_bytes', 'gauge', 'Peak resident memory of the process')
+            lines.append(f'{p}_peak_memory_bytes {peak}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory, name):
+        """Rewrite <name>.prom and append this run to <name>.jsonl in directory"""
+        os.makedirs(directory, exist_ok=True)
+        prom_path = os.path.join(directory, f"{name}.prom")
+        tmp_path = f"{prom_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, prom_path)  # Scrapers never read a half-written file
+        with open(os.path.join(directory, f"{name}.jsonl"), 'a') as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serve the Prometheus text at http://host:port/metrics from a background thread"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # Keep scrapes out of the terminal output
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+# Shared by every module in the process
+METRICS = Metrics()
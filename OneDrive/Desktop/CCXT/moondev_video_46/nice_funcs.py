@@ -3,56 +3,178 @@
 import requests
 import time
 import random
+import threading
 from datetime import datetime
 
+from metrics import METRICS
+
+API_URL = "https://api.hyperliquid.xyz/info"
+HEADERS = {"Content-Type": "application/json"}
+MARKET_SNAPSHOT_TTL = 5  # Seconds a downloaded market universe is served from memory
+
+class MarketSnapshot:
+    """
+    TTL cache of the perp (metaAndAssetCtxs) and spot (spotMetaAndAssetCtxs) universes.
+    Each universe is downloaded once per TTL and indexed by coin, so price, funding and
+    open interest lookups for any number of coins cost one request per refresh.
+    """
+
+    def __init__(self, ttl=MARKET_SNAPSHOT_TTL, url=API_URL):
+        self.ttl = ttl
+        self.url = url
+        self._lock = threading.Lock()
+        self._perp_fetched_at = 0.0
+        self._perp_index = {}   # coin -> (universe entry, asset ctx)
+        self._unlisted_mids = {}  # coin -> mid for allMids coins not in the downloaded universe
+        self._spot_fetched_at = 0.0
+        self._spot_index = {}   # base token -> asset ctx
+
+    def _post(self, body):
+        sent = time.perf_counter()
+        try:
+            response = requests.post(self.url, headers=HEADERS, json=body, timeout=10)
+        except Exception:
+            METRICS.observe_request(body['type'], "error", time.perf_counter() - sent)
+            raise
+        METRICS.observe_request(body['type'], response.status_code, time.perf_counter() - sent)
+        response.raise_for_status()
+        return response.json()
+
+    def load(self, meta, asset_ctxs):
+        """Install an already-downloaded perp universe (e.g. from a websocket feed or a benchmark)"""
+        with self._lock:
+            self._perp_index = {asset['name']: (asset, ctx) for asset, ctx in zip(meta['universe'], asset_ctxs)}
+            self._unlisted_mids = {}
+            self._perp_fetched_at = time.monotonic()
+
+    def apply_mids(self, mids):
+        """
+        Apply an allMids push (coin -> mid price string) between universe downloads.
+        The mid stands in for the mark until the next refresh replaces the asset contexts.
+        Coins missing from the universe only get a mark price, not an empty asset context,
+        so funding and the other fields still read as unknown for them.
+        No lock: refresh() holds it across HTTP, and single dict writes are atomic anyway.
+        """
+        index = self._perp_index
+        for coin, mid in mids.items():
+            entry = index.get(coin)
+            if entry is None:
+                if not coin.startswith('@'):  # Spot pair ids, not perp coins
+                    self._unlisted_mids[coin] = mid
+                continue
+            entry[1]['midPx'] = mid
+            entry[1]['markPx'] = mid
+
+    def refresh(self, force=False):
+        """Download the perp universe if the cached copy is older than the TTL"""
+        with self._lock:
+            if not force and self._perp_index and time.monotonic() - self._perp_fetched_at < self.ttl:
+                return
+            try:
+                with METRICS.stage('price_lookup'):
+                    meta, asset_ctxs = self._post({"type": "metaAndAssetCtxs"})
+                self._perp_index = {asset['name']: (asset, ctx) for asset, ctx in zip(meta['universe'], asset_ctxs)}
+                self._unlisted_mids = {}
+                self._perp_fetched_at = time.monotonic()
+            except Exception as e:
+                if not self._perp_index:
+                    raise
+                # Serve the cached copy for another TTL instead of retrying on every lookup
+                self._perp_fetched_at = time.monotonic()
+                print(f"Error refreshing market snapshot, serving cached data: {str(e)}")
+
+    def refresh_spot(self, force=False):
+        """Download the spot universe if the cached copy is older than the TTL"""
+        with self._lock:
+            if not force and self._spot_index and time.monotonic() - self._spot_fetched_at < self.ttl:
+                return
+            try:
+                with METRICS.stage('price_lookup'):
+                    meta, asset_ctxs = self._post({"type": "spotMetaAndAssetCtxs"})
+                index = {}
+                for i, pair in enumerate(meta['universe']):
+                    base = pair['name'].split('/')[0]
+                    if base not in index and i < len(asset_ctxs):
+                        index[base] = asset_ctxs[i]
+                self._spot_index = index
+                self._spot_fetched_at = time.monotonic()
+            except Exception as e:
+                if not self._spot_index:
+                    raise
+                self._spot_fetched_at = time.monotonic()  # As for the perp universe
+                print(f"Error refreshing spot snapshot, serving cached data: {str(e)}")
+
+    def asset_ctx(self, coin):
+        """Return the raw perp asset context for a coin, or None if it is not listed"""
+        self.refresh()
+        entry = self._perp_index.get(coin)
+        return entry[1] if entry else None
+
+    def get_float(self, coin, field, default=None):
+        """Return one numeric field of a coin's perp asset context"""
+        ctx = self.asset_ctx(coin)
+        if ctx is None or ctx.get(field) is None:
+            return default
+        return float(ctx[field])
+
+    def mark_price(self, coin):
+        price = self.get_float(coin, 'markPx')
+        if price is None and coin in self._unlisted_mids:
+            return float(self._unlisted_mids[coin])
+        return price
+
+    def oracle_price(self, coin):
+        return self.get_float(coin, 'oraclePx')
+
+    def funding_rate(self, coin):
+        """Hourly funding rate as a decimal (0.0001 = 0.01%)"""
+        return self.get_float(coin, 'funding')
+
+    def open_interest(self, coin):
+        return self.get_float(coin, 'openInterest')
+
+    def day_volume(self, coin):
+        return self.get_float(coin, 'dayNtlVlm')
+
+    def max_leverage(self, coin):
+        self.refresh()
+        entry = self._perp_index.get(coin)
+        return entry[0].get('maxLeverage') if entry else None
+
+    def spot_price(self, coin):
+        self.refresh_spot()
+        ctx = self._spot_index.get(coin)
+        return float(ctx['markPx']) if ctx and 'markPx' in ctx else None
+
+    def coins(self):
+        """All perp coins in the current universe"""
+        self.refresh()
+        return list(self._perp_index)
+
+    def mark_prices(self):
+        """Mark price for every perp coin, as a dict"""
+        self.refresh()
+        prices = {coin: float(mid) for coin, mid in self._unlisted_mids.items()}
+        prices.update((coin, float(ctx['markPx'])) for coin, (_, ctx) in self._perp_index.items() if ctx.get('markPx') is not None)
+        return prices
+
+# Shared snapshot used by every helper below
+MARKET_SNAPSHOT = MarketSnapshot()
+
 def get_current_price(coin):
     """
     Get the current price of a coin from HyperLiquid API
     """
     try:
-        url = "https://api.hyperliquid.xyz/info"
-        headers = {"Content-Type": "application/json"}
-        
-        # For perpetual futures
-        body = {"type": "metaAndAssetCtxs"}
-        
-        # Make the request to the API
-        response = requests.post(url, headers=headers, json=body)
-        
-        if response.status_code == 200:
-            data = response.json()
-            meta = data[0]
-            asset_ctxs = data[1]
-            
-            # Find the coin in the universe
-            coin_idx = None
-            for i, asset in enumerate(meta['universe']):
-                if asset['name'] == coin:
-                    coin_idx = i
-                    break
-            
-            if coin_idx is not None:
-                # Get the mark price
-                mark_price = float(asset_ctxs[coin_idx]['markPx'])
-                return mark_price
+        # Perpetual mark price from the cached universe
+        mark_price = MARKET_SNAPSHOT.mark_price(coin)
+        if mark_price is not None:
+            return mark_price
         
         # Fallback to spot price if perpetual price not found
-        body = {"type": "spotMetaAndAssetCtxs"}
-        response = requests.post(url, headers=headers, json=body)
-        
-        if response.status_code == 200:
-            data = response.json()
-            tokens = data[0]['tokens']
-            universe = data[0]['universe']
-            asset_ctxs = data[1]
-            
-            # Find the symbol in the universe
-            for i, pair in enumerate(universe):
-                if pair['name'].split('/')[0] == coin:
-                    # Get the corresponding asset context
-                    ctx = asset_ctxs[i]
-                    price = float(ctx['markPx']) if 'markPx' in ctx else None
-                    return price
+        price = MARKET_SNAPSHOT.spot_price(coin)
+        if price is not None:
+            return price
         
         # If all else fails, return a simulated price
         return simulate_price(coin)
@@ -90,28 +212,10 @@ def get_funding_rate(coin):
     Get the funding rate for a coin from HyperLiquid API
     """
     try:
-        url = "https://api.hyperliquid.xyz/info"
-        headers = {"Content-Type": "application/json"}
-        body = {"type": "metaAndAssetCtxs"}
-        
-        response = requests.post(url, headers=headers, json=body)
-        
-        if response.status_code == 200:
-            data = response.json()
-            meta = data[0]
-            asset_ctxs = data[1]
-            
-            # Find the coin in the universe
-            coin_idx = None
-            for i, asset in enumerate(meta['universe']):
-                if asset['name'] == coin:
-                    coin_idx = i
-                    break
-            
-            if coin_idx is not None:
-                # Get the funding rate (convert from decimal to percentage)
-                funding_rate = float(asset_ctxs[coin_idx].get('funding', 0)) * 100
-                return funding_rate
+        ctx = MARKET_SNAPSHOT.asset_ctx(coin)
+        if ctx is not None:
+            # Convert from decimal to percentage (a listed coin without a funding field has none)
+            return float(ctx.get('funding') or 0) * 100
         
         # Return a simulated funding rate if not found
         return random.uniform(-0.01, 0.01) * 100
@@ -0,0 +1,111 @@
+# output_sink.py - Background CSV writer: atomic temp-file + rename, skipping files whose content did not change
+
+import atexit
+import hashlib
+import os
+import queue
+import threading
+
+from colorama import Fore
+
+from metrics import METRICS
+
+OUTPUT_QUEUE_SIZE = 32  # Writes waiting for the writer thread before callers block
+
+def content_digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+def atomic_write(path, data):
+    """Write bytes to a temp file in the same directory and rename it over path, so readers never see a torn file"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class OutputSink:
+    """
+    One writer thread fed by a bounded queue. write_csv() hands a DataFrame over and returns
+    at once; the thread serializes it, skips the write if the bytes match what the file
+    already holds, and otherwise replaces the file atomically. submit() runs any other
+    output job (e.g. a snapshot store append) on the same thread, in order.
+    Pending writes are drained at interpreter exit.
+    """
+
+    def __init__(self, max_queue=OUTPUT_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._digests = {}  # path -> digest of the content last written or found on disk
+        self.written = 0
+        self.skipped = 0
+        self.errors = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="output-sink", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write_csv(self, path, df, **to_csv_kwargs):
+        """Queue df to be written to path as CSV (index=False unless overridden)"""
+        to_csv_kwargs.setdefault('index', False)
+        # A shallow copy is a snapshot under copy-on-write, so the caller may keep changing df
+        self._put((self._write_csv, (path, df.copy(deep=False), to_csv_kwargs), {}))
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue any other output job to run on the writer thread"""
+        self._put((fn, args, kwargs))
+
+    def _put(self, job):
+        if self._closed:
+            raise RuntimeError("output sink is closed")
+        self._queue.put(job)
+
+    def _write_csv(self, path, df, to_csv_kwargs):
+        with METRICS.stage('save', rows=len(df)):
+            self._write_csv_bytes(path, df.to_csv(**to_csv_kwargs).encode())
+
+    def _write_csv_bytes(self, path, data):
+        digest = content_digest(data)
+        if path not in self._digests and os.path.exists(path):
+            with open(path, 'rb') as f:
+                self._digests[path] = content_digest(f.read())
+        if self._digests.get(path) == digest:
+            self.skipped += 1
+            return
+        atomic_write(path, data)
+        self._digests[path] = digest
+        self.written += 1
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                fn, args, kwargs = job
+                fn(*args, **kwargs)
+            except Exception as e:
+                self.errors += 1
+                print(f"{Fore.RED}✗ Output writer error: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued write has finished"""
+        self._queue.join()
+
+    def close(self):
+        """Drain the queue and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        return {'written': self.written, 'skipped': self.skipped, 'errors': self.errors,
+                'queued': self._queue.qsize()}
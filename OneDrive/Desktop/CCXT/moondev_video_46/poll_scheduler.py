@@ -0,0 +1,118 @@
+# poll_scheduler.py - Priority scheduling of per-address refreshes for the polling daemon
+
+import heapq
+import itertools
+import math
+import time
+
+# Refresh intervals (seconds)
+HOT_INTERVAL = 5          # Large positions or positions close to liquidation
+WARM_INTERVAL = 30        # Accounts holding at least one qualifying position
+COLD_MIN_INTERVAL = 60    # First backoff step for flat / dormant accounts
+COLD_MAX_INTERVAL = 600   # Dormant accounts are never polled less often than this
+ERROR_RETRY_INTERVAL = 30 # Retry delay after a failed request
+
+# What makes an address "hot"
+LARGE_POSITION_VALUE = 1000000  # Any single position at or above $1M
+NEAR_LIQUIDATION_PCT = 5.0      # Any position within 5% of its liquidation price
+
+def summarize_account(data):
+    """
+    Return (largest position value, nearest distance to liquidation in %) for a clearinghouseState payload.
+    The mark price is derived from positionValue / |szi| so no extra price request is needed.
+    """
+    largest_value = 0.0
+    nearest_liq_pct = math.inf
+
+    for pos in (data or {}).get("assetPositions", []):
+        p = pos.get("position")
+        if not p:
+            continue
+        try:
+            value = abs(float(p.get("positionValue") or 0))
+            size = abs(float(p.get("szi") or 0))
+            liq_price = float(p.get("liquidationPx") or 0)
+        except (TypeError, ValueError):
+            continue
+
+        largest_value = max(largest_value, value)
+        if size > 0 and liq_price > 0 and value > 0:
+            mark_price = value / size
+            nearest_liq_pct = min(nearest_liq_pct, abs(mark_price - liq_price) / mark_price * 100)
+
+    return largest_value, nearest_liq_pct
+
+def compute_poll_interval(data, min_position_value, previous_interval=None, max_interval=COLD_MAX_INTERVAL):
+    """
+    Pick the next refresh interval for an address from its latest payload.
+    Dormant accounts back off exponentially from COLD_MIN_INTERVAL to max_interval.
+    """
+    largest_value, nearest_liq_pct = summarize_account(data)
+
+    if largest_value >= LARGE_POSITION_VALUE or nearest_liq_pct <= NEAR_LIQUIDATION_PCT:
+        return HOT_INTERVAL
+    if largest_value >= min_position_value:
+        return WARM_INTERVAL
+    if previous_interval and previous_interval >= COLD_MIN_INTERVAL:
+        return min(max_interval, previous_interval * 2)
+    return COLD_MIN_INTERVAL
+
+class PollScheduler:
+    """
+    Min-heap of (next poll time, address). An address is popped while its request is in
+    flight and pushed back by reschedule(), so it is never polled twice at the same time.
+    """
+
+    def __init__(self, addresses, min_position_value, clock=time.monotonic):
+        self.min_position_value = min_position_value
+        self.clock = clock
+        self._counter = itertools.count()
+        self._heap = []
+        self.intervals = {}
+        self.failed = set()
+
+        # Everything is due immediately on startup
+        now = self.clock()
+        for address in dict.fromkeys(addresses):
+            heapq.heappush(self._heap, (now, next(self._counter), address))
+
+    def __len__(self):
+        return len(self._heap)
+
+    def seconds_until_next(self):
+        """Seconds until the next address is due (0 if one is due now, None if nothing is queued)"""
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self.clock())
+
+    def pop_due(self):
+        """Pop and return the next due address, or None if nothing is due yet"""
+        if self._heap and self._heap[0][0] <= self.clock():
+            return heapq.heappop(self._heap)[2]
+        return None
+
+    def reschedule(self, address, data, failed=False):
+        """Push an address back with an interval based on its latest payload"""
+        if failed:
+            self.failed.add(address)
+            interval = ERROR_RETRY_INTERVAL
+        else:
+            self.failed.discard(address)
+            interval = compute_poll_interval(data, self.min_position_value, self.intervals.get(address))
+        self.intervals[address] = interval
+        heapq.heappush(self._heap, (self.clock() + interval, next(self._counter), address))
+        return interval
+
+    def tier_counts(self):
+        """Count addresses per refresh tier for status output"""
+        counts = {'hot': 0, 'warm': 0, 'cold': 0, 'error': 0}
+        for address, interval in self.intervals.items():
+            if address in self.failed:
+                counts['error'] += 1
+            elif interval == HOT_INTERVAL:
+                counts['hot'] += 1
+            elif interval == WARM_INTERVAL:
+                counts['warm'] += 1
+            else:
+                counts['cold'] += 1
+        return counts
@@ -0,0 +1,223 @@
+# position_columns.py - Streaming columnar builder for clearinghouseState payloads
+
+import warnings
+from array import array
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# Column order matches the per-position dicts the server used to produce
+POSITION_COLUMNS = ['address', 'coin', 'entry_price', 'leverage', 'position_value',
+                    'unrealized_pnl', 'liquidation_price', 'is_long', 'timestamp']
+
+# Compact in-memory schema for the positions table. Prices and USD amounts stay float64:
+# the outputs print cents, which float32 (about 7 significant digits) cannot hold above $100k.
+POSITION_DTYPES = {
+    'address': 'category',          # 42-character hex, repeated for every position of a wallet
+    'coin': 'category',
+    'entry_price': 'float64',
+    'leverage': 'int16',            # Whole numbers on HyperLiquid; float64 if a source sends fractions.
+                                    # Stored (Parquet, Arrow IPC) as float64 so both kinds share one schema
+    'position_value': 'float64',
+    'unrealized_pnl': 'float64',
+    'liquidation_price': 'float64',
+    'is_long': 'bool',
+    'timestamp': 'datetime64[s]',   # One fixed-width value instead of a string per row
+}
+FLOAT_COLUMNS = [col for col, dtype in POSITION_DTYPES.items() if dtype == 'float64']
+BOOL_STRINGS = {'true': True, 'false': False, '1': True, '0': False}  # Matched case-insensitively
+
+def sorted_categorical(values, categories=None):
+    """
+    Categorical with its categories in sorted order, so groupby output is ordered exactly as it
+    was for plain strings. With categories given, values are integer codes into them.
+    """
+    if categories is None:
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Unused categories (e.g. after a filter) are kept; groupbys pass observed=True
+            categories = values.cat.categories
+            if categories.is_monotonic_increasing:
+                return values
+            return values.cat.reorder_categories(categories.sort_values())
+        return pd.Categorical(values)
+    categories = np.asarray(categories, dtype=str)  # Fixed-width strings argsort faster than objects
+    order = np.argsort(categories, kind='stable')
+    remap = np.empty(len(categories), dtype=np.int32)
+    remap[order] = np.arange(len(categories), dtype=np.int32)
+    return pd.Categorical.from_codes(remap[np.asarray(values, dtype=np.int64)], categories[order])
+
+def apply_position_schema(df):
+    """
+    Cast a positions frame from any source (API, CSV, merged Arrow batches) to POSITION_DTYPES.
+    Columns outside the schema, and schema columns the frame lacks, are left alone. Leverage
+    with any fractional or missing value stays float64, rows whose side is neither a bool nor
+    true/false/1/0 (e.g. missing) are dropped with a warning, and a timestamp column that does
+    not parse is kept as it came.
+    """
+    if df is None or df.empty:
+        return df
+    columns = {}
+    if 'is_long' in df.columns and df['is_long'].dtype != bool:
+        flags = side_flags(df['is_long'])
+        unknown = flags.isna().to_numpy()
+        if unknown.any():
+            sides = sorted({str(side) for side in df['is_long'][unknown]})
+            warnings.warn(f"Dropping {int(unknown.sum())} positions with an unknown side: {', '.join(sides[:5])}")
+            df, flags = df[~unknown], flags[~unknown]
+        columns['is_long'] = flags.astype(bool)
+    for col in ('address', 'coin'):
+        if col in df.columns:
+            columns[col] = sorted_categorical(df[col])
+    for col in FLOAT_COLUMNS:
+        if col in df.columns and df[col].dtype != np.float64:
+            columns[col] = pd.to_numeric(df[col], errors='coerce').astype(np.float64)
+    if 'leverage' in df.columns and df['leverage'].dtype != np.int16:
+        leverage = pd.to_numeric(df['leverage'], errors='coerce').to_numpy(dtype=np.float64)
+        # Whole values (ints, or floats read back from storage) compact to int16
+        fits = np.isfinite(leverage).all() and (leverage == np.round(leverage)).all() and np.abs(leverage).max(initial=0) < 2**15
+        columns['leverage'] = pd.Series(leverage.astype(np.int16) if fits else leverage, index=df.index)
+    if 'timestamp' in df.columns and df['timestamp'].dtype != 'datetime64[s]':
+        timestamp = naive_utc_seconds(df['timestamp'])
+        if timestamp is not None:
+            columns['timestamp'] = timestamp
+    return df.assign(**columns) if columns else df
+
+def side_flags(values):
+    """is_long as nullable booleans: bools as they are, true/false/1/0 in any case or type, anything else NA"""
+    if pd.api.types.is_numeric_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+        return values.map({1: True, 0: False}).astype('boolean')
+
+    def flag(value):
+        if isinstance(value, (bool, np.bool_)):
+            return bool(value)
+        if isinstance(value, str):
+            return BOOL_STRINGS.get(value.strip().lower())
+        if isinstance(value, (int, float, np.number)) and value in (0, 1):
+            return bool(value)
+        return None
+    return values.astype(object).map(flag).astype('boolean')
+
+def naive_utc_seconds(values):
+    """
+    Timestamps as datetime64[s] in naive UTC (tz-aware values and ISO 'Z' strings are converted),
+    or None if any present value fails to parse
+    """
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        parsed = values.dt.tz_convert('UTC').dt.tz_localize(None)
+    elif pd.api.types.is_datetime64_dtype(values):
+        parsed = values
+    else:
+        try:
+            parsed = pd.to_datetime(values, errors='coerce', utc=True)
+        except (TypeError, ValueError):
+            return None
+        if (parsed.isna() & values.notna()).any():
+            return None
+        parsed = parsed.dt.tz_localize(None)
+    return parsed.astype('datetime64[s]')
+
+class PositionColumnBuilder:
+    """
+    Appends parsed position fields straight into typed column buffers as payloads arrive.
+
+    No per-position dict is built, every row of a sweep shares one snapshot timestamp,
+    and addresses and coins are stored as integer codes, so the DataFrame gets its
+    categorical columns (POSITION_DTYPES) without hashing a string per row.
+    """
+
+    def __init__(self, min_position_value, snapshot_time=None):
+        self.min_position_value = min_position_value
+        snapshot_time = snapshot_time or datetime.now(timezone.utc)
+        if snapshot_time.tzinfo is not None:
+            snapshot_time = snapshot_time.astimezone(timezone.utc).replace(tzinfo=None)
+        self.snapshot_time = snapshot_time  # Naive UTC, as naive_utc_seconds reads every other timestamp
+
+        self.addresses = {}  # address -> code
+        self.coins = {}      # coin -> code
+        self.address = array('i')
+        self.coin = array('i')
+        self.entry_price = array('d')
+        self.leverage = array('q')
+        self.position_value = array('d')
+        self.unrealized_pnl = array('d')
+        self.liquidation_price = array('d')
+        self.is_long = array('b')
+
+    def __len__(self):
+        return len(self.position_value)
+
+    def _parse(self, p):
+        """Parse one position dict into a row tuple, or None if it is below the minimum value"""
+        position_value = float(p.get("positionValue") or 0)
+        if position_value < self.min_position_value:
+            return None
+        return (
+            p.get("coin", ""),
+            float(p.get("entryPx") or 0),
+            int(p.get("leverage", {}).get("value", 0)),
+            position_value,
+            float(p.get("unrealizedPnl") or 0),
+            float(p.get("liquidationPx") or 0),
+            float(p.get("szi") or 0) > 0,
+        )
+
+    def _parse_safe(self, pos):
+        try:
+            p = pos.get("position")
+            return self._parse(p) if p else None
+        except (TypeError, ValueError, AttributeError):
+            return None
+
+    def parse_payload(self, data):
+        """
+        Parse one clearinghouseState payload into row tuples (coin, entry_price, leverage,
+        position_value, unrealized_pnl, liquidation_price, is_long), minimum value applied
+        """
+        if not data or "assetPositions" not in data:
+            return []
+
+        # Fast path: one try for the whole payload; only a malformed payload pays for per-position guards
+        try:
+            rows = [self._parse(pos["position"]) for pos in data["assetPositions"] if "position" in pos]
+        except (TypeError, ValueError, AttributeError, KeyError):
+            rows = [self._parse_safe(pos) for pos in data["assetPositions"]]
+        return [row for row in rows if row is not None]
+
+    def add_rows(self, address, rows):
+        """Append already-parsed row tuples for one address; returns rows added"""
+        if not rows:
+            return 0
+        coins, entries, leverages, values, pnls, liqs, sides = zip(*rows)
+        address_code = self.addresses.setdefault(address, len(self.addresses))
+        self.address.extend([address_code] * len(rows))
+        coin_codes = self.coins
+        self.coin.extend([coin_codes.setdefault(coin, len(coin_codes)) for coin in coins])
+        self.entry_price.extend(entries)
+        self.leverage.extend(leverages)
+        self.position_value.extend(values)
+        self.unrealized_pnl.extend(pnls)
+        self.liquidation_price.extend(liqs)
+        self.is_long.extend(sides)
+        return len(rows)
+
+    def add_payload(self, data, address):
+        """Parse one address's clearinghouseState payload into the buffers; returns rows added"""
+        return self.add_rows(address, self.parse_payload(data))
+
+    def to_dataframe(self):
+        """Build the positions DataFrame in the POSITION_DTYPES schema (one copy per column)"""
+        leverage = np.frombuffer(self.leverage, dtype=np.int64)
+        if len(leverage) and np.abs(leverage).max() < 2**15:
+            leverage = leverage.astype(np.int16)
+        return pd.DataFrame({
+            'address': sorted_categorical(np.frombuffer(self.address, dtype=np.int32), list(self.addresses)),
+            'coin': sorted_categorical(np.frombuffer(self.coin, dtype=np.int32), list(self.coins)),
+            'entry_price': np.frombuffer(self.entry_price, dtype=np.float64).copy(),
+            'leverage': leverage.copy(),
+            'position_value': np.frombuffer(self.position_value, dtype=np.float64).copy(),
+            'unrealized_pnl': np.frombuffer(self.unrealized_pnl, dtype=np.float64).copy(),
+            'liquidation_price': np.frombuffer(self.liquidation_price, dtype=np.float64).copy(),
+            'is_long': np.frombuffer(self.is_long, dtype=np.int8).astype(bool),
+            'timestamp': np.full(len(self), np.datetime64(self.snapshot_time.replace(microsecond=0), 's')),
+        }, columns=POSITION_COLUMNS)
@@ -6,10 +6,20 @@ import requests
 from datetime import datetime
 import numpy as np
 import concurrent.futures
+import asyncio
+import aiohttp
 from tqdm import tqdm
 import colorama
 from colorama import Fore
 import argparse
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+from poll_scheduler import PollScheduler
+from snapshot_store import SnapshotStore, new_snapshot_id
+from position_columns import PositionColumnBuilder
+from aggregation_store import AggregationStore
+from address_registry import AddressRegistry, REGISTRY_FILE
+from metrics import METRICS
+from ws_ingest import PositionTable, WsIngestor, WS_URL, MAX_WS_CONNECTIONS, USERS_PER_CONNECTION
 
 # Initialize colorama for terminal colors
 colorama.init(autoreset=True)
@@ -24,6 +34,25 @@ HEADERS = {"Content-Type": "application/json"}
 MIN_POSITION_VALUE = 25000 # Minimum position value to consider
 MAX_WORKERS = 10     # Number of parallel workers for fetching data. I can adjust this number based on my system's capabilities.
 API_REQUEST_DELAY = 0.1 # Delay between API requests in seconds
+MAX_CONCURRENT_REQUESTS = 50 # Requests in flight for the asyncio fetch mode (--async)
+REQUEST_TIMEOUT = 30 # Seconds before a single API request is abandoned
+OUTPUT_FORMAT = "both" # csv, parquet (append-only snapshot store) or both
+DAEMON_SAVE_INTERVAL = 60 # Seconds between CSV snapshots in --daemon mode
+MAX_RETRIES = 3 # Attempts per address with the fixed backoff
+METRICS_DIR = os.path.join(DATA_DIR, "metrics") # --metrics writes server.prom / server.jsonl here
+RATE_LIMITED_MAX_RETRIES = 8 # Attempts per address when the shared rate limiter paces requests
+WS_SAVE_INTERVAL = 5 # Seconds between snapshots in --ws mode (skipped when nothing changed)
+
+# Write METRICS to METRICS_DIR after every sweep / snapshot (--metrics)
+EXPORT_METRICS = False
+
+# Process-wide adaptive rate limiter (created by --target-rps, shared by every worker)
+RATE_LIMITER = None
+
+# Shared keep-alive session so the threaded workers reuse TLS connections
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS))
 
 def load_wallet_addresses():
     """Load wallet addresses from text file"""
@@ -48,83 +77,129 @@ def ensure_data_dir():
 
 def get_positions_for_address(address):
     """Fetch positions for a specific wallet address"""
-    max_retries = 3
+    data, address, _, _ = fetch_positions_detailed(address)
+    return data, address
+
+def fetch_positions_detailed(address):
+    """
+    get_positions_for_address plus the last error (None on success) and how long the final
+    HTTP attempt took, excluding rate-limiter waits and backoff, for the address registry
+    """
+    max_retries = RATE_LIMITED_MAX_RETRIES if RATE_LIMITER else MAX_RETRIES
     base_delay = 0.5
+    error, latency = None, 0.0
     
     for retry in range(max_retries):
+        response, sent = None, None
         try:
             payload = {
                 "type": "clearinghouseState",
                 "user": address
             }
             
-            response = requests.post(API_URL, headers=HEADERS, json=payload)
+            if RATE_LIMITER:
+                RATE_LIMITER.acquire()
+            sent = time.perf_counter()
+            response = SESSION.post(API_URL, json=payload, timeout=REQUEST_TIMEOUT)
+            latency = time.perf_counter() - sent
+            METRICS.observe_request("clearinghouseState", response.status_code, latency)
             
             if response.status_code == 429:
-                delay = base_delay * (2 ** retry)
-                time.sleep(delay)
+                error = "HTTP 429 (rate limited)"
+                if RATE_LIMITER:
+                    RATE_LIMITER.on_throttle(parse_retry_after(response.headers.get('Retry-After')))
+                else:
+                    delay = base_delay * (2 ** retry)
+                    time.sleep(delay)
                 continue
                 
             response.raise_for_status()
-            return response.json(), address
+            if RATE_LIMITER:
+                RATE_LIMITER.on_success()
+            return response.json(), address, None, latency
             
         except Exception as e:
+            error = str(e) or type(e).__name__
+            if sent is not None and response is None:
+                latency = time.perf_counter() - sent
+                METRICS.observe_request("clearinghouseState", "error", latency)
             if retry == max_retries - 1:
                 print(f"{Fore.RED} Error fetching positions for {address[:6]}...{address[-4:]}: {str(e)}")
                 
-    return None, address
+    return None, address, error, latency
 
-def process_positions(data, address):
-    """Process the position data"""
-    if not data or "assetPositions" not in data:
-        return []
-        
-    positions = []
-    for pos in data["assetPositions"]:
-        if "position" in pos:
-            p = pos["position"]
-            
-            try:
-                size = float(p.get("szi", "0"))
-                position_value = float(p.get("positionValue", "0"))
-                
-                if position_value < MIN_POSITION_VALUE:
-                    continue
+async def get_positions_for_address_async(session, address):
+    """Fetch positions for a specific wallet address using a shared aiohttp session"""
+    data, address, _, _ = await fetch_positions_detailed_async(session, address)
+    return data, address
 
-                position_info = {
-                    "address": address,
-                    "coin": p.get("coin", ""),
-                    "entry_price": float(p.get("entryPx", "0")),
-                    "leverage": p.get("leverage", {}).get("value", 0),
-                    "position_value": position_value,
-                    "unrealized_pnl": float(p.get("unrealizedPnl", "0")),
-                    "liquidation_price": float(p.get("liquidationPx", "0") or 0),
-                    "is_long": size > 0,
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
-                positions.append(position_info)
-                
-            except Exception as e:
-                continue
+async def fetch_positions_detailed_async(session, address):
+    """Async fetch_positions_detailed over a shared aiohttp session"""
+    max_retries = RATE_LIMITED_MAX_RETRIES if RATE_LIMITER else MAX_RETRIES
+    base_delay = 0.5
+    error, latency = None, 0.0
+    payload = {
+        "type": "clearinghouseState",
+        "user": address
+    }
+    
+    for retry in range(max_retries):
+        response, sent = None, None
+        try:
+            if RATE_LIMITER:
+                await RATE_LIMITER.acquire_async()
+            sent = time.perf_counter()
+            async with session.post(API_URL, json=payload) as response:
+                latency = time.perf_counter() - sent
+                METRICS.observe_request("clearinghouseState", response.status, latency)
+                if response.status == 429:
+                    error = "HTTP 429 (rate limited)"
+                    if RATE_LIMITER:
+                        RATE_LIMITER.on_throttle(parse_retry_after(response.headers.get('Retry-After')))
+                    else:
+                        delay = base_delay * (2 ** retry)
+                        await asyncio.sleep(delay)
+                    continue
+                    
+                response.raise_for_status()
+                if RATE_LIMITER:
+                    RATE_LIMITER.on_success()
+                return await response.json(content_type=None), address, None, latency
                 
-    return positions
-
-def process_address_data(address):
-    """Process a single address - for parallel execution"""
-    time.sleep(API_REQUEST_DELAY)
-    data, address = get_positions_for_address(address)
-    if data:
-        return process_positions(data, address)
-    return []    
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            if sent is not None and response is None:
+                latency = time.perf_counter() - sent
+                METRICS.observe_request("clearinghouseState", "error", latency)
+            if retry == max_retries - 1:
+                print(f"{Fore.RED} Error fetching positions for {address[:6]}...{address[-4:]}: {str(e)}")
                 
-def save_positions_to_csv(all_positions):
-    """Save positions to CSV files"""
-    if not all_positions:
+    return None, address, error, latency
+
+def fetch_address_data(address):
+    """Fetch the raw payload for a single address - for parallel execution"""
+    if not RATE_LIMITER:
+        time.sleep(API_REQUEST_DELAY)
+    return get_positions_for_address(address)
+
+def fetch_address_data_detailed(address):
+    """fetch_address_data plus the error and request time (not the pacing delay), for the address registry"""
+    if not RATE_LIMITER:
+        time.sleep(API_REQUEST_DELAY)
+    return fetch_positions_detailed(address)
+
+@METRICS.timed('save')
+def save_positions_to_csv(all_positions, agg_df=None):
+    """
+    Save positions (a DataFrame or a list of position dicts) to CSV files and/or the Parquet snapshot store.
+    agg_df is an already-maintained rollup (e.g. from an AggregationStore); without it one is computed.
+    """
+    if all_positions is None or len(all_positions) == 0:
         print("No positions found to save!")
         return None, None
     
     # Create DataFrame
-    df = pd.DataFrame(all_positions)
+    df = all_positions if isinstance(all_positions, pd.DataFrame) else pd.DataFrame(all_positions)
     
     # Format numeric columns
     numeric_cols = ['entry_price', 'position_value', 'unrealized_pnl', 'liquidation_price']
@@ -133,68 +208,275 @@ def save_positions_to_csv(all_positions):
             df[col] = df[col].astype(float)
     
     # Save all positions
-    positions_file = os.path.join(DATA_DIR, "positions_on_hlp.csv")
-    df.to_csv(positions_file, index=False, float_format='%.2f')
-    print(f"{Fore.GREEN} Saved {len(all_positions)} positions to {positions_file}")
-    
-    # Create and save aggregated view
-    agg_df = df.groupby(['coin', 'is_long']).agg({
-        'position_value': 'sum',
-        'unrealized_pnl': 'sum',
-        'address': 'count',
-        'leverage': 'mean',
-        'liquidation_price': lambda x: np.nan if all(pd.isna(x)) else np.nanmean(x)
-    }).reset_index()
-    
-    # Add direction and rename columns
-    agg_df['direction'] = agg_df['is_long'].apply(lambda x: 'LONG' if x else 'SHORT')
-    agg_df = agg_df.rename(columns={
-        'address': 'num_traders',
-        'position_value': 'total_value',
-        'unrealized_pnl': 'total_pnl',
-        'leverage': 'avg_leverage'
-    })
-    
-    # Sort by total value
-    agg_df = agg_df.sort_values('total_value', ascending=False)
+    if OUTPUT_FORMAT in ("csv", "both"):
+        positions_file = os.path.join(DATA_DIR, "positions_on_hlp.csv")
+        df.to_csv(positions_file, index=False, float_format='%.2f')
+        print(f"{Fore.GREEN} Saved {len(all_positions)} positions to {positions_file}")
+    
+    # Create and save aggregated view (mean skips NaN, so every aggregation stays on the vectorized path)
+    if agg_df is None:
+        with METRICS.stage('aggregate', rows=len(df)):
+            agg_df = df.groupby(['coin', 'is_long'], observed=True).agg({
+                'position_value': 'sum',
+                'unrealized_pnl': 'sum',
+                'address': 'count',
+                'leverage': 'mean',
+                'liquidation_price': 'mean'
+            }).reset_index()
+        
+        # Add direction and rename columns
+        agg_df['direction'] = np.where(agg_df['is_long'], 'LONG', 'SHORT')
+        agg_df = agg_df.rename(columns={
+            'address': 'num_traders',
+            'position_value': 'total_value',
+            'unrealized_pnl': 'total_pnl',
+            'leverage': 'avg_leverage'
+        })
+        
+        # Sort by total value
+        agg_df = agg_df.sort_values('total_value', ascending=False)
     
     # Save aggregated view
-    agg_file = os.path.join(DATA_DIR, "agg_positions_on_hlp.csv")
-    agg_df.to_csv(agg_file, index=False, float_format='%.2f')
-    print(f"{Fore.GREEN} Saved aggregated positions to {agg_file}")
+    if OUTPUT_FORMAT in ("csv", "both"):
+        agg_file = os.path.join(DATA_DIR, "agg_positions_on_hlp.csv")
+        agg_df.to_csv(agg_file, index=False, float_format='%.2f')
+        print(f"{Fore.GREEN} Saved aggregated positions to {agg_file}")
+    
+    # Append both views to the snapshot store under one snapshot id
+    if OUTPUT_FORMAT in ("parquet", "both"):
+        store_dir = os.path.join(DATA_DIR, "store")
+        snapshot_id = new_snapshot_id()
+        SnapshotStore("positions", store_dir).append(df, snapshot_id)
+        SnapshotStore("aggregates", store_dir).append(agg_df, snapshot_id)
+        print(f"{Fore.GREEN} Appended snapshot {snapshot_id} to {store_dir}")
     
     return df, agg_df
 
-def fetch_all_positions_parallel(addresses):
-    """Fetch positions for all addresses in parallel"""
+def export_metrics():
+    """Write the metrics files for the run that just finished (with --metrics) and start the next run"""
+    if EXPORT_METRICS:
+        try:
+            METRICS.export(METRICS_DIR, "server")
+        except Exception as e:
+            print(f"{Fore.RED} Error writing metrics: {str(e)}")
+    METRICS.start_run()
+
+def report_rate_limiter():
+    """Print the rate the shared limiter settled on, if one is active"""
+    if RATE_LIMITER:
+        stats = RATE_LIMITER.stats()
+        print(f"{Fore.CYAN} Rate limiter: {stats['rate_rps']} req/s (ceiling {stats['max_rps']}), "
+              f"{stats['throttled']} throttled of {stats['requests']} requests")
+
+def fetch_all_positions_parallel(addresses, registry=None):
+    """Fetch positions for all addresses in parallel; returns a positions DataFrame (results are recorded in registry if given)"""
     total_addresses = len(addresses)
     print(f"{Fore.YELLOW} Processing {total_addresses} addresses with {MAX_WORKERS} workers")
     
-    all_positions = []
+    # Workers only fetch; payloads are parsed into column buffers on this thread as they complete
+    builder = PositionColumnBuilder(MIN_POSITION_VALUE)
     with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_address = {executor.submit(process_address_data, address): address for address in addresses}
+        future_to_address = {executor.submit(fetch_address_data_detailed, address): address for address in addresses}
         
         with tqdm(total=total_addresses, desc="Fetching positions") as progress_bar:
             for future in concurrent.futures.as_completed(future_to_address):
                 try:
-                    positions = future.result()
-                    if positions:
-                        all_positions.extend(positions)
+                    data, address, error, latency = future.result()
+                    parse_start = time.perf_counter()
+                    rows = builder.add_payload(data, address)
+                    METRICS.add_stage_time('parse', time.perf_counter() - parse_start, rows)
+                    if registry:
+                        registry.observe(address, data, latency, error)
+                except Exception as e:
+                    print(f"{Fore.RED} Error processing address: {str(e)}")
+                progress_bar.update(1)
+    
+    print(f"{Fore.GREEN} Found {len(builder)} total positions")
+    report_rate_limiter()
+    if registry:
+        registry.flush()
+    return builder.to_dataframe()
+
+async def fetch_all_positions_async(addresses, concurrency=MAX_CONCURRENT_REQUESTS, registry=None):
+    """Fetch positions for all addresses with asyncio over one pooled keep-alive client; returns a positions DataFrame (results are recorded in registry if given)"""
+    total_addresses = len(addresses)
+    print(f"{Fore.YELLOW} Processing {total_addresses} addresses with {concurrency} requests in flight")
+    
+    builder = PositionColumnBuilder(MIN_POSITION_VALUE)
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=60)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout) as session:
+        async def fetch_one(address):
+            async with semaphore:
+                if not RATE_LIMITER and API_REQUEST_DELAY > 0:
+                    await asyncio.sleep(API_REQUEST_DELAY)
+                return await fetch_positions_detailed_async(session, address)
+        
+        tasks = [asyncio.create_task(fetch_one(address)) for address in addresses]
+        
+        with tqdm(total=total_addresses, desc="Fetching positions") as progress_bar:
+            for next_result in asyncio.as_completed(tasks):
+                try:
+                    data, address, error, latency = await next_result
+                    parse_start = time.perf_counter()
+                    rows = builder.add_payload(data, address)
+                    METRICS.add_stage_time('parse', time.perf_counter() - parse_start, rows)
+                    if registry:
+                        registry.observe(address, data, latency, error)
                 except Exception as e:
                     print(f"{Fore.RED} Error processing address: {str(e)}")
                 progress_bar.update(1)
     
-    print(f"{Fore.GREEN} Found {len(all_positions)} total positions")
-    return all_positions
+    print(f"{Fore.GREEN} Found {len(builder)} total positions")
+    report_rate_limiter()
+    if registry:
+        registry.flush()
+    return builder.to_dataframe()
+
+async def run_polling_daemon(addresses, concurrency=MAX_CONCURRENT_REQUESTS, save_interval=DAEMON_SAVE_INTERVAL):
+    """
+    Poll addresses forever, each on its own refresh interval (see poll_scheduler).
+    Hot addresses are re-polled every few seconds, dormant ones back off to minutes.
+    """
+    scheduler = PollScheduler(addresses, MIN_POSITION_VALUE)
+    parser = PositionColumnBuilder(MIN_POSITION_VALUE)
+    positions_by_address = {}
+    aggregates = AggregationStore()
+    in_flight = set()
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=60)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    
+    print(f"{Fore.YELLOW} Polling daemon started for {len(scheduler)} addresses with {concurrency} requests in flight")
+    
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout) as session:
+        async def poll(address):
+            try:
+                if not RATE_LIMITER and API_REQUEST_DELAY > 0:
+                    await asyncio.sleep(API_REQUEST_DELAY)
+                data, _ = await get_positions_for_address_async(session, address)
+                if data is None:
+                    scheduler.reschedule(address, None, failed=True)
+                    return
+                parse_start = time.perf_counter()
+                rows = parser.parse_payload(data)
+                METRICS.add_stage_time('parse', time.perf_counter() - parse_start, len(rows))
+                if rows:
+                    positions_by_address[address] = rows
+                else:
+                    positions_by_address.pop(address, None)
+                aggregates.update_address(address, rows)
+                scheduler.reschedule(address, data)
+            except Exception as e:
+                print(f"{Fore.RED} Error processing address: {str(e)}")
+                scheduler.reschedule(address, None, failed=True)
+            finally:
+                semaphore.release()
+        
+        def spawn(address):
+            task = asyncio.create_task(poll(address))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        
+        next_save = time.monotonic() + save_interval
+        try:
+            while True:
+                address = scheduler.pop_due()
+                if address is not None:
+                    await semaphore.acquire()
+                    spawn(address)
+                    continue
+                
+                if time.monotonic() >= next_save:
+                    builder = PositionColumnBuilder(MIN_POSITION_VALUE)
+                    for held_address, rows in positions_by_address.items():
+                        builder.add_rows(held_address, rows)
+                    snapshot = builder.to_dataframe()
+                    tiers = scheduler.tier_counts()
+                    print(f"{Fore.CYAN} {datetime.now().strftime('%H:%M:%S')} snapshot: {len(snapshot)} positions | "
+                          f"hot {tiers['hot']} | warm {tiers['warm']} | cold {tiers['cold']} | errors {tiers['error']}")
+                    report_rate_limiter()
+                    await asyncio.to_thread(save_positions_to_csv, snapshot, aggregates.to_dataframe())
+                    export_metrics()
+                    next_save = time.monotonic() + save_interval
+                    continue
+                
+                wait = scheduler.seconds_until_next()
+                await asyncio.sleep(min(wait if wait is not None else 1.0, 1.0, max(0.0, next_save - time.monotonic())))
+        finally:
+            for task in list(in_flight):
+                task.cancel()
+
+def report_closest_liquidations(book, current_prices, k=3):
+    """Print the k positions per side closest to liquidation, straight from the liquidation book"""
+    for is_long, label, color in ((True, "LONG", Fore.GREEN), (False, "SHORT", Fore.RED)):
+        for distance, coin, liq, value, address in book.closest_to_liquidation(current_prices, is_long, k):
+            print(f"{color}   {label:<5} {coin:<8} ${value:>14,.0f} liq ${liq:,.6g} ({distance:.2f}% away) "
+                  f"{address[:6]}...{address[-4:]}")
+
+async def run_ws_ingest(addresses, url=WS_URL, save_interval=WS_SAVE_INTERVAL):
+    """
+    Stream per-user state and mark prices over WebSocket into an in-memory table and
+    snapshot it every save_interval seconds. REST is only used to resync quiet addresses
+    and to poll the addresses beyond the WebSocket connection cap.
+    """
+    table = PositionTable(MIN_POSITION_VALUE)
+    ingestor = WsIngestor(addresses, table, url, resync=fetch_address_data)
+    ingest_task = asyncio.create_task(ingestor.run())
+    saved_version = 0
+    
+    try:
+        while True:
+            await asyncio.sleep(save_interval)
+            if ingest_task.done():
+                ingest_task.result()
+                return
+            if table.version == saved_version:
+                continue
+            saved_version = table.version
+            snapshot = table.to_dataframe()
+            stats = ingestor.stats()
+            print(f"{Fore.CYAN} {datetime.now().strftime('%H:%M:%S')} snapshot: {len(snapshot)} positions | "
+                  f"{stats['addresses']} addresses | {stats['messages']} messages | "
+                  f"{stats['connects']} connects | {stats['resyncs']} resyncs | {stats['polls']} polls")
+            report_closest_liquidations(table.book, {coin: float(mid) for coin, mid in table.mids.items()})
+            await asyncio.to_thread(save_positions_to_csv, snapshot, table.aggregates_dataframe())
+            export_metrics()
+    finally:
+        ingestor.stop()
+        ingest_task.cancel()
 
 def main():
     """Main function to run the position tracker"""
+    global API_REQUEST_DELAY, RATE_LIMITER, OUTPUT_FORMAT, EXPORT_METRICS
+    
     parser = argparse.ArgumentParser(description="Hyperliquid Position Tracker")
     parser.add_argument('--delay', type=float, default=0.1, help='Delay between API requests in seconds (default: 0.1)')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Fetch with asyncio over a single pooled connection instead of threads')
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENT_REQUESTS, help=f'Requests in flight when using --async (default: {MAX_CONCURRENT_REQUESTS})')
+    parser.add_argument('--daemon', action='store_true', help='Run forever, re-polling each address on a priority-based refresh interval')
+    parser.add_argument('--save-interval', type=float, default=None, help=f'Seconds between snapshots in --daemon / --ws mode (default: {DAEMON_SAVE_INTERVAL} / {WS_SAVE_INTERVAL})')
+    parser.add_argument('--store', choices=['csv', 'parquet', 'both'], default=OUTPUT_FORMAT, help=f'Output format: overwrite CSVs, append to the Parquet snapshot store, or both (default: {OUTPUT_FORMAT})')
+    parser.add_argument('--ws', action='store_true', help=f'Run forever, streaming position and price updates over WebSocket instead of polling. '
+                             f'Streams the first {MAX_WS_CONNECTIONS * USERS_PER_CONNECTION} addresses '
+                             f'({MAX_WS_CONNECTIONS} connections x {USERS_PER_CONNECTION}); the rest are polled over REST')
+    parser.add_argument('--ws-url', type=str, default=WS_URL, help=f'WebSocket endpoint for --ws, e.g. a local ws_standin.py (default: {WS_URL})')
+    parser.add_argument('--registry', action='store_true', help=f'Keep per-address state in {REGISTRY_FILE} and skip wallets that are not due (dormant ones back off up to hours)')
+    parser.add_argument('--metrics', action='store_true', help=f'Write per-stage timings, request stats and peak memory to {METRICS_DIR}/server.prom and server.jsonl after every sweep or snapshot')
+    parser.add_argument('--metrics-port', type=int, default=None, help='Also serve the Prometheus metrics at http://127.0.0.1:PORT/metrics')
+    parser.add_argument('--target-rps', type=float, default=None, help='Enable the shared adaptive rate limiter and let it climb up to this many requests/second (replaces --delay)')
     args = parser.parse_args()
     
-    global API_REQUEST_DELAY
     API_REQUEST_DELAY = args.delay
+    OUTPUT_FORMAT = args.store
+    EXPORT_METRICS = args.metrics
+    METRICS.start_run()
+    if args.metrics_port:
+        METRICS.serve(args.metrics_port)
+    if args.target_rps:
+        RATE_LIMITER = AdaptiveRateLimiter(args.target_rps)
     
     ensure_data_dir()
     addresses = load_wallet_addresses()
@@ -202,8 +484,41 @@ def main():
         print("No addresses loaded! Exiting...")
         return
         
-    all_positions = fetch_all_positions_parallel(addresses)
+    if args.ws:
+        try:
+            asyncio.run(run_ws_ingest(addresses, args.ws_url, args.save_interval or WS_SAVE_INTERVAL))
+        except KeyboardInterrupt:
+            print(f"{Fore.YELLOW} WebSocket ingestion stopped")
+        return None, None
+    
+    if args.daemon:
+        try:
+            asyncio.run(run_polling_daemon(addresses, args.concurrency, args.save_interval or DAEMON_SAVE_INTERVAL))
+        except KeyboardInterrupt:
+            print(f"{Fore.YELLOW} Polling daemon stopped")
+        return None, None
+    
+    registry = None
+    if args.registry:
+        registry = AddressRegistry(os.path.join(DATA_DIR, REGISTRY_FILE), MIN_POSITION_VALUE)
+        addresses = registry.sync(addresses)
+        due = registry.due(addresses)
+        stats = registry.summary()
+        print(f"{Fore.CYAN} Registry: {len(due)} of {len(addresses)} addresses due | {stats['dormant']} dormant | "
+              f"{stats['erroring']} erroring | {len(registry.invalid)} invalid | {registry.duplicates} duplicates")
+        addresses = due
+    
+    try:
+        with METRICS.stage('fetch'):
+            if args.use_async:
+                all_positions = asyncio.run(fetch_all_positions_async(addresses, args.concurrency, registry))
+            else:
+                all_positions = fetch_all_positions_parallel(addresses, registry)
+    finally:
+        if registry:
+            registry.close()
     positions_df, agg_df = save_positions_to_csv(all_positions)
+    export_metrics()
     return positions_df, agg_df
 
 if __name__ == "__main__":
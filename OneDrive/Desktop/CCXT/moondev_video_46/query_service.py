@@ -0,0 +1,268 @@
+# query_service.py - Local HTTP service: one upstream fetch per refresh, the dashboard views served as JSON with ETags
+
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+
+import colorama
+import numpy as np
+import pandas as pd
+from aiohttp import web
+from colorama import Fore
+
+import dashboard_3per as dashboard
+from liquidation_ladder import LiquidationLadder
+from signal_replay import DEFAULT_THRESHOLDS, DIRECTION_LABELS, imbalance_pct, threshold_direction
+
+colorama.init(autoreset=True)
+
+QUERY_HOST = "127.0.0.1"
+QUERY_PORT = 8790
+REFRESH_INTERVAL = 60  # Seconds between upstream fetches, however many clients are polling
+DEFAULT_TOP_N = dashboard.TOP_N_POSITIONS
+MAX_TOP_N = 1000
+RESPONSE_CACHE_SIZE = 512  # Encoded responses kept per refresh (one per distinct view + query)
+
+POSITION_FIELDS = ['address', 'coin', 'side', 'position_value', 'entry_price', 'liquidation_price',
+                   'leverage', 'unrealized_pnl']
+RISK_FIELDS = POSITION_FIELDS + ['current_price', 'distance_to_liq_pct']
+AGGREGATE_FIELDS = ['coin', 'direction', 'total_value', 'num_traders', 'avg_value_per_trader',
+                    'avg_leverage', 'avg_liquidation_price', 'total_pnl']
+
+class QueryError(Exception):
+    """A bad query parameter, reported to the client as 400"""
+
+def parse_query(query):
+    """(coins or None, 'LONG'/'SHORT'/None, top N) from the coin, side and top parameters (coins as given)"""
+    coins = [c.strip() for c in query.get('coin', '').split(',') if c.strip()] or None
+    side = query.get('side', '').strip().upper() or None
+    if side not in (None, 'LONG', 'SHORT'):
+        raise QueryError("side must be long or short")
+    try:
+        top = int(query.get('top', DEFAULT_TOP_N))
+    except ValueError:
+        raise QueryError("top must be an integer")
+    if not 1 <= top <= MAX_TOP_N:
+        raise QueryError(f"top must be between 1 and {MAX_TOP_N}")
+    return coins, side, top
+
+class ViewCache:
+    """
+    Everything one refresh needs to answer every view: positions sorted by size, positions
+    with a liquidation price sorted by distance from the mark, each coin's "within x%" ladder
+    values and the coin/side aggregates. Views are filtered and encoded on first request and
+    kept until the next install(); the ETag is a hash of the body, so a refresh that changes
+    nothing keeps every client's cached copy valid.
+    """
+
+    def __init__(self, thresholds=DEFAULT_THRESHOLDS):
+        self.thresholds = list(thresholds)
+        self.refreshed_at = None
+        self.version = 0
+        self._responses = {}
+        self.by_value = None
+        self.by_distance = None
+        self.aggregates = None
+        self.ladder_coins = []
+        self.ladder_long = None   # (coins, thresholds)
+        self.ladder_short = None
+        self.coin_names = {}      # upper-cased coin -> coin as listed (kPEPE, not KPEPE)
+
+    def install(self, df, prices):
+        """Replace the views with a freshly processed positions frame and its coins' mark prices"""
+        # The dashboard's shared enrichment pass, so sides and distances match its views
+        df = dashboard.enrich_positions(df, prices) if not df.empty else df.assign(
+            **{column: pd.Series(dtype=float) for column in dashboard.ENRICHED_COLUMNS})
+        by_value = df.sort_values('position_value', ascending=False, kind='stable')
+        risk = df[(df['liquidation_price'] > 0) & df['current_price'].notna()]
+        by_distance = risk.sort_values('distance_to_liq_pct', kind='stable')
+
+        ladder = LiquidationLadder.from_positions(df, prices)
+        coins = ladder.coins()
+        within = [ladder.liquidations_within(coin, self.thresholds) for coin in coins]
+        shape = (len(coins), len(self.thresholds))
+
+        self.by_value = by_value[POSITION_FIELDS].reset_index(drop=True)
+        self.by_distance = by_distance[RISK_FIELDS].reset_index(drop=True)
+        if df.empty:
+            self.aggregates = pd.DataFrame(columns=AGGREGATE_FIELDS)
+        else:
+            self.aggregates = dashboard.aggregate_positions(df)[AGGREGATE_FIELDS].reset_index(drop=True)
+        self.ladder_coins = coins
+        self.coin_names = {str(coin).upper(): str(coin) for coin in df['coin'].unique()} if not df.empty else {}
+        self.ladder_long = np.array([w[0] for w in within]).reshape(shape)
+        self.ladder_short = np.array([w[1] for w in within]).reshape(shape)
+        self.refreshed_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.version += 1
+        self._responses = {}
+
+    @staticmethod
+    def _filter(frame, coins, side, column='side'):
+        mask = np.ones(len(frame), dtype=bool)
+        if coins:
+            mask &= frame['coin'].isin(coins).to_numpy()
+        if side:
+            mask &= (frame[column] == side).to_numpy()
+        return frame[mask]
+
+    def top_positions(self, coins, side, top):
+        return self._filter(self.by_value, coins, side).head(top)
+
+    def nearest_liquidations(self, coins, side, top):
+        return self._filter(self.by_distance, coins, side).head(top)
+
+    def aggregate_view(self, coins, side, top):
+        return self._filter(self.aggregates, coins, side, column='direction').head(top)
+
+    def threshold_table(self, coins, side, top):
+        """The dashboard's liquidation thresholds table, summed over coins (default TOKENS_TO_ANALYZE)"""
+        coins = coins or dashboard.TOKENS_TO_ANALYZE
+        rows = [i for i, coin in enumerate(self.ladder_coins) if coin in coins]
+        long_values = self.ladder_long[rows].sum(axis=0) if rows else np.zeros(len(self.thresholds))
+        short_values = self.ladder_short[rows].sum(axis=0) if rows else np.zeros(len(self.thresholds))
+        totals = long_values + short_values
+        return pd.DataFrame({
+            'threshold_pct': self.thresholds,
+            'long_value': long_values,
+            'short_value': short_values,
+            'total_value': totals,
+            'imbalance_pct': imbalance_pct(long_values, short_values),
+            'direction': [DIRECTION_LABELS[call] if total != 0 else "" for call, total
+                          in zip(threshold_direction(long_values, short_values), totals)],
+        })
+
+    def response(self, view, query):
+        """(etag, JSON body) for one view and query, encoded once per refresh"""
+        coins, side, top = parse_query(query)
+        if coins:
+            # Case-insensitive match against the loaded coins; unknown coins are kept as given
+            coins = [self.coin_names.get(coin.upper(), coin) for coin in coins]
+        key = (view, tuple(coins or ()), side, top)
+        cached = self._responses.get(key)
+        if cached is not None:
+            return cached
+
+        frame = VIEWS[view](self, coins, side, top)
+        rows = frame.to_json(orient='records', double_precision=10)
+        header = json.dumps({'view': view, 'refreshed_at': self.refreshed_at,
+                             'coin': coins, 'side': side, 'top': top, 'count': len(frame)})
+        body = (header[:-1] + ', "rows": ' + rows + '}').encode()
+        etag = hashlib.blake2b(f"{key}{rows}".encode(), digest_size=12).hexdigest()  # Not the refresh time
+        cached = (f'"{etag}"', body)
+        if len(self._responses) >= RESPONSE_CACHE_SIZE:
+            self._responses.clear()
+        self._responses[key] = cached
+        return cached
+
+VIEWS = {
+    'positions/top': ViewCache.top_positions,
+    'liquidations/nearest': ViewCache.nearest_liquidations,
+    'liquidations/thresholds': ViewCache.threshold_table,
+    'aggregates': ViewCache.aggregate_view,
+}
+
+class QueryService:
+    """Refreshes the ViewCache from upstream every interval and answers HTTP requests from it"""
+
+    def __init__(self, interval=REFRESH_INTERVAL, coin=None):
+        self.interval = interval
+        self.coin = coin
+        self.cache = ViewCache()
+        self.api = None
+        self.requests = 0
+        self.not_modified = 0
+        self.last_error = None
+
+    def fetch(self):
+        """One upstream fetch and processing pass (runs in a worker thread)"""
+        if self.api is None:
+            self.api = dashboard.MoonDevAPI()
+        positions_df = dashboard.fetch_positions_from_api(self.api)
+        if positions_df is None:
+            raise RuntimeError("no positions received from the API")
+        df = dashboard.process_positions(positions_df, self.coin)
+        prices = dashboard.held_mark_prices(df, None, "the query service") if not df.empty else {}
+        return df, prices
+
+    async def refresh(self):
+        start = time.time()
+        try:
+            df, prices = await asyncio.to_thread(self.fetch)
+            self.cache.install(df, prices)
+            self.last_error = None
+            print(f"{Fore.GREEN}🟢 Refreshed {len(df):,} positions across {len(prices)} coins in {time.time() - start:.2f}s")
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"{Fore.RED}✗ Refresh failed, still serving the previous data: {str(e)}")
+
+    async def refresh_loop(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    async def handle_view(self, request):
+        view = request.match_info['view']
+        if view not in VIEWS:
+            return web.json_response({'error': f"unknown view {view}", 'views': list(VIEWS)}, status=404)
+        if self.cache.refreshed_at is None:
+            return web.json_response({'error': "no data yet, first refresh in progress"}, status=503,
+                                     headers={'Retry-After': '5'})
+        self.requests += 1
+        try:
+            etag, body = self.cache.response(view, request.query)
+        except QueryError as e:
+            return web.json_response({'error': str(e)}, status=400)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag in request.headers.get('If-None-Match', ''):
+            self.not_modified += 1
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body, content_type='application/json', headers=headers)
+
+    async def handle_health(self, request):
+        return web.json_response({
+            'refreshed_at': self.cache.refreshed_at,
+            'version': self.cache.version,
+            'positions': 0 if self.cache.by_value is None else len(self.cache.by_value),
+            'requests': self.requests,
+            'not_modified': self.not_modified,
+            'last_error': self.last_error,
+            'views': list(VIEWS),
+        })
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get('/health', self.handle_health)
+        app.router.add_get('/{view:.+}', self.handle_view)
+        return app
+
+    async def serve(self, host, port):
+        runner = web.AppRunner(self.app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        print(f"{Fore.CYAN}🌐 Serving {', '.join('/' + v for v in VIEWS)} on http://{host}:{port} "
+              f"(refresh every {self.interval}s)")
+        try:
+            await self.refresh_loop()
+        finally:
+            await runner.cleanup()
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Serve the dashboard's views as JSON from one shared refresh")
+    parser.add_argument('--host', type=str, default=QUERY_HOST, help=f'Interface to listen on (default: {QUERY_HOST})')
+    parser.add_argument('--port', type=int, default=QUERY_PORT, help=f'Port to listen on (default: {QUERY_PORT})')
+    parser.add_argument('--interval', type=int, default=REFRESH_INTERVAL,
+                        help=f'Seconds between upstream refreshes (default: {REFRESH_INTERVAL})')
+    parser.add_argument('--coin', type=str, default=None, help='Only load positions for this coin')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(QueryService(args.interval, args.coin).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}👋 Query service stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# rate_limiter.py - Process-wide adaptive rate limiter shared by all fetch workers
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Limiter defaults
+DEFAULT_MIN_RPS = 1.0          # Never slow down below this many requests per second
+DEFAULT_INCREASE_STEP = 1.0    # Requests per second added for every second of clean responses
+DEFAULT_DECREASE_FACTOR = 0.5  # Rate multiplier applied when the API answers 429
+DEFAULT_DECREASE_COOLDOWN = 1.0  # Seconds between two rate cuts, so one burst of 429s only counts once
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header (delta seconds or HTTP date) into seconds, or None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket whose refill rate follows AIMD (additive increase, multiplicative decrease).
+
+    Every worker calls acquire() (threads) or acquire_async() (asyncio) before a request and
+    reports the outcome with on_success() / on_throttle(). A 429 cuts the rate for everyone
+    and a Retry-After pauses every worker, so one throttled request never becomes a storm.
+    """
+
+    def __init__(self, target_rps, min_rps=DEFAULT_MIN_RPS, start_rps=None,
+                 increase_step=DEFAULT_INCREASE_STEP, decrease_factor=DEFAULT_DECREASE_FACTOR,
+                 decrease_cooldown=DEFAULT_DECREASE_COOLDOWN, burst=None):
+        if target_rps <= 0:
+            raise ValueError("target_rps must be positive")
+        self.max_rps = float(target_rps)
+        self.min_rps = min(float(min_rps), self.max_rps)
+        self.rate = float(start_rps) if start_rps else max(self.min_rps, self.max_rps / 2)
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.burst = float(burst) if burst else max(1.0, self.max_rps / 10)
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+
+        # Counters for reporting
+        self.requests = 0
+        self.throttled = 0
+
+    def _refill(self, now):
+        """Add the tokens earned since the last refill (caller holds the lock)"""
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._last_refill = now
+
+    def _reserve(self):
+        """Take one token and return how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            self.requests += 1
+            # Token debt queues behind the pause, so waiters leave it spaced 1/rate apart
+            return max(0.0, self._paused_until - now) + max(0.0, -self._tokens) / self.rate
+
+    def acquire(self):
+        """Block the calling thread until a request may be sent"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait (without blocking the event loop) until a request may be sent"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_success(self):
+        """Additive increase: climb by increase_step requests/second per second of clean responses"""
+        with self._lock:
+            self.rate = min(self.max_rps, self.rate + self.increase_step / self.rate)
+
+    def on_throttle(self, retry_after=None):
+        """Multiplicative decrease on 429, and pause every worker for Retry-After seconds"""
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self._refill(now)
+                self.rate = max(self.min_rps, self.rate * self.decrease_factor)
+                self._tokens = min(self._tokens, 0.0)
+                self._last_decrease = now
+            if retry_after:
+                self._refill(now)
+                self._paused_until = max(self._paused_until, now + retry_after)
+                # Nothing accrues during the pause: refilling resumes when it ends
+                self._tokens = min(self._tokens, 0.0)
+                self._last_refill = max(self._last_refill, self._paused_until)
+
+    def stats(self):
+        """Return a snapshot of the limiter state for logging"""
+        with self._lock:
+            return {
+                'rate_rps': round(self.rate, 2),
+                'max_rps': self.max_rps,
+                'requests': self.requests,
+                'throttled': self.throttled,
+            }
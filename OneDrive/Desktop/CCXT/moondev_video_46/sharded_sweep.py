@@ -0,0 +1,311 @@
+# sharded_sweep.py - Sweep the whale list with worker processes on one or more hosts, merged by a coordinator
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import socket
+import struct
+import time
+from datetime import datetime, timezone
+
+import aiohttp
+import colorama
+import pyarrow as pa
+from colorama import Fore
+
+import ppls_pos_server as server
+from position_columns import PositionColumnBuilder, apply_position_schema
+from rate_limiter import AdaptiveRateLimiter
+
+colorama.init(autoreset=True)
+
+DEFAULT_PORT = 9500
+BATCH_ADDRESSES = 500  # A worker streams a batch to the coordinator after this many addresses
+WORKER_CONNECT_RETRIES = 10
+
+# Wire protocol: 1-byte frame type + 4-byte big-endian length, then the payload
+FRAME_HEADER = struct.Struct('!cI')
+HELLO, START, BATCH, DONE, NO_WORK = b'H', b'S', b'B', b'D', b'N'
+
+# Every shard sends its columns with this schema so the coordinator can concatenate them
+# (POSITION_DTYPES on the wire: categoricals travel as dictionaries, each address and coin sent once per batch;
+# leverage goes as float64 so whole and fractional shards share one schema, and merged() compacts it again)
+POSITION_SCHEMA = pa.schema([
+    ('address', pa.dictionary(pa.int32(), pa.string())), ('coin', pa.dictionary(pa.int32(), pa.string())),
+    ('entry_price', pa.float64()), ('leverage', pa.float64()), ('position_value', pa.float64()),
+    ('unrealized_pnl', pa.float64()), ('liquidation_price', pa.float64()), ('is_long', pa.bool_()),
+    ('timestamp', pa.timestamp('s')),
+])
+
+def shard_of(address, n_shards):
+    """Stable shard index for an address (the same on every host and Python process)"""
+    digest = hashlib.blake2b(address.lower().encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % n_shards
+
+def partition(addresses, n_shards):
+    """Split addresses into n_shards lists by address hash"""
+    shards = [[] for _ in range(n_shards)]
+    for address in addresses:
+        shards[shard_of(address, n_shards)].append(address)
+    return shards
+
+async def write_frame(writer, kind, payload=b''):
+    writer.write(FRAME_HEADER.pack(kind, len(payload)) + payload)
+    await writer.drain()
+
+async def read_frame(reader):
+    kind, length = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    return kind, await reader.readexactly(length)
+
+def table_to_ipc(df):
+    table = pa.Table.from_pandas(df, schema=POSITION_SCHEMA, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, POSITION_SCHEMA) as stream:
+        stream.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def ipc_to_table(payload):
+    return pa.ipc.open_stream(pa.py_buffer(payload)).read_all()
+
+class SweepCoordinator:
+    """
+    Hands out shards to whichever workers connect, collects their Arrow batches and
+    only publishes once every shard has reported done. A worker that disconnects
+    mid-shard has its partial batches discarded and the shard goes back in the queue,
+    so the merged snapshot never mixes a shard's partial and retried results.
+    """
+
+    def __init__(self, shards, snapshot_time):
+        self.shards = shards
+        self.snapshot_time = snapshot_time
+        self.pending = list(range(len(shards)))
+        self.batches = {}
+        self.done = {}
+        self.complete = asyncio.Event()
+        if not shards:
+            self.complete.set()
+
+    async def handle_worker(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        try:
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind != HELLO:
+                    raise ValueError(f"expected HELLO, got {kind!r}")
+                hello = json.loads(payload)
+                if not self.pending:
+                    await write_frame(writer, NO_WORK)
+                    return
+                shard = self.pending.pop(0)
+                self.batches[shard] = []
+                await write_frame(writer, START, json.dumps({
+                    'shard': shard,
+                    'shards': len(self.shards),
+                    'snapshot_time': self.snapshot_time.isoformat(),
+                    'api_url': server.API_URL,
+                    'min_position_value': server.MIN_POSITION_VALUE,
+                    'addresses': self.shards[shard],
+                }).encode())
+                try:
+                    while True:
+                        kind, payload = await read_frame(reader)
+                        if kind == BATCH:
+                            self.batches[shard].append(ipc_to_table(payload))
+                        elif kind == DONE:
+                            self.done[shard] = {**json.loads(payload), 'host': hello.get('host')}
+                            stats = self.done[shard]
+                            print(f"{Fore.GREEN} Shard {shard + 1}/{len(self.shards)} done on {stats['host']}: "
+                                  f"{stats['addresses']} addresses, {stats['rows']} positions in {stats['seconds']:.1f}s")
+                            break
+                        else:
+                            raise ValueError(f"unexpected frame {kind!r}")
+                except BaseException:
+                    # Partial shard: drop it and let another worker redo it from scratch
+                    self.batches.pop(shard, None)
+                    self.pending.insert(0, shard)
+                    raise
+                if len(self.done) == len(self.shards):
+                    self.complete.set()
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            if not self.complete.is_set():
+                print(f"{Fore.YELLOW} Worker {peer} disconnected: {type(e).__name__}")
+        except Exception as e:
+            print(f"{Fore.RED} Error from worker {peer}: {str(e)}")
+        finally:
+            writer.close()
+
+    def merged(self):
+        """One DataFrame with every shard's rows, in shard order"""
+        tables = [table for shard in range(len(self.shards)) for table in self.batches.get(shard, [])]
+        if not tables:
+            return POSITION_SCHEMA.empty_table().to_pandas()
+        # Each batch has its own dictionaries; re-sort the merged categories into the schema's order
+        return apply_position_schema(pa.concat_tables(tables).to_pandas())
+
+async def stream_shard(writer, addresses, snapshot_time, concurrency):
+    """Fetch one shard's addresses, sending a columnar batch every BATCH_ADDRESSES completions"""
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=60)
+    timeout = aiohttp.ClientTimeout(total=server.REQUEST_TIMEOUT)
+    builder = PositionColumnBuilder(server.MIN_POSITION_VALUE, snapshot_time)
+    rows = 0
+    completed = 0
+
+    async with aiohttp.ClientSession(headers=server.HEADERS, connector=connector, timeout=timeout) as session:
+        async def fetch_one(address):
+            async with semaphore:
+                if not server.RATE_LIMITER and server.API_REQUEST_DELAY > 0:
+                    await asyncio.sleep(server.API_REQUEST_DELAY)
+                return await server.get_positions_for_address_async(session, address)
+
+        tasks = [asyncio.create_task(fetch_one(address)) for address in addresses]
+        for next_result in asyncio.as_completed(tasks):
+            try:
+                data, address = await next_result
+                builder.add_payload(data, address)
+            except Exception as e:
+                print(f"{Fore.RED} Error processing address: {str(e)}")
+            completed += 1
+            if completed % BATCH_ADDRESSES == 0 and len(builder):
+                rows += len(builder)
+                await write_frame(writer, BATCH, table_to_ipc(builder.to_dataframe()))
+                builder = PositionColumnBuilder(server.MIN_POSITION_VALUE, snapshot_time)
+
+    if len(builder):
+        rows += len(builder)
+        await write_frame(writer, BATCH, table_to_ipc(builder.to_dataframe()))
+    return rows
+
+async def worker_loop(host, port, concurrency):
+    """Claim shards from the coordinator until it has none left"""
+    for attempt in range(WORKER_CONNECT_RETRIES):
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            break
+        except OSError:
+            await asyncio.sleep(min(2 ** attempt * 0.1, 5))
+    else:
+        print(f"{Fore.RED} Could not reach coordinator at {host}:{port}")
+        return
+
+    try:
+        while True:
+            await write_frame(writer, HELLO, json.dumps({'host': socket.gethostname()}).encode())
+            kind, payload = await read_frame(reader)
+            if kind != START:
+                return
+            job = json.loads(payload)
+            # Every host filters with the coordinator's settings so the shards merge into one snapshot
+            server.API_URL = job['api_url']
+            server.MIN_POSITION_VALUE = job['min_position_value']
+            start = time.perf_counter()
+            rows = await stream_shard(writer, job['addresses'], datetime.fromisoformat(job['snapshot_time']), concurrency)
+            await write_frame(writer, DONE, json.dumps({
+                'addresses': len(job['addresses']), 'rows': rows, 'seconds': time.perf_counter() - start,
+            }).encode())
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+def run_worker(host, port, concurrency, target_rps=None):
+    """Worker process entry point"""
+    if target_rps:
+        server.RATE_LIMITER = AdaptiveRateLimiter(target_rps)
+    asyncio.run(worker_loop(host, port, concurrency))
+
+def start_local_workers(count, host, port, concurrency, target_rps=None):
+    """Spawn count worker processes; a per-host rate target is split evenly between them"""
+    per_worker_rps = target_rps / count if target_rps else None
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=run_worker, args=(host, port, concurrency, per_worker_rps), daemon=True)
+                 for _ in range(count)]
+    for process in processes:
+        process.start()
+    return processes
+
+async def run_sweep(addresses, n_shards, local_workers, listen_host='127.0.0.1', port=0,
+                    concurrency=server.MAX_CONCURRENT_REQUESTS, target_rps=None):
+    """
+    Coordinate one sharded sweep: partition addresses, serve shards to local (and any remote)
+    workers, and return the merged positions once every shard is done
+    """
+    snapshot_time = datetime.now(timezone.utc)
+    coordinator = SweepCoordinator(partition(addresses, n_shards), snapshot_time)
+    tcp_server = await asyncio.start_server(coordinator.handle_worker, listen_host, port)
+    port = tcp_server.sockets[0].getsockname()[1]
+    print(f"{Fore.YELLOW} Coordinator on {listen_host}:{port}: {len(addresses)} addresses in {n_shards} shards, "
+          f"{local_workers} local workers")
+
+    worker_host = '127.0.0.1' if listen_host in ('0.0.0.0', '') else listen_host
+    processes = start_local_workers(local_workers, worker_host, port, concurrency, target_rps) if local_workers else []
+    start = time.perf_counter()
+    async with tcp_server:
+        try:
+            while not coordinator.complete.is_set():
+                try:
+                    await asyncio.wait_for(coordinator.complete.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    if processes and not remote_possible(listen_host) and not any(p.is_alive() for p in processes):
+                        raise RuntimeError(f"all local workers exited with {len(coordinator.pending)} shards unfinished")
+        finally:
+            # Keep serving while local workers ask for more work and are told there is none
+            await asyncio.gather(*(asyncio.to_thread(process.join, 5) for process in processes))
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+    df = coordinator.merged()
+    print(f"{Fore.GREEN} Sweep finished in {time.perf_counter() - start:.1f}s: {len(df)} positions from {n_shards} shards")
+    return df
+
+def remote_possible(listen_host):
+    """Remote workers can only join when the coordinator listens beyond loopback"""
+    return listen_host not in ('127.0.0.1', 'localhost')
+
+def parse_host_port(value, default_port=DEFAULT_PORT):
+    host, _, port = value.rpartition(':')
+    return (host or value, int(port)) if port.isdigit() else (value, default_port)
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Sharded multi-process / multi-host position sweep")
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                        help='Worker processes on this host (default: CPU count)')
+    parser.add_argument('--shards', type=int, default=None,
+                        help='Number of address shards (default: --workers; use more when remote hosts join)')
+    parser.add_argument('--listen', type=str, default=None,
+                        help=f'host:port to accept remote workers on, e.g. 0.0.0.0:{DEFAULT_PORT} (default: loopback only)')
+    parser.add_argument('--join', type=str, default=None,
+                        help='Run --workers worker processes for the coordinator at host:port instead of coordinating')
+    parser.add_argument('--concurrency', type=int, default=server.MAX_CONCURRENT_REQUESTS,
+                        help=f'Requests in flight per worker (default: {server.MAX_CONCURRENT_REQUESTS})')
+    parser.add_argument('--target-rps', type=float, default=None,
+                        help='Adaptive rate limit for this host, split evenly between its workers')
+    parser.add_argument('--store', choices=['csv', 'parquet', 'both'], default=server.OUTPUT_FORMAT,
+                        help=f'Output format for the merged snapshot (default: {server.OUTPUT_FORMAT})')
+    args = parser.parse_args()
+
+    if args.join:
+        host, port = parse_host_port(args.join)
+        print(f"{Fore.YELLOW} Joining coordinator {host}:{port} with {args.workers} workers")
+        for process in start_local_workers(args.workers, host, port, args.concurrency, args.target_rps):
+            process.join()
+        return
+
+    server.OUTPUT_FORMAT = args.store
+    server.ensure_data_dir()
+    addresses = server.load_wallet_addresses()
+    if not addresses:
+        print("No addresses loaded! Exiting...")
+        return
+
+    listen_host, port = parse_host_port(args.listen) if args.listen else ('127.0.0.1', 0)
+    df = asyncio.run(run_sweep(addresses, args.shards or args.workers, args.workers, listen_host, port,
+                               args.concurrency, args.target_rps))
+    server.save_positions_to_csv(df)
+
+if __name__ == "__main__":
+    main()
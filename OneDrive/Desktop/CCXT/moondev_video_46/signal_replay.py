@@ -0,0 +1,323 @@
+# signal_replay.py - Compact liquidation-band history and a vectorized replay of the dashboard's direction calls
+
+import argparse
+import glob
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from colorama import Fore
+
+from liquidation_heatmap import LiquidationHeatmap, LONG, SHORT
+from snapshot_store import new_snapshot_id
+
+HISTORY_DIR = "bots/hyperliquid/data/ppls_positions/history"
+HISTORY_EDGES = np.round(np.arange(0.25, 10.001, 0.25), 2)  # 40 bands of 0.25% out to 10% from the mark
+
+# The live rules (dashboard_3per uses these same functions)
+DEFAULT_THRESHOLDS = [0.25, 0.5, 1.0, 1.5, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0]
+NEUTRAL_IMBALANCE_PCT = 5.0   # Thresholds table: |imbalance| below this is NEUTRAL
+MARKET_SIGNAL_PCT = 3.0       # MARKET DIRECTION (NFA) compares liquidations within a 3% move
+COIN_SIGNAL_MIN_VALUE = 10000 # Per-coin calls need at least this much liquidatable on one side
+DEFAULT_HORIZONS = [5, 15, 60]  # Minutes ahead each call is scored against
+
+GO_LONG, NEUTRAL, GO_SHORT = 1, 0, -1
+DIRECTION_LABELS = {GO_LONG: "LONG", NEUTRAL: "NEUTRAL", GO_SHORT: "SHORT"}
+
+BAND_SCHEMA = pa.schema([('snapshot_time', pa.timestamp('ms', tz='UTC')), ('coin', pa.string()),
+                         ('side', pa.int8()), ('band', pa.int16()), ('value', pa.float32())])
+MARK_SCHEMA = pa.schema([('snapshot_time', pa.timestamp('ms', tz='UTC')), ('coin', pa.string()),
+                         ('mark', pa.float64())])
+PARTITIONING = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+
+def imbalance_pct(long_value, short_value):
+    """(long - short) / total in %, 0 where nothing is liquidatable"""
+    long_value = np.asarray(long_value, dtype=float)
+    short_value = np.asarray(short_value, dtype=float)
+    total = long_value + short_value
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(total > 0, (long_value - short_value) / total * 100, 0.0)
+
+def threshold_direction(long_value, short_value, neutral_pct=NEUTRAL_IMBALANCE_PCT):
+    """Thresholds-table call: more longs to liquidate -> SHORT, more shorts -> LONG, near-even -> NEUTRAL"""
+    imbalance = imbalance_pct(long_value, short_value)
+    return np.where(np.abs(imbalance) < neutral_pct, NEUTRAL, np.where(imbalance > 0, GO_SHORT, GO_LONG))
+
+def market_direction(long_value, short_value):
+    """MARKET DIRECTION (NFA): SHORT when long liquidations outweigh short ones, otherwise LONG"""
+    return np.where(np.asarray(long_value) > np.asarray(short_value), GO_SHORT, GO_LONG)
+
+def coin_direction(long_value, short_value, min_value=COIN_SIGNAL_MIN_VALUE):
+    """Per-coin call, NEUTRAL unless one side has at least min_value at risk"""
+    long_value = np.asarray(long_value, dtype=float)
+    short_value = np.asarray(short_value, dtype=float)
+    significant = (long_value >= min_value) | (short_value >= min_value)
+    return np.where(significant, market_direction(long_value, short_value), NEUTRAL)
+
+class ReplayData:
+    """
+    Dense history arrays: times (T,), marks (T, coins) and the position value in each band
+    from the mark, bands (T, coins, 2 sides, len(edges)). Missing marks are NaN.
+    """
+
+    def __init__(self, times, coins, marks, bands, edges=HISTORY_EDGES):
+        self.times = np.asarray(times, dtype='datetime64[ms]')
+        self.coins = list(coins)
+        self.marks = marks
+        self.bands = bands
+        self.edges = np.asarray(edges, dtype=float)
+
+    def __len__(self):
+        return len(self.times)
+
+    @classmethod
+    def from_frames(cls, band_df, mark_df, edges=HISTORY_EDGES, coins=None):
+        """Pivot the stored long-format rows into dense arrays in one scatter per dataset"""
+        times = np.unique(np.concatenate([
+            band_df['snapshot_time'].to_numpy(dtype='datetime64[ms]'),
+            mark_df['snapshot_time'].to_numpy(dtype='datetime64[ms]'),
+        ]))
+        coins = list(coins) if coins is not None else sorted(set(mark_df['coin']) | set(band_df['coin']))
+        marks = np.full((len(times), len(coins)), np.nan)
+        bands = np.zeros((len(times), len(coins), 2, len(edges)), dtype=np.float32)
+
+        m_codes = pd.Categorical(mark_df['coin'], categories=coins).codes
+        keep = m_codes >= 0
+        m_t = np.searchsorted(times, mark_df['snapshot_time'].to_numpy(dtype='datetime64[ms]'))
+        marks[m_t[keep], m_codes[keep]] = mark_df['mark'].to_numpy(dtype=float)[keep]
+
+        b_codes = pd.Categorical(band_df['coin'], categories=coins).codes
+        band = band_df['band'].to_numpy(dtype=np.int64)
+        keep = (b_codes >= 0) & (band < len(edges))
+        b_t = np.searchsorted(times, band_df['snapshot_time'].to_numpy(dtype='datetime64[ms]'))
+        side = band_df['side'].to_numpy(dtype=np.int64)
+        bands[b_t[keep], b_codes[keep], side[keep], band[keep]] = band_df['value'].to_numpy(dtype=np.float32)[keep]
+        return cls(times, coins, marks, bands, edges)
+
+    def within(self, pcts):
+        """(T, coins, 2, len(pcts)) value liquidated by a move of each pct (pcts must lie on the band grid)"""
+        pcts = np.asarray(pcts, dtype=float)
+        idx = np.searchsorted(self.edges, pcts - 1e-9)
+        if np.any(idx >= len(self.edges)) or not np.allclose(self.edges[idx], pcts):
+            raise ValueError(f"thresholds must be band edges of the history ({self.edges[0]:g}% steps up to {self.edges[-1]:g}%)")
+        return np.cumsum(self.bands, axis=3, dtype=np.float64)[..., idx]
+
+    def forward_returns(self, minutes):
+        """(T, coins) return from each snapshot to the first snapshot at least minutes later (NaN past the end)"""
+        target = self.times + np.timedelta64(int(minutes * 60000), 'ms')
+        j = np.searchsorted(self.times, target, side='left')
+        valid = j < len(self.times)
+        forward = np.full(self.marks.shape, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            forward[valid] = self.marks[j[valid]] / self.marks[valid] - 1
+        return forward
+
+class SignalHistory:
+    """
+    Append-only history of every snapshot's marks and liquidation bands, stored sparsely
+    (only non-empty coin/side/band cells) as Parquet under root/{bands,marks}/date=YYYY-MM-DD/.
+    One small file is written per snapshot; each finished day is compacted into one file.
+    """
+
+    def __init__(self, root=HISTORY_DIR, edges=HISTORY_EDGES):
+        self.root = root
+        self.edges = np.asarray(edges, dtype=float)
+        self._last_date = None
+
+    def _dir(self, name, date):
+        return os.path.join(self.root, name, f"date={date}")
+
+    def record(self, df, marks, snapshot_time=None):
+        """Append one snapshot: marks is coin -> mark price; returns the number of band rows written"""
+        snapshot_time = snapshot_time or datetime.now(timezone.utc)
+        marks = {coin: float(price) for coin, price in marks.items() if price and price > 0}
+        if not marks:
+            return 0
+        heatmap = LiquidationHeatmap.from_positions(df, marks, edges=self.edges)
+        coin_idx, side_idx, band_idx = np.nonzero(heatmap.value)
+        ts = pd.Timestamp(snapshot_time)
+        ts = ts.tz_localize('UTC') if ts.tzinfo is None else ts.tz_convert('UTC')
+
+        bands = pa.table({
+            'snapshot_time': pa.array(np.full(len(coin_idx), ts.value // 10**6), pa.int64()).cast(BAND_SCHEMA.field('snapshot_time').type),
+            'coin': pa.array(np.array(heatmap.coins, dtype=object)[coin_idx], pa.string()),
+            'side': pa.array(side_idx.astype(np.int8)),
+            'band': pa.array(band_idx.astype(np.int16)),
+            'value': pa.array(heatmap.value[coin_idx, side_idx, band_idx].astype(np.float32)),
+        }, schema=BAND_SCHEMA)
+        mark_table = pa.table({
+            'snapshot_time': pa.array(np.full(len(marks), ts.value // 10**6), pa.int64()).cast(MARK_SCHEMA.field('snapshot_time').type),
+            'coin': pa.array(list(marks), pa.string()),
+            'mark': pa.array(list(marks.values()), pa.float64()),
+        }, schema=MARK_SCHEMA)
+
+        date = ts.strftime('%Y-%m-%d')
+        snapshot_id = new_snapshot_id(ts.to_pydatetime())
+        for name, table in (('bands', bands), ('marks', mark_table)):
+            directory = self._dir(name, date)
+            os.makedirs(directory, exist_ok=True)
+            pq.write_table(table, os.path.join(directory, f"{snapshot_id}.parquet"))
+
+        if self._last_date is not None and self._last_date != date:
+            self.compact(self._last_date)
+        self._last_date = date
+        return len(coin_idx)
+
+    def compact(self, date):
+        """Merge one day's per-snapshot files into a single file per dataset"""
+        for name in ('bands', 'marks'):
+            directory = self._dir(name, date)
+            files = sorted(glob.glob(os.path.join(directory, "*.parquet")))
+            if len(files) <= 1:
+                continue
+            table = pa.concat_tables([pq.read_table(f) for f in files]).sort_by('snapshot_time')
+            merged = os.path.join(directory, f"compacted-{date}.parquet")
+            pq.write_table(table, merged + ".tmp")
+            os.replace(merged + ".tmp", merged)
+            for f in files:
+                if f != merged:
+                    os.remove(f)
+
+    def _read(self, name, schema, start_date, end_date, coins):
+        path = os.path.join(self.root, name)
+        if not os.path.isdir(path):
+            return schema.empty_table().to_pandas()
+        dataset = ds.dataset(path, format='parquet', partitioning=PARTITIONING)
+        expr = None
+        for condition in ((ds.field('date') >= str(start_date)) if start_date else None,
+                          (ds.field('date') <= str(end_date)) if end_date else None,
+                          ds.field('coin').isin(list(coins)) if coins else None):
+            if condition is not None:
+                expr = condition if expr is None else expr & condition
+        return dataset.to_table(columns=schema.names, filter=expr).to_pandas()
+
+    def load(self, start_date=None, end_date=None, coins=None):
+        """ReplayData for the given dates ('YYYY-MM-DD', inclusive) and coins"""
+        band_df = self._read('bands', BAND_SCHEMA, start_date, end_date, coins)
+        mark_df = self._read('marks', MARK_SCHEMA, start_date, end_date, coins)
+        return ReplayData.from_frames(band_df, mark_df, self.edges, coins)
+
+def _score(signal, forward):
+    """Per-column calls, hit rate and mean signed return in bps of signal (T, K) against forward (T, 1 or K)"""
+    active = (signal != NEUTRAL) & np.isfinite(forward)
+    signed = np.where(active, signal * np.nan_to_num(forward), 0.0)
+    calls = active.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hit_rate = np.where(calls > 0, ((signed > 0) & active).sum(axis=0) / calls, np.nan)
+        mean_bps = np.where(calls > 0, signed.sum(axis=0) / calls * 10000, np.nan)
+    return calls, hit_rate, mean_bps
+
+def replay(data, coins=None, thresholds=DEFAULT_THRESHOLDS, horizons=DEFAULT_HORIZONS,
+           neutral_pct=NEUTRAL_IMBALANCE_PCT, market_pct=MARKET_SIGNAL_PCT):
+    """
+    Re-run the dashboard's calls at every snapshot and score them against forward moves.
+
+    Returns DataFrames:
+      market     - the MARKET DIRECTION (NFA) verdict vs the equal-weighted basket return
+      thresholds - the thresholds-table Direction at each threshold vs the basket return
+      coins      - each coin's INDIVIDUAL COIN DIRECTION vs that coin's return
+      signals    - per snapshot: basket long/short value within market_pct and the verdict
+    mean_return_bps is the average move in the call's direction (positive = the call paid), not compounded.
+    """
+    coin_idx = [data.coins.index(c) for c in (coins if coins is not None else data.coins) if c in data.coins]
+    names = [data.coins[i] for i in coin_idx]
+    pcts = list(thresholds) + ([market_pct] if market_pct not in thresholds else [])
+    within = data.within(pcts)[:, coin_idx]
+    long_value, short_value = within[:, :, LONG, :], within[:, :, SHORT, :]
+    basket_long, basket_short = long_value.sum(axis=1), short_value.sum(axis=1)  # (T, K)
+
+    k_market = pcts.index(market_pct)
+    table_calls = threshold_direction(basket_long[:, :len(thresholds)], basket_short[:, :len(thresholds)], neutral_pct)
+    market_calls = market_direction(basket_long[:, k_market], basket_short[:, k_market])
+    coin_calls = coin_direction(long_value[:, :, k_market], short_value[:, :, k_market])
+
+    market_rows, threshold_rows, coin_rows = [], [], []
+    for minutes in horizons:
+        forward = data.forward_returns(minutes)[:, coin_idx]
+        with np.errstate(invalid='ignore'):
+            counts = np.isfinite(forward).sum(axis=1)
+            basket = np.where(counts > 0, np.nansum(forward, axis=1) / np.maximum(counts, 1), np.nan)[:, None]
+
+        calls, hit, mean = _score(market_calls[:, None], basket)
+        market_rows.append({'horizon_min': minutes, 'calls': int(calls[0]), 'hit_rate': hit[0], 'mean_return_bps': mean[0],
+                            'long_calls': int((market_calls == GO_LONG).sum()), 'short_calls': int((market_calls == GO_SHORT).sum())})
+
+        calls, hit, mean = _score(table_calls, basket)
+        threshold_rows += [{'horizon_min': minutes, 'threshold_pct': t, 'calls': int(c), 'hit_rate': h, 'mean_return_bps': m}
+                           for t, c, h, m in zip(thresholds, calls, hit, mean)]
+
+        calls, hit, mean = _score(coin_calls, forward)
+        coin_rows += [{'horizon_min': minutes, 'coin': coin, 'calls': int(c), 'hit_rate': h, 'mean_return_bps': m}
+                      for coin, c, h, m in zip(names, calls, hit, mean)]
+
+    signals = pd.DataFrame({
+        'snapshot_time': data.times,
+        'long_value': basket_long[:, k_market],
+        'short_value': basket_short[:, k_market],
+        'direction': np.vectorize(DIRECTION_LABELS.get, otypes=[object])(market_calls) if len(market_calls) else [],
+    })
+    return {
+        'market': pd.DataFrame(market_rows),
+        'thresholds': pd.DataFrame(threshold_rows),
+        'coins': pd.DataFrame(coin_rows),
+        'signals': signals,
+    }
+
+def synthetic_history(days=30, coins=('BTC', 'ETH', 'SOL', 'XRP'), interval_minutes=1, seed=0):
+    """Random-walk marks and drifting band values at a fixed interval, for timing the replay"""
+    rng = np.random.default_rng(seed)
+    n = int(days * 24 * 60 / interval_minutes)
+    start = np.datetime64('2026-01-01T00:00', 'ms')
+    times = start + np.arange(n) * np.timedelta64(interval_minutes * 60000, 'ms')
+    marks = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.0008, (n, len(coins))), axis=0))
+    base = rng.pareto(1.5, (1, len(coins), 2, len(HISTORY_EDGES))) * 1e6
+    drift = np.exp(np.cumsum(rng.normal(0, 0.01, (n, len(coins), 2, 1)), axis=0))
+    return ReplayData(times, coins, marks, (base * drift).astype(np.float32), HISTORY_EDGES)
+
+def print_report(results):
+    with pd.option_context('display.float_format', '{:,.4f}'.format, 'display.width', 200):
+        print(f"\n{Fore.CYAN}{'-'*25} MARKET DIRECTION (NFA) REPLAY {'-'*25}")
+        print(results['market'].to_string(index=False))
+        print(f"\n{Fore.CYAN}{'-'*25} THRESHOLDS TABLE DIRECTION REPLAY {'-'*25}")
+        print(results['thresholds'].pivot(index='threshold_pct', columns='horizon_min', values='hit_rate')
+              .rename(columns=lambda m: f"hit@{m}m").to_string())
+        print(f"\n{Fore.CYAN}{'-'*25} INDIVIDUAL COIN DIRECTION REPLAY {'-'*25}")
+        print(results['coins'].to_string(index=False))
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Replay the dashboard's liquidation-imbalance calls over recorded history")
+    parser.add_argument('--history-dir', type=str, default=HISTORY_DIR, help=f'History root (default: {HISTORY_DIR})')
+    parser.add_argument('--start', type=str, default=None, help='First date to replay (YYYY-MM-DD)')
+    parser.add_argument('--end', type=str, default=None, help='Last date to replay (YYYY-MM-DD)')
+    parser.add_argument('--coins', nargs='+', default=None, help='Coins forming the basket (default: every recorded coin)')
+    parser.add_argument('--horizons', nargs='+', type=float, default=DEFAULT_HORIZONS, help='Minutes ahead to score each call against')
+    parser.add_argument('--synthetic-days', type=float, default=None, help='Replay this many days of synthetic 1-minute history instead')
+    parser.add_argument('--output', type=str, default=None, help='Also write the per-snapshot calls to this CSV')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.synthetic_days:
+        data = synthetic_history(args.synthetic_days, coins=tuple(args.coins or ('BTC', 'ETH', 'SOL', 'XRP')))
+    else:
+        data = SignalHistory(args.history_dir).load(args.start, args.end, args.coins)
+    loaded = time.perf_counter()
+    if not len(data):
+        print(f"{Fore.YELLOW}No history recorded in {args.history_dir} for that range")
+        return
+
+    results = replay(data, args.coins, horizons=args.horizons)
+    finished = time.perf_counter()
+    print(f"{Fore.GREEN}Replayed {len(data):,} snapshots of {len(data.coins)} coins "
+          f"(load {loaded - start:.2f}s, replay {finished - loaded:.2f}s)")
+    print_report(results)
+    if args.output:
+        results['signals'].to_csv(args.output, index=False, float_format='%.2f')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# snapshot_store.py - Append-only Parquet snapshot store partitioned by date and coin
+
+import os
+import re
+import uuid
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+STORE_DIR = "bots/hyperliquid/data/ppls_positions/store"  # Root of the Parquet datasets
+PARTITIONING = ds.partitioning(pa.schema([('date', pa.string()), ('coin', pa.string())]), flavor='hive')
+DATE_PARTITION = re.compile(r'date=(\d{4}-\d{2}-\d{2})')
+
+def new_snapshot_id(snapshot_time=None):
+    """Sortable snapshot id: UTC timestamp plus a short random suffix"""
+    snapshot_time = snapshot_time or datetime.now(timezone.utc)
+    return f"{snapshot_time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+class SnapshotStore:
+    """
+    One Parquet dataset (e.g. "positions" or "aggregates") under STORE_DIR.
+
+    Every write appends new files tagged with a snapshot id and time, partitioned
+    hive-style as date=YYYY-MM-DD/coin=XYZ/, so history is never overwritten and
+    prices keep full float64 precision. Reads only load the requested columns and
+    skip partitions that do not match the coin/date filters.
+    """
+
+    def __init__(self, name, root=STORE_DIR):
+        self.name = name
+        self.path = os.path.join(root, name)
+
+    def append(self, df, snapshot_id=None, snapshot_time=None):
+        """Append one snapshot of rows; returns the snapshot id (None if nothing was written)"""
+        if df is None or df.empty:
+            return None
+
+        snapshot_time = snapshot_time or datetime.now(timezone.utc)
+        snapshot_id = snapshot_id or new_snapshot_id(snapshot_time)
+
+        frame = df.copy()
+        frame['snapshot_id'] = snapshot_id
+        snapshot_ts = pd.Timestamp(snapshot_time)
+        snapshot_ts = snapshot_ts.tz_localize('UTC') if snapshot_ts.tzinfo is None else snapshot_ts.tz_convert('UTC')
+        frame['snapshot_time'] = snapshot_ts
+        frame['date'] = frame['snapshot_time'].dt.strftime('%Y-%m-%d')
+        # Files keep one schema across snapshots whatever the in-memory dtypes (POSITION_DTYPES)
+        if 'timestamp' in frame.columns:
+            frame['timestamp'] = pd.to_datetime(frame['timestamp'], errors='coerce').astype('datetime64[ns]')
+        if 'leverage' in frame.columns:
+            frame['leverage'] = pd.to_numeric(frame['leverage'], errors='coerce').astype('float64')  # int16 or float64 in memory
+        if 'is_long' in frame.columns:
+            frame['is_long'] = frame['is_long'].astype(bool)
+        if 'address' in frame.columns:
+            frame['address'] = frame['address'].astype(str)
+        frame['coin'] = frame['coin'].astype(str)
+
+        os.makedirs(self.path, exist_ok=True)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        pq.write_to_dataset(
+            table,
+            root_path=self.path,
+            partitioning=PARTITIONING,
+            basename_template=f"{snapshot_id}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore',
+        )
+        return snapshot_id
+
+    def _dataset(self):
+        if not os.path.isdir(self.path):
+            return None
+        return ds.dataset(self.path, format='parquet', partitioning=PARTITIONING)
+
+    def read(self, columns=None, coins=None, start_date=None, end_date=None, snapshot_ids=None):
+        """
+        Read rows as a DataFrame, loading only the given columns and partitions.
+        Dates are 'YYYY-MM-DD' strings (inclusive).
+        """
+        dataset = self._dataset()
+        if dataset is None:
+            return pd.DataFrame(columns=columns or [])
+
+        expr = None
+        def add(condition):
+            nonlocal expr
+            expr = condition if expr is None else expr & condition
+
+        if coins:
+            add(ds.field('coin').isin([str(c) for c in coins]))
+        if start_date:
+            add(ds.field('date') >= str(start_date))
+        if end_date:
+            add(ds.field('date') <= str(end_date))
+        if snapshot_ids:
+            add(ds.field('snapshot_id').isin(list(snapshot_ids)))
+
+        table = dataset.to_table(columns=columns, filter=expr)
+        return table.to_pandas()
+
+    def latest(self, columns=None, coins=None):
+        """Read only the most recent snapshot (only the newest date partition is scanned to find it)"""
+        dates = self.dates()
+        snapshots = self.list_snapshots(start_date=dates[-1]) if dates else None
+        if snapshots is None or snapshots.empty:
+            return pd.DataFrame(columns=columns or [])
+        latest = snapshots.iloc[-1]
+        return self.read(columns=columns, coins=coins, start_date=latest['date'], end_date=latest['date'],
+                         snapshot_ids=[latest['snapshot_id']])
+
+    def dates(self):
+        """Dates that have data, oldest first (read from the partition paths, no file is opened)"""
+        dataset = self._dataset()
+        if dataset is None:
+            return []
+        return sorted({match.group(1) for match in map(DATE_PARTITION.search, dataset.files) if match})
+
+    def list_snapshots(self, start_date=None, end_date=None):
+        """Snapshot ids with their time and date, oldest first (optionally within a date range)"""
+        dataset = self._dataset()
+        if dataset is None:
+            return pd.DataFrame(columns=['snapshot_id', 'snapshot_time', 'date'])
+        expr = None
+        if start_date:
+            expr = ds.field('date') >= str(start_date)
+        if end_date:
+            condition = ds.field('date') <= str(end_date)
+            expr = condition if expr is None else expr & condition
+        table = dataset.to_table(columns=['snapshot_id', 'snapshot_time', 'date'], filter=expr)
+        snapshots = table.to_pandas().drop_duplicates('snapshot_id')
+        return snapshots.sort_values('snapshot_time').reset_index(drop=True)
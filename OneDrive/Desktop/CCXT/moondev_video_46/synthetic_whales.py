@@ -0,0 +1,128 @@
+# synthetic_whales.py - Vectorized generator of realistic whale position sets for benchmarks
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Anchor prices for the majors; every other coin gets a log-uniform price
+ANCHOR_PRICES = {'BTC': 60000.0, 'ETH': 3000.0, 'SOL': 150.0, 'XRP': 0.6, 'DOGE': 0.15}
+LEVERAGE_CHOICES = np.array([1, 2, 3, 5, 10, 20, 25, 40, 50])
+LEVERAGE_WEIGHTS = np.array([0.08, 0.10, 0.12, 0.20, 0.22, 0.12, 0.08, 0.05, 0.03])
+MAINTENANCE_MARGIN = 0.005  # Fraction of notional kept as maintenance margin
+
+def generate_universe(n_coins=150, seed=0):
+    """Coin -> mark price for n_coins perps (majors first, then SYN001, SYN002, ...)"""
+    rng = np.random.default_rng(seed)
+    names = list(ANCHOR_PRICES)[:n_coins]
+    extra = n_coins - len(names)
+    names += [f"SYN{i:03d}" for i in range(1, extra + 1)]
+    prices = list(ANCHOR_PRICES.values())[:len(names) - extra]
+    prices += list(10 ** rng.uniform(-5, 3, extra))
+    return dict(zip(names, prices))
+
+def universe_payload(prices, seed=0):
+    """(meta, asset_ctxs) shaped like a metaAndAssetCtxs response, for nice_funcs.MarketSnapshot.load"""
+    rng = np.random.default_rng(seed)
+    meta = {'universe': [{'name': coin, 'maxLeverage': 50} for coin in prices]}
+    asset_ctxs = [{
+        'markPx': str(price),
+        'oraclePx': str(price),
+        'funding': str(rng.normal(0, 0.0001)),
+        'openInterest': str(rng.uniform(1e3, 1e7)),
+        'dayNtlVlm': str(rng.uniform(1e5, 1e9)),
+    } for price in prices.values()]
+    return meta, asset_ctxs
+
+def generate_addresses(count, rng):
+    """count random 42-character 0x addresses, generated in one shot"""
+    hex_blob = rng.bytes(20 * count).hex().encode()
+    return np.char.add('0x', np.frombuffer(hex_blob, dtype='S40').astype(str))
+
+def generate_positions(n_rows, n_coins=150, n_addresses=None, seed=0, prices=None):
+    """
+    Generate n_rows positions with the same columns as the server's positions snapshot.
+
+    Coin popularity follows a Zipf-like curve (majors dominate), position values are
+    Pareto-distributed (a few very large whales), leverage comes from the usual tiers,
+    and liquidation prices are consistent with entry price, side and leverage.
+    """
+    rng = np.random.default_rng(seed)
+    prices = prices or generate_universe(n_coins, seed)
+    coins = np.array(list(prices))
+    coin_prices = np.array(list(prices.values()))
+    n_addresses = n_addresses or max(1, n_rows // 3)
+    if n_rows > n_addresses * len(coins):
+        raise ValueError(f"{n_rows} positions need more than {n_addresses} addresses x {len(coins)} coins")
+
+    # Skewed coin popularity; the API nets each address to one position per coin, so repeated
+    # (address, coin) draws are dropped and redrawn
+    popularity = 1.0 / np.arange(1, len(coins) + 1) ** 1.2
+    popularity = popularity / popularity.sum()
+    pairs = np.empty(0, dtype=np.int64)
+    while len(pairs) < n_rows:
+        need = n_rows - len(pairs)
+        drawn = rng.integers(0, n_addresses, need) * len(coins) + rng.choice(len(coins), size=need, p=popularity)
+        pairs = np.concatenate((pairs, drawn))
+        _, first = np.unique(pairs, return_index=True)
+        pairs = pairs[np.sort(first)]
+    address_idx, coin_idx = np.divmod(pairs[:n_rows], len(coins))
+
+    # Skewed position size
+    position_value = 25000 * (1 + rng.pareto(1.3, n_rows))
+    is_long = rng.random(n_rows) < 0.55
+    leverage = rng.choice(LEVERAGE_CHOICES, size=n_rows, p=LEVERAGE_WEIGHTS)
+
+    # Entries scattered around the mark; liquidation price implied by leverage
+    mark = coin_prices[coin_idx]
+    entry_price = mark * np.exp(rng.normal(0, 0.06, n_rows))
+    margin_buffer = 1.0 / leverage - MAINTENANCE_MARGIN
+    liquidation_price = np.where(is_long, entry_price * (1 - margin_buffer), entry_price * (1 + margin_buffer))
+    # Low-leverage longs cannot be liquidated; the API reports no liquidation price for them
+    liquidation_price = np.where(liquidation_price > 0, liquidation_price, 0.0)
+
+    size = position_value / mark
+    unrealized_pnl = np.where(is_long, 1, -1) * size * (mark - entry_price)
+
+    addresses = generate_addresses(n_addresses, rng)
+    return pd.DataFrame({
+        'address': addresses[address_idx],
+        'coin': coins[coin_idx],
+        'entry_price': entry_price,
+        'leverage': leverage,
+        'position_value': position_value,
+        'unrealized_pnl': unrealized_pnl,
+        'liquidation_price': liquidation_price,
+        'is_long': is_long,
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+def positions_to_payloads(df):
+    """
+    Turn a positions frame back into clearinghouseState-shaped payloads, one (data, address)
+    tuple per address, for benchmarking the server-side parser
+    """
+    size = np.where(df['is_long'], 1, -1) * df['position_value'] / df['entry_price']
+    records = pd.DataFrame({
+        'address': df['address'],
+        'coin': df['coin'],
+        'szi': size.astype(str),
+        'positionValue': df['position_value'].astype(str),
+        'entryPx': df['entry_price'].astype(str),
+        'unrealizedPnl': df['unrealized_pnl'].astype(str),
+        'liquidationPx': np.where(df['liquidation_price'] > 0, df['liquidation_price'].astype(str), None),
+        'leverage': df['leverage'].to_numpy(),
+    })
+
+    payloads = []
+    for address, group in records.groupby('address', sort=False, observed=True):
+        asset_positions = [{
+            'position': {
+                'coin': coin, 'szi': szi, 'positionValue': value, 'entryPx': entry,
+                'unrealizedPnl': pnl, 'liquidationPx': liq, 'leverage': {'type': 'cross', 'value': int(lev)},
+            }
+        } for coin, szi, value, entry, pnl, liq, lev in zip(
+            group['coin'], group['szi'], group['positionValue'], group['entryPx'],
+            group['unrealizedPnl'], group['liquidationPx'], group['leverage'])]
+        payloads.append(({'assetPositions': asset_positions}, address))
+    return payloads
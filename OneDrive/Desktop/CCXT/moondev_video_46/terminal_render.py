@@ -0,0 +1,89 @@
+# terminal_render.py - Column-at-a-time formatting and single-write terminal output for the dashboard views
+
+import sys
+
+import numpy as np
+from colorama import Style
+from termcolor import colored
+
+def format_column(values, spec):
+    """
+    Format a whole column with one format spec (e.g. '.2f', '>15,.2f', '<4').
+    Returns a numpy string array so columns can be concatenated element-wise.
+    """
+    formatter = ('{:' + spec + '}').format
+    return np.array(list(map(formatter, values)), dtype=str)
+
+def concat(*parts):
+    """Concatenate string columns and scalar strings element-wise into one column of lines"""
+    result = None
+    for part in parts:
+        if not isinstance(part, np.ndarray):
+            part = str(part)
+        result = part if result is None else np.char.add(result, part)
+    return np.asarray(result, dtype=str)
+
+def style_rows(lines, mask, plain_lines, color, on_color=None):
+    """Replace the rows selected by mask with plain_lines styled as a whole (e.g. highlighted rows)"""
+    mask = np.asarray(mask, dtype=bool)
+    if not mask.any():
+        return lines
+    lines = lines.astype(object)
+    lines[mask] = [colored(text, color, on_color) for text in plain_lines[mask]]
+    return lines
+
+def interleave(*columns):
+    """
+    Interleave row-aligned line columns: row 0 of every column, then row 1, and so on.
+    Entries that are None (or masked out beforehand) are dropped, so optional lines can be
+    passed as object arrays holding None where a row has nothing to add.
+    """
+    if not columns or len(columns[0]) == 0:
+        return []
+    block = np.empty((len(columns[0]), len(columns)), dtype=object)
+    for i, column in enumerate(columns):
+        block[:, i] = column
+    flat = block.ravel()
+    return [line for line in flat if line is not None]
+
+def optional_lines(mask, lines):
+    """
+    Object column with one line per True entry of mask and None elsewhere.
+    lines is either a single string (repeated) or one line per selected row.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    out = np.full(len(mask), None, dtype=object)
+    if mask.any():
+        if isinstance(lines, str):
+            out[mask] = lines
+        else:
+            out[np.flatnonzero(mask)] = list(lines)
+    return out
+
+class RenderBuffer:
+    """
+    Collects every line of a view and writes them to the terminal in one call.
+    Each line ends with a style reset so colours never bleed into the next line.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self._lines = []
+
+    def line(self, text=""):
+        self._lines.append(text)
+
+    def lines(self, texts):
+        self._lines.extend(texts)
+
+    def render(self):
+        return "".join(f"{text}{Style.RESET_ALL}\n" for text in self._lines)
+
+    def flush(self):
+        """Write the buffered view with a single write() and clear the buffer"""
+        if not self._lines:
+            return
+        stream = self.stream or sys.stdout
+        stream.write(self.render())
+        stream.flush()
+        self._lines = []
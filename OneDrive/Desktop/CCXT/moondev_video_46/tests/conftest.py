@@ -0,0 +1,16 @@
+# conftest.py - Make the flat modules importable and share one synthetic snapshot across tests
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import synthetic_whales as synth  # noqa: E402
+
+@pytest.fixture(scope='session')
+def universe():
+    """(positions frame, coin -> price) for 3,000 positions over 20 coins"""
+    prices = synth.generate_universe(20, seed=7)
+    return synth.generate_positions(3000, n_coins=20, seed=7, prices=prices), prices
@@ -0,0 +1,66 @@
+# test_aggregation_store.py - Bulk and per-address incremental rollups against a pandas groupby
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import synthetic_whales as synth
+from aggregation_store import AggregationStore
+from position_columns import PositionColumnBuilder
+
+def groupby_rollup(df):
+    """The server's coin/side aggregate, in AggregationStore.to_dataframe's column names"""
+    agg = df.groupby(['coin', 'is_long'], observed=True).agg(
+        total_value=('position_value', 'sum'),
+        total_pnl=('unrealized_pnl', 'sum'),
+        num_traders=('address', 'count'),
+        avg_leverage=('leverage', 'mean'),
+        liquidation_price=('liquidation_price', 'mean'),
+    ).reset_index()
+    agg['coin'] = agg['coin'].astype(str)
+    return agg.sort_values(['coin', 'is_long']).reset_index(drop=True)
+
+def store_rollup(store):
+    agg = store.to_dataframe().drop(columns='direction')
+    return agg.sort_values(['coin', 'is_long']).reset_index(drop=True)
+
+def assert_rollups_equal(store, df):
+    pd.testing.assert_frame_equal(store_rollup(store), groupby_rollup(df), check_dtype=False, rtol=1e-9)
+
+def test_bulk_build_matches_groupby(universe):
+    df, _ = universe
+    assert_rollups_equal(AggregationStore.from_positions(df), df)
+
+def test_incremental_updates_match_groupby(universe):
+    df, _ = universe
+    rng = np.random.default_rng(5)
+    parser = PositionColumnBuilder(0)
+    store = AggregationStore()
+    for data, address in synth.positions_to_payloads(df):
+        store.update_address(address, parser.parse_payload(data))
+    assert_rollups_equal(store, df)
+
+    # Refresh some wallets with new values, empty others, and check against a fresh groupby
+    addresses = df['address'].unique()
+    changed = rng.choice(addresses, len(addresses) // 4, replace=False)
+    emptied = set(addresses[:25]) - set(changed)
+    after = df.copy()
+    moved = after['address'].isin(changed)
+    after.loc[moved, 'position_value'] *= rng.uniform(0.5, 2.0, int(moved.sum()))
+    after.loc[moved, 'unrealized_pnl'] += rng.normal(0, 1000, int(moved.sum()))
+    after = after[~after['address'].isin(emptied)]
+
+    payloads = {address: data for data, address in synth.positions_to_payloads(after)}
+    for address in changed:
+        store.update_address(address, parser.parse_payload(payloads[address]))
+    for address in emptied:
+        store.remove_address(address)
+    assert len(store) == after['address'].nunique()
+    assert_rollups_equal(store, after)
+
+def test_rebuild_keeps_totals(universe):
+    df, _ = universe
+    store = AggregationStore.from_positions(df)
+    before = store_rollup(store)
+    store.rebuild()
+    pd.testing.assert_frame_equal(store_rollup(store), before, rtol=1e-12)
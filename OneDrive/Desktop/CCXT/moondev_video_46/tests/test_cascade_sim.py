@@ -0,0 +1,44 @@
+# test_cascade_sim.py - Cascade fixed points on small hand-built ladders
+
+import pandas as pd
+import pytest
+
+from cascade_sim import CascadeSimulator
+from liquidation_ladder import LiquidationLadder
+
+def ladder(rows, price=100.0):
+    """Ladder for one coin 'X' from (liquidation_price, is_long, position_value) rows"""
+    df = pd.DataFrame(rows, columns=['liquidation_price', 'is_long', 'position_value']).assign(coin='X')
+    return LiquidationLadder.from_positions(df, {'X': price})
+
+def run(rows, shocks, **kwargs):
+    result = CascadeSimulator(ladder(rows), usd_per_pct=1_000_000, **kwargs).run(shocks)
+    return result.set_index(['direction', 'shock_pct'])
+
+def test_one_percent_shock_cascades_to_three_percent():
+    # $1M at 1% and $1M at 2% below the mark, $1M per 1% of impact:
+    # 1% liquidates the first band (move 2%), which reaches the second (move 3%), then nothing is left
+    out = run([(99.0, True, 1_000_000), (98.0, True, 1_000_000)], [1.0]).loc[('DOWN', 1.0)]
+    assert out['final_move_pct'] == pytest.approx(3.0)
+    assert out['rounds'] == 2
+    assert out['liquidated_usd'] == pytest.approx(2_000_000)
+    assert out['final_price'] == pytest.approx(97.0)
+    assert out['settled']
+
+def test_shock_short_of_every_band_does_nothing():
+    out = run([(95.0, True, 5_000_000)], [1.0]).loc[('DOWN', 1.0)]
+    assert out['rounds'] == 0
+    assert out['liquidated_usd'] == 0
+    assert out['final_move_pct'] == pytest.approx(1.0)
+
+def test_shorts_cascade_upwards_only():
+    out = run([(101.0, False, 1_000_000), (99.0, True, 1_000_000)], [1.0])
+    assert out.loc[('UP', 1.0), 'final_move_pct'] == pytest.approx(2.0)
+    assert out.loc[('UP', 1.0), 'liquidated_usd'] == pytest.approx(1_000_000)
+    assert out.loc[('DOWN', 1.0), 'liquidated_usd'] == pytest.approx(1_000_000)
+
+def test_move_is_capped():
+    rows = [(100.0 - i, True, 50_000_000) for i in range(1, 99)]
+    out = run(rows, [1.0], max_move_pct=20.0).loc[('DOWN', 1.0)]
+    assert out['final_move_pct'] == pytest.approx(20.0)
+    assert out['settled']
@@ -0,0 +1,73 @@
+# test_liquidation_indexes.py - Book and ladder range sums against plain boolean-mask sums
+
+import numpy as np
+import pytest
+
+import synthetic_whales as synth
+from liquidation_book import LiquidationBook
+from liquidation_ladder import LiquidationLadder
+from position_columns import PositionColumnBuilder
+
+PCTS = [0.5, 1, 2, 5, 10, 25]
+
+def masked_within(df, coin, price, pct):
+    """(long value, short value) with liquidation price within pct of price, by boolean masks"""
+    rows = df[(df['coin'] == coin) & (df['liquidation_price'] > 0)]
+    liq = rows['liquidation_price']
+    longs = rows['is_long'] & (liq >= price * (1 - pct / 100)) & (liq <= price)
+    shorts = ~rows['is_long'] & (liq >= price) & (liq <= price * (1 + pct / 100))
+    return rows.loc[longs, 'position_value'].sum(), rows.loc[shorts, 'position_value'].sum()
+
+def test_ladder_matches_masks(universe):
+    df, prices = universe
+    ladder = LiquidationLadder.from_positions(df, prices)
+    for coin, price in prices.items():
+        long_values, short_values = ladder.liquidations_within(coin, PCTS)
+        for pct, long_value, short_value in zip(PCTS, long_values, short_values):
+            expected = masked_within(df, coin, price, pct)
+            assert long_value == pytest.approx(expected[0], rel=1e-9, abs=1e-6)
+            assert short_value == pytest.approx(expected[1], rel=1e-9, abs=1e-6)
+
+def test_book_matches_masks(universe):
+    df, prices = universe
+    book = LiquidationBook.from_positions(df)
+    for coin, price in prices.items():
+        for pct in PCTS:
+            assert book.value_within(coin, price, pct) == pytest.approx(
+                masked_within(df, coin, price, pct), rel=1e-9, abs=1e-6)
+
+def test_book_nearest_matches_sort(universe):
+    df, prices = universe
+    book = LiquidationBook.from_positions(df)
+    coin = df['coin'].value_counts().index[0]
+    price = prices[coin]
+    rows = df[(df['coin'] == coin) & df['is_long'] & (df['liquidation_price'] > 0)]
+    expected = np.sort(np.abs(price - rows['liquidation_price'].to_numpy()) / price * 100)[:10]
+    nearest = [distance for distance, *_ in book.nearest(coin, True, price, 10)]
+    assert nearest == pytest.approx(expected.tolist(), rel=1e-12)
+
+def test_book_incremental_updates_match_rebuild(universe):
+    df, prices = universe
+    rng = np.random.default_rng(3)
+    addresses = df['address'].unique()
+    before = df[df['address'].isin(addresses[: len(addresses) // 2])]
+    book = LiquidationBook.from_positions(before)
+
+    # Change a third of the remaining addresses' positions and drop a few wallets entirely
+    after = df.copy()
+    changed = rng.choice(addresses, len(addresses) // 3, replace=False)
+    moved = after['address'].isin(changed)
+    after.loc[moved, 'liquidation_price'] *= rng.uniform(0.9, 1.1, int(moved.sum()))
+    after = after[~after['address'].isin(addresses[:20])]
+
+    parser = PositionColumnBuilder(0)
+    payloads = dict((address, data) for data, address in synth.positions_to_payloads(after))
+    for address in addresses:
+        book.update_address(address, parser.parse_payload(payloads.get(address)))
+
+    rebuilt = LiquidationBook.from_positions(after)
+    assert book.positions == rebuilt.positions
+    for coin, price in prices.items():
+        for pct in PCTS:
+            assert book.value_within(coin, price, pct) == pytest.approx(
+                masked_within(after, coin, price, pct), rel=1e-9, abs=1e-6)
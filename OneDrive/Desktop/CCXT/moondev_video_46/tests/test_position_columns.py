@@ -0,0 +1,91 @@
+# test_position_columns.py - Columnar builder against the per-position dict parser it replaced
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ppls_pos_server as server
+import synthetic_whales as synth
+from benchmark import reference_process_positions
+from position_columns import POSITION_COLUMNS, PositionColumnBuilder, apply_position_schema
+
+def reference_frame(payloads):
+    rows = [row for data, address in payloads for row in reference_process_positions(data, address)]
+    return pd.DataFrame(rows, columns=POSITION_COLUMNS)
+
+def test_builder_matches_reference_parser(universe):
+    df, _ = universe
+    payloads = synth.positions_to_payloads(df)
+    # One malformed position: both parsers skip it and keep the rest of the payload
+    payloads[0][0]['assetPositions'].append({'position': {'coin': 'BAD', 'positionValue': 'oops'}})
+
+    builder = PositionColumnBuilder(server.MIN_POSITION_VALUE)
+    for data, address in payloads:
+        builder.add_payload(data, address)
+    built = builder.to_dataframe()
+    expected = apply_position_schema(reference_frame(payloads))
+
+    assert list(built.columns) == POSITION_COLUMNS
+    assert len(built) == len(expected) > 0
+    for column in POSITION_COLUMNS[:-1]:  # Timestamps differ by when each parser ran
+        if isinstance(built[column].dtype, pd.CategoricalDtype):
+            assert built[column].astype(str).tolist() == expected[column].astype(str).tolist()
+        else:
+            assert built[column].tolist() == pytest.approx(expected[column].tolist())
+
+def test_builder_categories_are_sorted(universe):
+    df, _ = universe
+    builder = PositionColumnBuilder(0)
+    for data, address in synth.positions_to_payloads(df):
+        builder.add_payload(data, address)
+    built = builder.to_dataframe()
+    for column in ('address', 'coin'):
+        assert built[column].cat.categories.is_monotonic_increasing
+
+def test_schema_reads_csv_strings():
+    raw = pd.DataFrame({
+        'address': ['0xb', '0xa'], 'coin': ['ETH', 'BTC'], 'entry_price': ['3000.5', '60000'],
+        'leverage': ['10', '5'], 'position_value': ['1e6', '2e6'], 'unrealized_pnl': ['-5', '7'],
+        'liquidation_price': ['2700', ''], 'is_long': ['True', 'False'],
+        'timestamp': ['2026-01-02 03:04:05', '2026-01-02 03:04:05'],
+    })
+    df = apply_position_schema(raw)
+    assert df['is_long'].tolist() == [True, False]
+    assert str(df['leverage'].dtype) == 'int16'
+    assert df['coin'].cat.categories.tolist() == ['BTC', 'ETH']
+    assert df['liquidation_price'].isna().tolist() == [False, True]
+    assert str(df['timestamp'].dtype) == 'datetime64[s]'
+
+def test_schema_converts_timezones_to_naive_utc():
+    aware = pd.Series(pd.to_datetime(['2026-01-02T05:04:05+02:00']))
+    for values in (['2026-01-02T03:04:05Z'], aware):
+        df = apply_position_schema(pd.DataFrame({'timestamp': values}))
+        assert df['timestamp'].tolist() == [pd.Timestamp('2026-01-02 03:04:05')]
+
+def test_builder_stamps_naive_utc(universe):
+    data, address = synth.positions_to_payloads(universe[0])[0]
+    aware = datetime(2026, 1, 2, 5, 4, 5, tzinfo=timezone(timedelta(hours=2)))
+    for snapshot_time, expected in ((aware, pd.Timestamp('2026-01-02 03:04:05')),
+                                    (None, pd.Timestamp(datetime.now(timezone.utc).replace(tzinfo=None)))):
+        builder = PositionColumnBuilder(0, snapshot_time)
+        builder.add_payload(data, address)
+        stamps = builder.to_dataframe()['timestamp']
+        assert abs(stamps - expected).max() < pd.Timedelta(seconds=5)
+
+def test_schema_keeps_unparsed_timestamps():
+    raw = pd.DataFrame({'timestamp': ['not a time', '2026-01-02']})
+    with pytest.warns(UserWarning):
+        df = apply_position_schema(raw)
+    assert df['timestamp'].tolist() == ['not a time', '2026-01-02']
+
+def test_schema_drops_unknown_sides():
+    raw = pd.DataFrame({'is_long': ['TRUE', 'false', None, 'maybe', '1'], 'leverage': [1, 2, 3, 4, 5]})
+    with pytest.warns(UserWarning, match='Dropping 2 positions with an unknown side'):
+        df = apply_position_schema(raw)
+    assert df['is_long'].tolist() == [True, False, True]
+    assert df['leverage'].tolist() == [1, 2, 5]
+    with pytest.warns(UserWarning, match='Dropping 2 positions'):
+        numeric = apply_position_schema(pd.DataFrame({'is_long': [1.0, 0.0, 0.5, np.nan]}))
+    assert numeric['is_long'].tolist() == [True, False]
@@ -0,0 +1,32 @@
+# test_snapshot_store.py - Snapshots with different in-memory dtypes read back as one dataset
+
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from position_columns import apply_position_schema
+from snapshot_store import SnapshotStore
+
+def positions(leverage):
+    return apply_position_schema(pd.DataFrame({
+        'address': ['0xa', '0xb'], 'coin': ['BTC', 'ETH'], 'entry_price': [60000.0, 3000.0],
+        'leverage': leverage, 'position_value': [1e6, 2e5], 'unrealized_pnl': [10.0, -5.0],
+        'liquidation_price': [50000.0, 3300.0], 'is_long': [True, False],
+        'timestamp': ['2024-05-01 12:00:00', '2024-05-01 12:00:00'],
+    }))
+
+def test_int_then_float_leverage_reads_back(tmp_path):
+    store = SnapshotStore('positions', root=str(tmp_path))
+    whole, fractional = positions([10, 20]), positions([2.5, 20.0])
+    assert whole['leverage'].dtype == 'int16' and fractional['leverage'].dtype == 'float64'
+
+    first = store.append(whole, snapshot_time=datetime(2024, 5, 1, 12, tzinfo=timezone.utc))
+    second = store.append(fractional, snapshot_time=datetime(2024, 5, 1, 13, tzinfo=timezone.utc))
+
+    df = store.read().sort_values(['snapshot_time', 'coin'])
+    assert list(df['snapshot_id']) == [first, first, second, second]
+    assert list(df['leverage']) == [10, 20, 2.5, 20]
+    latest = store.latest(columns=['coin', 'leverage']).sort_values('coin')
+    assert list(latest['leverage']) == [2.5, 20]
+    # Back through the schema, whole-valued leverage is compact again
+    assert apply_position_schema(store.read(snapshot_ids=[first]))['leverage'].dtype == 'int16'
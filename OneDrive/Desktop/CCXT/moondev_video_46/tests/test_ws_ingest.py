@@ -0,0 +1,94 @@
+# test_ws_ingest.py - WsIngestor against the local stand-in feed: reconnect and catch-up, REST polling past the connection cap
+
+import asyncio
+import socket
+import time
+
+import ws_ingest
+import ws_standin
+from ws_ingest import PositionTable, WsIngestor
+
+ADDRESSES = [f"0x{i:040x}" for i in range(1, 6)]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+async def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+def test_reconnects_and_catches_up(monkeypatch):
+    monkeypatch.setattr(ws_ingest, 'RECONNECT_BASE_DELAY', 0.1)
+    # No periodic user pushes: only the snapshot sent on (re)subscribe can deliver a change
+    feed = ws_standin.StandinFeed(n_coins=5, seed=1, change_probability=0.0)
+    table = PositionTable(0)
+    port = free_port()
+    coin = next(iter(feed.prices))
+
+    def caught_up(df):
+        return ((df['address'] == ADDRESSES[0]) & (df['entry_price'] == 123.0)).any() and \
+            not (df['address'] == ADDRESSES[1]).any()
+
+    async def scenario():
+        server = asyncio.create_task(ws_standin.run_standin('127.0.0.1', port, feed, tick=0.05,
+                                                            user_interval=1e9, drop_after=1.0))
+        await asyncio.sleep(0.3)
+        ingestor = WsIngestor(ADDRESSES, table, f"ws://127.0.0.1:{port}", users_per_connection=2)
+        client = asyncio.create_task(ingestor.run())
+        try:
+            await wait_for(lambda: ingestor.connects >= 3 and table.mids)
+            await wait_for(lambda: len(table) == sum(bool(feed.positions_for(a)) for a in ADDRESSES))
+
+            # Change the feed while connected; the table only sees it once the drop forces a resubscribe
+            feed.users[ADDRESSES[0]].append({'coin': coin, 'szi': 10.0, 'entryPx': 123.0, 'leverage': 5})
+            feed.users[ADDRESSES[1]] = []
+            connects = ingestor.connects
+            await wait_for(lambda: ingestor.connects >= connects + 3)
+            await wait_for(lambda: caught_up(table.to_dataframe()))
+        finally:
+            ingestor.stop()
+            client.cancel()
+            server.cancel()
+            await asyncio.gather(client, server, return_exceptions=True)
+
+    asyncio.run(scenario())
+    df = table.to_dataframe()
+    new = df[(df['address'] == ADDRESSES[0]) & (df['entry_price'] == 123.0)]
+    assert len(new) == 1 and new['coin'].iloc[0] == coin and bool(new['is_long'].iloc[0])
+    for address in ADDRESSES[2:]:
+        assert (df['address'] == address).sum() == len(feed.positions_for(address))
+
+def test_addresses_over_the_connection_cap_are_polled(monkeypatch):
+    monkeypatch.setattr(ws_ingest, 'STALE_AFTER', 1e9)
+    feed = ws_standin.StandinFeed(n_coins=5, seed=1, change_probability=0.0)
+    table = PositionTable(0)
+    port = free_port()
+    polled = []
+
+    def resync(address):
+        polled.append(address)
+        return feed.clearinghouse_state(address), address
+
+    async def scenario():
+        server = asyncio.create_task(ws_standin.run_standin('127.0.0.1', port, feed, tick=0.05,
+                                                            user_interval=1e9, drop_after=None))
+        await asyncio.sleep(0.3)
+        ingestor = WsIngestor(ADDRESSES, table, f"ws://127.0.0.1:{port}", resync=resync,
+                              users_per_connection=2, max_connections=2)
+        client = asyncio.create_task(ingestor.run())
+        try:
+            await wait_for(lambda: len(table) == sum(bool(feed.positions_for(a)) for a in ADDRESSES))
+        finally:
+            ingestor.stop()
+            client.cancel()
+            server.cancel()
+            await asyncio.gather(client, server, return_exceptions=True)
+        return ingestor
+
+    ingestor = asyncio.run(scenario())
+    assert ingestor.connects == 2 and ingestor.overflow == ADDRESSES[4:]
+    assert polled == ADDRESSES[4:] and ingestor.polls == 1
@@ -0,0 +1,125 @@
+# tick_reactor.py - Recompute liquidation distances, nearest lists and threshold buckets per coin on each price tick
+
+import heapq
+import time
+
+import numpy as np
+
+DEFAULT_THRESHOLDS = [0.25, 0.5, 1.0, 1.5, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0]
+DEFAULT_TOP_N = 10
+
+class CoinView:
+    """Everything the live views need for one coin at one price"""
+
+    __slots__ = ('coin', 'price', 'nearest_long', 'nearest_short', 'long_within', 'short_within',
+                 'updated_at', 'compute_ms')
+
+    def __init__(self, coin, price, nearest_long, nearest_short, long_within, short_within, compute_ms):
+        self.coin = coin
+        self.price = price
+        self.nearest_long = nearest_long    # [(distance_pct, liq, value, address)], nearest first
+        self.nearest_short = nearest_short
+        self.long_within = long_within      # value liquidated within each threshold, as an array
+        self.short_within = short_within
+        self.updated_at = time.time()
+        self.compute_ms = compute_ms
+
+class TickReactor:
+    """
+    Keeps a CoinView per coin on top of a LiquidationBook. A price tick recomputes only
+    the ticked coin's view (two k-nearest walks plus one range sum per threshold), and the
+    cross-coin threshold totals are adjusted by that coin's delta instead of re-summed.
+    on_publish(view) is called with every refreshed view.
+    """
+
+    def __init__(self, book, thresholds=DEFAULT_THRESHOLDS, top_n=DEFAULT_TOP_N, coins=None, on_publish=None):
+        self.book = book
+        self.thresholds = np.asarray(thresholds, dtype=float)
+        self.top_n = top_n
+        self.coins = set(coins) if coins is not None else None
+        self.on_publish = on_publish
+        self.prices = {}
+        self.views = {}
+        self.long_totals = np.zeros(len(self.thresholds))
+        self.short_totals = np.zeros(len(self.thresholds))
+        self.ticks = 0
+        self.recomputes = 0
+
+    def _watching(self, coin):
+        return self.coins is None or coin in self.coins
+
+    def _recompute(self, coin):
+        price = self.prices.get(coin)
+        if not price or price <= 0:
+            return None
+        start = time.perf_counter()
+        book = self.book
+        long_within = np.array([book.range_sum(coin, True, price * (1 - pct / 100), price) for pct in self.thresholds])
+        short_within = np.array([book.range_sum(coin, False, price, price * (1 + pct / 100)) for pct in self.thresholds])
+        view = CoinView(coin, price,
+                        book.nearest(coin, True, price, self.top_n),
+                        book.nearest(coin, False, price, self.top_n),
+                        long_within, short_within,
+                        (time.perf_counter() - start) * 1000)
+
+        previous = self.views.get(coin)
+        if previous is not None:
+            self.long_totals -= previous.long_within
+            self.short_totals -= previous.short_within
+        self.long_totals += long_within
+        self.short_totals += short_within
+        self.views[coin] = view
+        self.recomputes += 1
+        if self.on_publish:
+            self.on_publish(view)
+        return view
+
+    def on_tick(self, coin, price):
+        """Apply one mark price; returns the refreshed CoinView, or None if nothing changed"""
+        self.ticks += 1
+        if not self._watching(coin) or self.prices.get(coin) == price:
+            return None
+        self.prices[coin] = price
+        if self.book.side(coin, True) is None and self.book.side(coin, False) is None and coin not in self.views:
+            return None
+        return self._recompute(coin)
+
+    def on_mids(self, mids):
+        """Apply an allMids push (coin -> price string); returns the coins whose views changed"""
+        changed = []
+        for coin, mid in mids.items():
+            if coin.startswith('@'):
+                continue  # Spot pair ids, not perp coins
+            if self.on_tick(coin, float(mid)) is not None:
+                changed.append(coin)
+        return changed
+
+    def on_positions(self, address, rows):
+        """Apply one address's refreshed positions and recompute only the coins it touched"""
+        before = self.book.coins_for(address)
+        self.book.update_address(address, rows)
+        touched = before | {row[0] for row in rows}
+        return [coin for coin in touched if self._watching(coin) and self._recompute(coin) is not None]
+
+    def reset(self, book):
+        """Swap in a rebuilt book (e.g. after a full position download) and recompute every priced coin"""
+        self.book = book
+        self.views = {}
+        self.long_totals = np.zeros(len(self.thresholds))
+        self.short_totals = np.zeros(len(self.thresholds))
+        for coin in list(self.prices):
+            if self._watching(coin):
+                self._recompute(coin)
+
+    def closest(self, is_long, k=None):
+        """The k positions on one side closest to liquidation across every coin, from the cached views"""
+        k = k or self.top_n
+        candidates = []
+        for coin, view in self.views.items():
+            for distance, liq, value, address in (view.nearest_long if is_long else view.nearest_short):
+                candidates.append((distance, coin, liq, value, address))
+        return heapq.nsmallest(k, candidates)
+
+    def threshold_totals(self):
+        """(thresholds, long value, short value) summed over every coin"""
+        return self.thresholds, np.maximum(self.long_totals, 0.0), np.maximum(self.short_totals, 0.0)
@@ -0,0 +1,235 @@
+# ws_ingest.py - Live position ingestion over the HyperLiquid WebSocket (per-user state + mark prices)
+
+import asyncio
+import json
+import random
+import threading
+import time
+
+import websockets
+from colorama import Fore
+
+from aggregation_store import AggregationStore
+from liquidation_book import LiquidationBook
+from position_columns import PositionColumnBuilder
+
+WS_URL = "wss://api.hyperliquid.xyz/ws"
+USER_SUBSCRIPTION = "webData2"  # Pushes the full clearinghouseState for one user every few seconds
+USERS_PER_CONNECTION = 10  # HyperLiquid caps the distinct users one connection may subscribe to
+MAX_WS_CONNECTIONS = 10  # Sockets per process; addresses beyond MAX_WS_CONNECTIONS x USERS_PER_CONNECTION are polled
+OVERFLOW_POLL_INTERVAL = 60  # Seconds between REST passes over the addresses that did not get a socket
+PING_INTERVAL = 50  # Seconds between application pings; the server drops connections idle for 60s
+OPEN_TIMEOUT = 15  # Seconds to wait for the WebSocket handshake
+RECONNECT_BASE_DELAY = 1  # First reconnect wait, doubled after every failed attempt
+RECONNECT_MAX_DELAY = 60
+STALE_AFTER = 120  # Seconds without a push before an address is resynced over REST
+RESYNC_BATCH = 20  # Most REST resyncs per check, so a dead feed cannot stampede the API
+
+class PositionTable:
+    """
+    In-memory latest clearinghouseState per address plus the latest mid prices.
+    Written by the WebSocket handlers, read by whoever snapshots it (saver thread, dashboard).
+    Coin/side rollups (self.aggregates) and the liquidation index (self.book) are kept
+    current from each changed address.
+    """
+
+    def __init__(self, min_position_value):
+        self.min_position_value = min_position_value
+        self.aggregates = AggregationStore()
+        self.book = LiquidationBook()
+        self._parser = PositionColumnBuilder(min_position_value)
+        self._lock = threading.Lock()
+        self._states = {}      # address -> latest clearinghouseState payload
+        self._updated_at = {}  # address -> monotonic time of the last push or resync
+        self.mids = {}
+        self.version = 0       # Bumped on every change so readers can skip unchanged snapshots
+
+    def __len__(self):
+        return len(self._states)
+
+    def apply_user_state(self, address, state):
+        """Replace one address's state; returns True if its positions changed"""
+        with self._lock:
+            self._updated_at[address] = time.monotonic()
+            positions = state.get("assetPositions") if state else None
+            previous = self._states.get(address)
+            if previous is not None and previous.get("assetPositions") == positions:
+                return False
+            if positions:
+                self._states[address] = state
+            elif address in self._states:
+                del self._states[address]
+            else:
+                return False
+            rows = self._parser.parse_payload(state)
+            self.aggregates.update_address(address, rows)
+            self.book.update_address(address, rows)
+            self.version += 1
+            return True
+
+    def apply_mids(self, mids):
+        with self._lock:
+            self.mids.update(mids)
+
+    def aggregates_dataframe(self):
+        """Coin/side rollup of the current positions"""
+        with self._lock:
+            return self.aggregates.to_dataframe()
+
+    def stale_addresses(self, addresses, max_age):
+        """Addresses that have had no push or resync within max_age seconds"""
+        cutoff = time.monotonic() - max_age
+        with self._lock:
+            return [a for a in addresses if self._updated_at.get(a, 0.0) < cutoff]
+
+    def to_dataframe(self):
+        """Current positions of every address, in the same columns as a REST sweep"""
+        with self._lock:
+            states = list(self._states.items())
+        builder = PositionColumnBuilder(self.min_position_value)
+        for address, state in states:
+            builder.add_payload(state, address)
+        return builder.to_dataframe()
+
+class WsIngestor:
+    """
+    Keeps one WebSocket per group of USERS_PER_CONNECTION addresses subscribed to the user
+    state stream (the first connection also carries allMids) and applies every push to a
+    PositionTable. Dropped connections reconnect with exponential backoff and resubscribe;
+    the first push after a subscribe is a full snapshot, so a reconnect is also a resync.
+    Addresses that go quiet for STALE_AFTER seconds are refetched through resync(address),
+    which must return (data, address) like ppls_pos_server.fetch_address_data.
+    At most max_connections sockets are opened; the addresses that do not fit are polled
+    through resync every OVERFLOW_POLL_INTERVAL seconds instead (or dropped without resync).
+    """
+
+    def __init__(self, addresses, table, url=WS_URL, resync=None, on_mids=None,
+                 users_per_connection=USERS_PER_CONNECTION, max_connections=MAX_WS_CONNECTIONS):
+        addresses = [a.lower() for a in addresses]
+        capacity = users_per_connection * max_connections
+        self.addresses = addresses[:capacity]  # Streamed
+        self.overflow = addresses[capacity:]   # Polled over REST
+        self.table = table
+        self.url = url
+        self.resync = resync
+        self.on_mids = on_mids
+        self.users_per_connection = users_per_connection
+        self.messages = 0
+        self.connects = 0
+        self.resyncs = 0
+        self.polls = 0
+        self._stopping = False
+
+    def stats(self):
+        return {'messages': self.messages, 'connects': self.connects, 'resyncs': self.resyncs,
+                'polls': self.polls, 'addresses': len(self.table), 'mids': len(self.table.mids)}
+
+    def stop(self):
+        self._stopping = True
+
+    def handle_message(self, raw):
+        """Apply one server message to the table"""
+        message = json.loads(raw)
+        channel = message.get("channel")
+        data = message.get("data") or {}
+        self.messages += 1
+
+        if channel == USER_SUBSCRIPTION:
+            user = data.get("user")
+            if user:
+                self.table.apply_user_state(user.lower(), data.get("clearinghouseState"))
+        elif channel == "allMids":
+            mids = data.get("mids", {})
+            self.table.apply_mids(mids)
+            if self.on_mids:
+                self.on_mids(mids)
+        elif channel == "error":
+            print(f"{Fore.RED} WebSocket error message: {data}")
+
+    async def _subscribe(self, ws, users, with_mids):
+        if with_mids:
+            await ws.send(json.dumps({"method": "subscribe", "subscription": {"type": "allMids"}}))
+        for user in users:
+            await ws.send(json.dumps({"method": "subscribe", "subscription": {"type": USER_SUBSCRIPTION, "user": user}}))
+
+    async def _ping(self, ws):
+        while True:
+            await asyncio.sleep(PING_INTERVAL)
+            await ws.send(json.dumps({"method": "ping"}))
+
+    async def _run_connection(self, users, with_mids):
+        delay = RECONNECT_BASE_DELAY
+        while not self._stopping:
+            try:
+                async with websockets.connect(self.url, ping_interval=None, max_size=None,
+                                              open_timeout=OPEN_TIMEOUT) as ws:
+                    await self._subscribe(ws, users, with_mids)
+                    self.connects += 1
+                    delay = RECONNECT_BASE_DELAY
+                    pinger = asyncio.create_task(self._ping(ws))
+                    try:
+                        async for raw in ws:
+                            try:
+                                self.handle_message(raw)
+                            except Exception as e:
+                                # One bad push (malformed JSON, unexpected payload) must not cost the connection
+                                print(f"{Fore.RED} Error handling WebSocket message ({type(e).__name__}: {str(e)})")
+                    finally:
+                        pinger.cancel()
+            except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                print(f"{Fore.YELLOW} WebSocket connection lost ({type(e).__name__}: {str(e)}), reconnecting in {delay}s")
+            if self._stopping:
+                break
+            # Jitter so every connection does not reconnect in the same instant
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def _resync_stale(self):
+        await asyncio.sleep(STALE_AFTER)
+        while not self._stopping:
+            for address in self.table.stale_addresses(self.addresses, STALE_AFTER)[:RESYNC_BATCH]:
+                try:
+                    data, _ = await asyncio.to_thread(self.resync, address)
+                    if data is not None:
+                        self.table.apply_user_state(address, data)
+                        self.resyncs += 1
+                except Exception as e:
+                    print(f"{Fore.RED} Error resyncing {address[:6]}...{address[-4:]}: {str(e)}")
+            await asyncio.sleep(STALE_AFTER / 4)
+
+    async def _poll_overflow(self):
+        while not self._stopping:
+            started = time.monotonic()
+            for address in self.overflow:
+                if self._stopping:
+                    return
+                try:
+                    data, _ = await asyncio.to_thread(self.resync, address)
+                    if data is not None:
+                        self.table.apply_user_state(address, data)
+                        self.polls += 1
+                except Exception as e:
+                    print(f"{Fore.RED} Error polling {address[:6]}...{address[-4:]}: {str(e)}")
+            await asyncio.sleep(max(0.0, OVERFLOW_POLL_INTERVAL - (time.monotonic() - started)))
+
+    async def run(self):
+        """Run every connection (and the stale-address resync) until stop() or cancellation"""
+        groups = [self.addresses[i:i + self.users_per_connection]
+                  for i in range(0, len(self.addresses), self.users_per_connection)] or [[]]
+        tasks = [asyncio.create_task(self._run_connection(users, with_mids=(i == 0)))
+                 for i, users in enumerate(groups)]
+        if self.resync is not None:
+            tasks.append(asyncio.create_task(self._resync_stale()))
+        print(f"{Fore.YELLOW} WebSocket ingestion started for {len(self.addresses)} addresses "
+              f"over {len(groups)} connections to {self.url}")
+        if self.overflow and self.resync is not None:
+            tasks.append(asyncio.create_task(self._poll_overflow()))
+            print(f"{Fore.YELLOW} {len(self.overflow)} more addresses than {len(groups)} connections can carry; "
+                  f"polling them over REST every {OVERFLOW_POLL_INTERVAL}s")
+        elif self.overflow:
+            print(f"{Fore.RED} {len(self.overflow)} addresses over the {len(groups)} connection cap are not tracked")
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,157 @@
+# ws_standin.py - Local stand-in for the HyperLiquid WebSocket feed, for testing ws_ingest offline
+
+import argparse
+import asyncio
+import json
+import zlib
+
+import colorama
+import numpy as np
+import websockets
+from colorama import Fore
+
+import synthetic_whales as synth
+
+colorama.init(autoreset=True)
+
+DEFAULT_PORT = 8765
+
+class StandinFeed:
+    """
+    Random-walk mark prices plus a few synthetic positions per subscribed user.
+    Speaks the subset of the protocol ws_ingest uses: subscribe (allMids, webData2), ping.
+    """
+
+    def __init__(self, n_coins=20, seed=0, volatility=0.002, change_probability=0.05):
+        self.rng = np.random.default_rng(seed)
+        self.prices = synth.generate_universe(n_coins, seed)
+        self.volatility = volatility
+        self.change_probability = change_probability
+        self.users = {}  # address -> list of position dicts (coin, szi, entryPx, leverage)
+
+    def step_prices(self):
+        shocks = np.exp(self.rng.normal(0, self.volatility, len(self.prices)))
+        self.prices = {coin: price * shock for (coin, price), shock in zip(self.prices.items(), shocks)}
+
+    def _new_position(self, rng):
+        coin = rng.choice(list(self.prices))
+        value = 25000 * (1 + rng.pareto(1.3))
+        entry = self.prices[coin] * np.exp(rng.normal(0, 0.03))
+        side = 1 if rng.random() < 0.55 else -1
+        return {'coin': str(coin), 'szi': side * value / entry, 'entryPx': entry,
+                'leverage': int(rng.choice(synth.LEVERAGE_CHOICES, p=synth.LEVERAGE_WEIGHTS))}
+
+    def positions_for(self, user):
+        """Positions for a user, created deterministically on first subscribe"""
+        if user not in self.users:
+            rng = np.random.default_rng(zlib.crc32(user.encode()))
+            self.users[user] = [self._new_position(rng) for _ in range(rng.integers(0, 4))]
+        return self.users[user]
+
+    def maybe_change(self, user):
+        """Occasionally open, close or resize a position so consumers see real changes"""
+        positions = self.positions_for(user)
+        if self.rng.random() >= self.change_probability:
+            return
+        action = self.rng.integers(0, 3)
+        if action == 0 or not positions:
+            positions.append(self._new_position(self.rng))
+        elif action == 1:
+            positions.pop(self.rng.integers(0, len(positions)))
+        else:
+            positions[self.rng.integers(0, len(positions))]['szi'] *= self.rng.uniform(0.5, 1.5)
+
+    def clearinghouse_state(self, user):
+        asset_positions = []
+        for p in self.positions_for(user):
+            mark = self.prices[p['coin']]
+            size = p['szi']
+            buffer = 1.0 / p['leverage'] - synth.MAINTENANCE_MARGIN
+            liq = p['entryPx'] * (1 - buffer) if size > 0 else p['entryPx'] * (1 + buffer)
+            asset_positions.append({'type': 'oneWay', 'position': {
+                'coin': p['coin'], 'szi': str(size), 'entryPx': str(p['entryPx']),
+                'positionValue': str(abs(size) * mark), 'unrealizedPnl': str(size * (mark - p['entryPx'])),
+                'liquidationPx': str(liq) if liq > 0 else None,
+                'leverage': {'type': 'cross', 'value': p['leverage']},
+            }})
+        return {'assetPositions': asset_positions}
+
+    def mids_message(self):
+        return json.dumps({'channel': 'allMids', 'data': {'mids': {c: str(p) for c, p in self.prices.items()}}})
+
+    def user_message(self, user):
+        return json.dumps({'channel': 'webData2', 'data': {'user': user, 'clearinghouseState': self.clearinghouse_state(user)}})
+
+async def serve_connection(ws, feed, tick, user_interval, drop_after):
+    """Handle one client: answer subscriptions and pings, push mids every tick and user state every user_interval"""
+    users = []
+    mids = False
+
+    async def pusher():
+        elapsed = 0.0
+        while True:
+            await asyncio.sleep(tick)
+            elapsed += tick
+            if mids:
+                await ws.send(feed.mids_message())
+            if elapsed >= user_interval:
+                elapsed = 0.0
+                for user in users:
+                    feed.maybe_change(user)
+                    await ws.send(feed.user_message(user))
+
+    push_task = asyncio.create_task(pusher())
+    try:
+        async with asyncio.timeout(drop_after):
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get('method') == 'ping':
+                    await ws.send(json.dumps({'channel': 'pong'}))
+                elif message.get('method') == 'subscribe':
+                    subscription = message.get('subscription', {})
+                    await ws.send(json.dumps({'channel': 'subscriptionResponse', 'data': message}))
+                    if subscription.get('type') == 'allMids':
+                        mids = True
+                        await ws.send(feed.mids_message())
+                    elif subscription.get('type') == 'webData2' and subscription.get('user'):
+                        users.append(subscription['user'])
+                        await ws.send(feed.user_message(subscription['user']))
+    except TimeoutError:
+        # Simulate the server dropping the connection so clients exercise reconnect
+        print(f"{Fore.YELLOW} Dropping connection with {len(users)} users after {drop_after}s")
+    except websockets.exceptions.ConnectionClosed:
+        pass
+    finally:
+        push_task.cancel()
+        await ws.close()
+
+async def run_standin(host, port, feed, tick, user_interval, drop_after):
+    async def handler(ws):
+        await serve_connection(ws, feed, tick, user_interval, drop_after)
+
+    async with websockets.serve(handler, host, port):
+        print(f"{Fore.GREEN} Stand-in feed listening on ws://{host}:{port} ({len(feed.prices)} coins)")
+        while True:
+            await asyncio.sleep(tick)
+            feed.step_prices()
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Local stand-in for the HyperLiquid WebSocket feed")
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--coins', type=int, default=20, help='Number of coins in the synthetic universe (default: 20)')
+    parser.add_argument('--tick', type=float, default=0.5, help='Seconds between price moves and allMids pushes (default: 0.5)')
+    parser.add_argument('--user-interval', type=float, default=2.0, help='Seconds between user state pushes (default: 2)')
+    parser.add_argument('--drop-after', type=float, default=None, help='Close every connection after this many seconds to test reconnects')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    args = parser.parse_args()
+
+    feed = StandinFeed(args.coins, args.seed)
+    try:
+        asyncio.run(run_standin(args.host, args.port, feed, args.tick, args.user_interval, args.drop_after))
+    except KeyboardInterrupt:
+        print(f"{Fore.YELLOW} Stand-in feed stopped")
+
+if __name__ == "__main__":
+    main()